@@ -68,7 +68,7 @@ class SimpleCoordinator:
         try:
             # 尝试多种导入路径以确保兼容性
             try:
-                from src.TransferLLM.mem0_adapter import TransferMemoryManager
+                from src.TransferLLM.mem0_adapter import get_transfer_memory_manager
             except ImportError:
                 # 如果从 src 导入失败，尝试相对路径
                 import sys
@@ -77,9 +77,11 @@ class SimpleCoordinator:
                 project_root = os.path.dirname(os.path.dirname(current_dir))
                 if project_root not in sys.path:
                     sys.path.insert(0, project_root)
-                from src.TransferLLM.mem0_adapter import TransferMemoryManager
+                from src.TransferLLM.mem0_adapter import get_transfer_memory_manager
             
-            self.memory_manager = TransferMemoryManager(user_id=self.user_id)
+            self.memory_manager = get_transfer_memory_manager(
+                user_id=self.user_id, fallback=False
+            )
             print("✅ 协调器：Mem0 连接成功")
             return True
         except Exception as e:
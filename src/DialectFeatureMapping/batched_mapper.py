@@ -0,0 +1,190 @@
+"""
+批量并发的 RAG 特征映射：一次矩阵检索 + 限流并发 LLM 调用 + 按 feature index 的断点续跑
+
+作用概述：
+- 原先 rag_feature_mapping_llm_* 逐个 feature 串行：一次检索 + 一次 LLM 调用 + 追加一行结果，
+  续跑依据“结果文件行数 < index”，中间任何一行失败都会错位。
+- BatchedFeatureMapper：
+  * 先把所有待映射 feature 的检索问题一次性向量化（LocalEmbedder 批量 + 缓存），
+    再对 Chroma 集合做批量 query（一次矩阵检索，按 RETRIEVE_BATCH_SIZE 分块）；
+  * 映射函数（LLM 调用 / 直接取 top1）在线程池中并发执行，并发数有上限；
+  * MappingCheckpoint 以 a_db 的 feature index 为键：每完成一个立即追加写入 <结果文件>.partial，
+    续跑时只处理缺失的 index；全部成功后才按 index 排序写出结果文件（下游按行号 = index 读取）。
+- 单个 feature 失败只影响自身，不会产出有缺口的结果文件；重新运行会精确补齐。
+
+环境变量：
+- QTRAN_RAG_MAPPING_CONCURRENCY: 并发映射数上限（默认 8）
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.documents import Document
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIEVE_K = 4  # 与 vectorstore.as_retriever() 的默认 k 一致
+RETRIEVE_BATCH_SIZE = 256
+
+
+class MappingCheckpoint:
+    """
+    映射检查点：a_db feature index -> mapping_result（线程安全）。
+
+    进行中的结果追加写入 <结果文件>.partial；只有全部 feature 映射成功后才 finalize，
+    按 index 排序写出正式结果文件（下游按行号 = index 读取，不能有缺口）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.partial_path = path + ".partial"
+        self.results = {}
+        self._lock = threading.Lock()
+        corrupted = False
+        for source in (self.path, self.partial_path):
+            if not os.path.exists(source):
+                continue
+            with open(source, "r", encoding="utf-8") as r:
+                for line in r:
+                    try:
+                        result = json.loads(line)
+                        self.results[result["a_db"]["index"]] = result
+                    except (ValueError, KeyError, TypeError):
+                        corrupted = True  # 中断时写了半行，丢弃后重新映射
+        if corrupted:
+            # 先重写为干净的文件，避免后续追加接在半行之后
+            self._write_sorted(self.partial_path)
+
+    def done(self, index):
+        return index in self.results
+
+    def add(self, result):
+        with self._lock:
+            self.results[result["a_db"]["index"]] = result
+            with open(self.partial_path, "a", encoding="utf-8") as a:
+                json.dump(result, a, ensure_ascii=False)
+                a.write("\n")
+
+    def _write_sorted(self, path):
+        with self._lock:
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as w:
+                for index in sorted(self.results):
+                    json.dump(self.results[index], w, ensure_ascii=False)
+                    w.write("\n")
+            os.replace(tmp, path)
+
+    def finalize(self):
+        """按 index 排序写出正式结果文件（原子替换），并删除 .partial。"""
+        self._write_sorted(self.path)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+def batch_retrieve(vectorstore, questions, k=DEFAULT_RETRIEVE_K):
+    """对一批问题做一次向量化 + 批量近邻查询，返回每个问题的 Document 列表（与 retriever 输出一致）。"""
+    if not questions:
+        return []
+    collection = getattr(vectorstore, "_collection", None)
+    embeddings = getattr(vectorstore, "embeddings", None)
+    if collection is None or embeddings is None:
+        return [vectorstore.similarity_search(q, k=k) for q in questions]
+    vectors = embeddings.embed_documents(questions)
+    n_results = max(1, min(k, collection.count()))
+    docs_list = []
+    for i in range(0, len(vectors), RETRIEVE_BATCH_SIZE):
+        result = collection.query(
+            query_embeddings=vectors[i : i + RETRIEVE_BATCH_SIZE],
+            n_results=n_results,
+            include=["documents", "metadatas"],
+        )
+        for documents, metadatas in zip(result["documents"], result["metadatas"]):
+            docs_list.append(
+                [
+                    Document(page_content=text, metadata=metadata or {})
+                    for text, metadata in zip(documents, metadatas)
+                ]
+            )
+    return docs_list
+
+
+class BatchedFeatureMapper:
+    """
+    :param dir_filename: 映射结果文件（同时作为检查点）
+    :param vectorstore: b_db 向量库；None 表示映射不需要检索上下文
+    :param retrieve_fn: (records, questions) -> 每个 record 的 Document 列表，优先于 vectorstore
+                        （如 v5 直接使用离线计算好的候选列表）
+    """
+
+    def __init__(
+        self,
+        dir_filename,
+        vectorstore=None,
+        k=DEFAULT_RETRIEVE_K,
+        max_workers=None,
+        retrieve_fn=None,
+    ):
+        self.checkpoint = MappingCheckpoint(dir_filename)
+        self.vectorstore = vectorstore
+        self.retrieve_fn = retrieve_fn
+        self.k = k
+        self.max_workers = int(
+            max_workers
+            or os.environ.get("QTRAN_RAG_MAPPING_CONCURRENCY", DEFAULT_CONCURRENCY)
+        )
+
+    def run(self, query_records, question_fn, map_fn):
+        """
+        :param query_records: a_db 的 feature 记录（含 index / Feature）
+        :param question_fn: record -> 检索问题（同时传给 map_fn）
+        :param map_fn: (record, question, docs) -> mapping_result，在工作线程中执行
+        :return: 本次失败的 feature index 列表
+        """
+        pending = [r for r in query_records if not self.checkpoint.done(r["index"])]
+        print(
+            f"🧭 待映射 {len(pending)} / {len(query_records)} 个 feature"
+            f"（已完成 {len(query_records) - len(pending)}），并发 {self.max_workers}"
+        )
+        start = time.time()
+        questions = [question_fn(record) for record in pending]
+        if self.retrieve_fn is not None:
+            docs_list = self.retrieve_fn(pending, questions)
+        elif self.vectorstore is not None:
+            docs_list = batch_retrieve(self.vectorstore, questions, self.k)
+            print(f"🔎 批量检索 {len(questions)} 个问题，用时 {time.time() - start:.1f}s")
+        else:
+            docs_list = [[] for _ in pending]
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = {
+                executor.submit(map_fn, record, question, docs): record["index"]
+                for record, question, docs in zip(pending, questions, docs_list)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    mapping_result = future.result()
+                except Exception as e:
+                    failed.append(index)
+                    print(f"❌ feature {index} 映射失败: {e}")
+                    continue
+                self.checkpoint.add(mapping_result)
+                print(mapping_result)
+
+        print(
+            f"映射完成 {len(pending) - len(failed)} 个，失败 {len(failed)} 个，"
+            f"用时 {time.time() - start:.1f}s"
+        )
+        if failed:
+            # 有缺口时不写正式结果文件，已完成的结果保留在 .partial 中
+            print(
+                f"⚠️ 失败的 feature index: {sorted(failed)}，结果暂存于 "
+                f"{self.checkpoint.partial_path}（重新运行将只补齐这些）"
+            )
+        else:
+            self.checkpoint.finalize()
+            print(f"✅ 结果已写入 {self.checkpoint.path}")
+        return sorted(failed)
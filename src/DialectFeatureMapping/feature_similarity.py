@@ -0,0 +1,186 @@
+"""
+离线全量特征相似度：两个知识库的嵌入矩阵一次性分块相乘，产出 top-k 候选列表
+
+作用概述：
+- 构建 RAG_Feature_Mapping 只需要两个固定知识库（a_db 特征 × b_db 特征）之间的最近邻，
+  不必对每个 a_db 特征单独做一次 Chroma 检索。
+- load_embedding_matrix：把 embedding jsonl 的文档向量化一次（LocalEmbedder，带向量缓存），
+  L2 归一化后存为 Output/cache/embedding_matrix 下的 .npy（float32）与 .npy.json（内容哈希 / 模型 / 行数），
+  之后直接 mmap 读取；jsonl 内容变化时自动重建。
+- topk_cosine：按 a 的行分块做 a_blk @ b.T，argpartition 取 top-k 再排序，内存占用只与 block_size × len(b) 有关。
+- 输出的候选列表由 rag_feature_mapping_llm_v5 交给 LLM 确认，也可用 tools/build_feature_candidates.py
+  一次性为所有数据库对生成。候选文件首行记录两侧知识库文件的内容哈希（sources），
+  知识库变化后 candidate_sources_match 不再成立，调用方据此重建。
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+
+from src.DialectFeatureMapping.feature_vectorstore import file_content_hash
+from src.Tools.cache_dir import source_cache_path
+
+DEFAULT_TOP_K = 5
+DEFAULT_BLOCK_SIZE = 1024
+
+
+def _model_tag(embedder):
+    model_name = getattr(embedder, "model_name", type(embedder).__name__)
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(model_name))
+
+
+def candidate_filename(mapping_root, a_db, b_db, feature_type, top_k):
+    """候选列表文件：<mapping_root>/<a_db>/<feature_type>/<a_db>_candidates_<b_db>_k<top_k>.jsonl"""
+    return os.path.join(
+        mapping_root,
+        a_db,
+        feature_type,
+        a_db + "_candidates_" + b_db + "_k" + str(top_k) + ".jsonl",
+    )
+
+
+def load_embedding_matrix(source_filename, texts, embedder, matrix_path=None):
+    """
+    返回 source_filename 对应文档的归一化嵌入矩阵（np.memmap，只读）。
+    :param texts: 按行顺序的文档文本（第 i 行即知识库中 index 为 i 的特征）
+    """
+    matrix_path = matrix_path or source_cache_path(
+        source_filename, "." + _model_tag(embedder) + ".npy", "embedding_matrix"
+    )
+    meta_path = matrix_path + ".json"
+    content_hash = file_content_hash(source_filename)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as r:
+            meta = json.load(r)
+        if (
+            meta.get("content_hash") == content_hash
+            and meta.get("count") == len(texts)
+            and os.path.exists(matrix_path)
+        ):
+            return np.load(matrix_path, mmap_mode="r")
+    except (OSError, ValueError):
+        pass
+
+    if hasattr(embedder, "embed_many"):
+        vectors = embedder.embed_many(texts)
+    else:
+        vectors = embedder.embed_documents(texts)
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    tmp = matrix_path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp, matrix_path)
+    with open(meta_path, "w", encoding="utf-8") as w:
+        json.dump(
+            {
+                "source": os.path.basename(source_filename),
+                "embedding_model": getattr(embedder, "model_name", ""),
+                "content_hash": content_hash,
+                "count": len(texts),
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            },
+            w,
+            indent=2,
+        )
+    print(f"🧮 已生成嵌入矩阵 {os.path.basename(matrix_path)} {matrix.shape}")
+    return np.load(matrix_path, mmap_mode="r")
+
+
+def topk_cosine(a, b, k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    a、b 为行归一化矩阵，返回 (indices, scores)，形状均为 (len(a), k')，k' = min(k, len(b))；
+    每行按相似度从高到低排列。
+    """
+    n_a, n_b = a.shape[0], b.shape[0]
+    k = max(0, min(k, n_b))
+    indices = np.empty((n_a, k), dtype=np.int64)
+    scores = np.empty((n_a, k), dtype=np.float32)
+    if k == 0 or n_a == 0:
+        return indices, scores
+    b_t = np.ascontiguousarray(np.asarray(b, dtype=np.float32).T)
+    for start in range(0, n_a, block_size):
+        end = min(start + block_size, n_a)
+        sims = np.asarray(a[start:end], dtype=np.float32) @ b_t
+        if k < n_b:
+            part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(n_b), sims.shape)
+        part_scores = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        indices[start:end] = np.take_along_axis(part, order, axis=1)
+        scores[start:end] = np.take_along_axis(part_scores, order, axis=1)
+    return indices, scores
+
+
+def build_candidate_lists(a_records, b_records, indices, scores):
+    """把 top-k 结果组装为候选列表：每个 a_db 特征一条，候选按相似度降序。"""
+    candidates = []
+    for row, a_record in enumerate(a_records):
+        candidates.append(
+            {
+                "a_db": {"index": a_record["index"], "Feature": a_record["Feature"]},
+                "candidates": [
+                    {
+                        "index": b_records[int(col)]["index"],
+                        "Feature": b_records[int(col)]["Feature"],
+                        "score": round(float(score), 6),
+                    }
+                    for col, score in zip(indices[row], scores[row])
+                ],
+            }
+        )
+    return candidates
+
+
+def candidate_sources(a_files, b_files, embedder):
+    """
+    候选文件依赖的知识库版本：两侧 (merge 文件, embedding 文件) 的内容哈希与嵌入模型。
+    merge 文件决定 index / Feature，embedding 文件决定相似度。
+    """
+    return {
+        "a_db": [file_content_hash(path) for path in a_files],
+        "b_db": [file_content_hash(path) for path in b_files],
+        "embedding_model": str(getattr(embedder, "model_name", type(embedder).__name__)),
+    }
+
+
+def write_candidate_lists(candidates, out_filename, sources=None):
+    """写出候选列表；sources 非空时作为首行 {"sources": ...} 写入，供 candidate_sources_match 校验。"""
+    os.makedirs(os.path.dirname(out_filename) or ".", exist_ok=True)
+    tmp = out_filename + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as w:
+        if sources is not None:
+            json.dump({"sources": sources}, w, ensure_ascii=False)
+            w.write("\n")
+        for item in candidates:
+            json.dump(item, w, ensure_ascii=False)
+            w.write("\n")
+    os.replace(tmp, out_filename)
+
+
+def candidate_sources_match(filename, sources):
+    """候选文件存在且首行记录的 sources 与当前知识库一致（未记录 sources 的旧文件视为不一致）。"""
+    if sources is None:
+        return False
+    try:
+        with open(filename, "r", encoding="utf-8") as r:
+            header = json.loads(r.readline() or "{}")
+    except (OSError, ValueError):
+        return False
+    return isinstance(header, dict) and header.get("sources") == sources
+
+
+def read_candidate_lists(filename):
+    """读取候选列表，返回 a_db feature index -> 候选列表（跳过 sources 首行）。"""
+    with open(filename, "r", encoding="utf-8") as r:
+        return {
+            item["a_db"]["index"]: item["candidates"]
+            for item in (json.loads(line) for line in r if line.strip())
+            if "a_db" in item
+        }
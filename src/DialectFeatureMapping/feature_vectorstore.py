@@ -0,0 +1,161 @@
+"""
+RAG 特征映射的持久化向量库：按 (db, feature_types, content_keys) 落盘 Chroma 集合，跨运行 / 跨版本复用
+
+作用概述：
+- 原先每个 rag_feature_mapping_llm_v* 每次运行都用 Chroma.from_documents 在内存中重建整个 b_db 知识库向量。
+- 现在每个 embedding jsonl 对应磁盘上的一个 Chroma 集合（Output/cache/chroma 下，不写进被跟踪的知识库目录），
+  manifest 记录该 jsonl 的内容哈希（进程内按 (mtime_ns, size) 缓存，文件未变时不重新计算）：
+  * 哈希未变：直接打开集合，不做任何向量化；
+  * 哈希变化：文档 id = sha1(文档内容)（重复内容加序号），只对新增 / 修改的文档向量化，删除已不存在的文档。
+- 同一进程内打开过的集合缓存复用（rag_feature_mapping_process 中逐 feature 检索时不再重复打开）；
+  每个集合各自加锁，一个库向量化时不阻塞其他库的检索。
+
+环境变量：
+- QTRAN_RAG_CHROMA_PERSIST: on(默认) | off（off 时退回 Chroma.from_documents 的内存集合）
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from src.Tools.cache_dir import source_cache_path
+
+MANIFEST_FILENAME = "manifest.json"
+_ADD_BATCH_SIZE = 512
+
+_stores = {}
+_store_locks = {}
+_hashes = {}  # 绝对路径 -> ((st_mtime_ns, st_size), sha256)
+_lock = threading.Lock()
+
+
+def chroma_persist_enabled():
+    return os.environ.get("QTRAN_RAG_CHROMA_PERSIST", "on").lower() not in (
+        "0",
+        "off",
+        "false",
+        "no",
+    )
+
+
+def file_content_hash(path):
+    """文件内容的 sha256；文件 mtime/size 未变时直接返回进程内缓存的结果。"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _lock:
+        _hashes[path] = (signature, digest)
+    return digest
+
+
+def document_ids(documents):
+    """按内容生成稳定 id；内容重复的文档依次加 -1、-2 后缀。"""
+    ids = []
+    seen = {}
+    for doc in documents:
+        digest = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        count = seen.get(digest, 0)
+        seen[digest] = count + 1
+        ids.append(digest if count == 0 else f"{digest}-{count}")
+    return ids
+
+
+def _collection_name(source_filename, embedding_model):
+    # Chroma 集合名限制 3-63 个字符，这里用文件名 + 模型名的哈希
+    stem = os.path.splitext(os.path.basename(source_filename))[0]
+    digest = hashlib.sha1(f"{stem}\0{embedding_model}".encode("utf-8")).hexdigest()
+    return f"rag_{digest[:24]}"
+
+
+def _read_manifest(persist_directory):
+    try:
+        with open(os.path.join(persist_directory, MANIFEST_FILENAME), "r", encoding="utf-8") as r:
+            return json.load(r)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(persist_directory, manifest):
+    path = os.path.join(persist_directory, MANIFEST_FILENAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as w:
+        json.dump(manifest, w, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def load_persistent_vectorstore(documents, source_filename, embeddings, persist_directory=None):
+    """
+    返回 source_filename（embedding jsonl）对应的 Chroma 向量库，内容未变时直接复用磁盘上的集合。
+    :param documents: 由 source_filename 读出的 Document 列表
+    :param embeddings: LangChain Embeddings（模型名参与集合名，换模型不会混用向量）
+    """
+    from langchain_community.vectorstores import Chroma
+
+    if not chroma_persist_enabled():
+        return Chroma.from_documents(documents, embeddings)
+
+    source_filename = os.path.abspath(source_filename)
+    persist_directory = os.path.abspath(
+        persist_directory or source_cache_path(source_filename, "", "chroma")
+    )
+    embedding_model = getattr(embeddings, "model_name", type(embeddings).__name__)
+    collection_name = _collection_name(source_filename, embedding_model)
+    content_hash = file_content_hash(source_filename)
+
+    key = (persist_directory, collection_name)
+    with _lock:
+        store_lock = _store_locks.setdefault(key, threading.Lock())
+    # 只锁当前集合：向量化耗时较长，不能阻塞其他库的检索
+    with store_lock:
+        cached = _stores.get(key)
+        if cached is not None and cached[0] == content_hash:
+            return cached[1]
+
+        os.makedirs(persist_directory, exist_ok=True)
+        vectorstore = Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+        )
+        manifest = _read_manifest(persist_directory)
+        entry = manifest.get(collection_name, {})
+        if entry.get("content_hash") == content_hash and entry.get("count") == len(documents):
+            print(f"♻️ 复用向量库 {os.path.basename(source_filename)}（{len(documents)} 条）")
+        else:
+            ids = document_ids(documents)
+            existing = set(vectorstore.get(include=[])["ids"])
+            wanted = dict(zip(ids, documents))
+            stale = [doc_id for doc_id in existing if doc_id not in wanted]
+            missing = [doc_id for doc_id in ids if doc_id not in existing]
+            if stale:
+                vectorstore.delete(ids=stale)
+            for i in range(0, len(missing), _ADD_BATCH_SIZE):
+                chunk = missing[i : i + _ADD_BATCH_SIZE]
+                vectorstore.add_documents([wanted[doc_id] for doc_id in chunk], ids=chunk)
+            if hasattr(vectorstore, "persist"):
+                try:
+                    vectorstore.persist()
+                except Exception:
+                    pass  # 新版 chromadb 自动持久化
+            manifest[collection_name] = {
+                "source": os.path.basename(source_filename),
+                "embedding_model": embedding_model,
+                "content_hash": content_hash,
+                "count": len(documents),
+            }
+            _write_manifest(persist_directory, manifest)
+            print(
+                f"🧮 更新向量库 {os.path.basename(source_filename)}："
+                f"新增 {len(missing)}，删除 {len(stale)}，复用 {len(ids) - len(missing)}"
+            )
+        _stores[key] = (content_hash, vectorstore)
+        return vectorstore
@@ -17,10 +17,20 @@ import json
 import os
 from langchain.prompts import ChatPromptTemplate
 from src.Tools.JsonLoader.JSONLoader import JSONLoader
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings.sentence_transformer import (
-    SentenceTransformerEmbeddings,
+from src.DialectFeatureMapping.feature_vectorstore import load_persistent_vectorstore
+from src.DialectFeatureMapping.batched_mapper import BatchedFeatureMapper
+from src.DialectFeatureMapping.feature_similarity import (
+    DEFAULT_TOP_K,
+    build_candidate_lists,
+    candidate_filename,
+    candidate_sources,
+    candidate_sources_match,
+    load_embedding_matrix,
+    read_candidate_lists,
+    topk_cosine,
+    write_candidate_lists,
 )
+from src.Tools.local_embedder import get_local_embedder
 from langchain.output_parsers import ResponseSchema
 from langchain.output_parsers import StructuredOutputParser
 from langchain.callbacks import get_openai_callback
@@ -31,11 +41,13 @@ from langchain.callbacks import get_openai_callback
 # from langchain.vectorstores import Weaviate
 
 
-from langchain.chat_models import ChatOpenAI
-from langchain.schema.runnable import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from src.Tools.llm_cache import install_llm_cache
+from src.Tools.llm_gateway import get_chat_model
 
-llm = ChatOpenAI(temperature=0.0, model="gpt-4o-mini")
+install_llm_cache()
+
+llm = get_chat_model(temperature=0.0, model="gpt-4o-mini")
 
 feature_knowledge_base = "FeatureKnowledgeBase"
 
@@ -107,16 +119,23 @@ def feature_type_merge(db, feature_types):
     return merge_feature_filename
 
 
-def load_feature_knowledge_embedding(db, feature_types, content_keys):
-    """构建或加载嵌入输入文件，并用 JSONLoader 读取为 Document 集合。"""
+def feature_embedding_filename(db, feature_types, content_keys):
+    """embedding 输入文件路径：RAG_Embedding_Data/embedding_<types>_<keys>.jsonl"""
     names = "embedding"
     for feature_type in feature_types:
         names = names + "_" + feature_type
     for content_key in content_keys:
         names = names + "_" + content_key
-    embedding_data_filename = os.path.join(
+    return os.path.join(
         "..", "..", feature_knowledge_base, db, "RAG_Embedding_Data", names + ".jsonl"
     )
+
+
+def load_feature_knowledge_embedding(db, feature_types, content_keys):
+    """构建或加载嵌入输入文件，并用 JSONLoader 读取为 Document 集合。"""
+    embedding_data_filename = feature_embedding_filename(
+        db, feature_types, content_keys
+    )
     if not os.path.exists(embedding_data_filename):
         names_ = "merge"
         for feature_type in feature_types:
@@ -158,6 +177,49 @@ def load_feature_knowledge_embedding(db, feature_types, content_keys):
     return data
 
 
+def load_feature_vectorstore(db, feature_types, content_keys):
+    """db 的特征向量库：按 embedding 文件内容哈希持久化在磁盘上，跨运行、跨版本复用。"""
+    data = load_feature_knowledge_embedding(db, feature_types, content_keys)
+    embeddings = get_local_embedder("all-MiniLM-L6-v2")
+    return load_persistent_vectorstore(
+        data, feature_embedding_filename(db, feature_types, content_keys), embeddings
+    )
+
+
+def _llm_feature_mapper(prompt, output_parser, tolerant=False):
+    """
+    返回 BatchedFeatureMapper 的单 feature 映射函数：检索结果作为 context 调用 LLM，解析为 mapping_result。
+    tolerant=True 时解析失败记为空映射（v1 行为），否则抛出异常、该 feature 留待续跑。
+    """
+    chain = prompt | llm | StrOutputParser()
+
+    def map_one(query_json, question, docs):
+        cost = {}
+        with get_openai_callback() as cb:
+            resp = chain.invoke({"context": docs, "question": question})
+            try:
+                resp_json = output_parser.parse(resp)
+            except Exception:
+                if not tolerant:
+                    raise
+                resp_json = {"Feature": "", "Explanation": ""}
+            resp_json["index"] = -1
+            resp_json["Feature"] = [resp_json["Feature"]]
+            cost["Total Tokens"] = cb.total_tokens
+            cost["Prompt Tokens"] = cb.prompt_tokens
+            cost["Completion Tokens"] = cb.completion_tokens
+            cost["Total Cost (USD)"] = (
+                cb.total_cost
+            )  # 用了4o-mini以后变成0.0了，还没修改，也可以用户token乘单价计算
+        return {
+            "a_db": {"index": query_json["index"], "Feature": query_json["Feature"]},
+            "b_db": resp_json,
+            "cost": cost,
+        }
+
+    return map_one
+
+
 def rag_feature_mapping_llm_v1(
     version_id, search_k, a_db, b_db, feature_types, content_keys
 ):
@@ -186,26 +248,14 @@ def rag_feature_mapping_llm_v1(
         + str(version_id)
         + ".jsonl",
     )
-    # 读取被检索b_db的feature_type的embedding data
-    data_b = load_feature_knowledge_embedding(b_db, feature_types, content_keys)
-
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = Chroma.from_documents(data_b, embeddings)
-    if search_k == 0:
-        retriever = vectorstore.as_retriever()
-    else:
-        retriever = vectorstore.as_retriever(search_k=search_k)
+    # 被检索b_db的feature_type向量库（磁盘持久化，embedding data 未变时不重新向量化）
+    vectorstore = load_feature_vectorstore(b_db, feature_types, content_keys)
 
     # 获取a_db的feature_type所有feature
     data_a = load_feature_knowledge_embedding(a_db, feature_types, content_keys)
 
     with open(a_merge_feature_filename, "r", encoding="utf-8") as read_lines:
-        query_data = read_lines.readlines()
-
-    processed_lines_cnt = 0
-    if os.path.exists(dir_filename):
-        with open(dir_filename, "r", encoding="utf-8") as direct_file_r:
-            processed_lines_cnt = sum(1 for line in direct_file_r)
+        query_data = [json.loads(line) for line in read_lines]
 
     response_schemas = [
         ResponseSchema(
@@ -217,67 +267,31 @@ def rag_feature_mapping_llm_v1(
     ]
 
     output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    format_instructions = output_parser.get_format_instructions()
-    for query in query_data:
-        query_json = json.loads(query)
-        print(query_json["index"])
-        print("proce_line_cnt" + str(processed_lines_cnt))
-        if query_json["index"] < processed_lines_cnt:
-            continue
 
-        # 后70个
-        query_merged = """Use the following pieces of retrieved context to answer the question.
+    query_merged = """Use the following pieces of retrieved context to answer the question.
         Question: {question}
         Context: {context}
         Answer the mapping feature name and reason in json format:{{"Feature":"", "Explanation":"...."}}
         """
+    map_one = _llm_feature_mapper(
+        ChatPromptTemplate.from_template(query_merged), output_parser, tolerant=True
+    )
 
-        feature_name = ""
-        for item in query_json["Feature"]:
-            feature_name += item
-
-        prompt = ChatPromptTemplate.from_template(query_merged)
-        chain = (
-            {"context": retriever, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
-        cost = {}
-
-        with get_openai_callback() as cb:
-            resp = chain.invoke(
-                "About the feature "
-                + feature_name
-                + " in "
-                + a_db
-                + ", what is the similar feature in "
-                + b_db
-                + "?"
-            )
-            try:
-                resp_json = output_parser.parse(resp)
-            except Exception as e:
-                resp_json = {"Feature": "", "Explanation": ""}
-            resp_json["index"] = -1
-            resp_json["Feature"] = [resp_json["Feature"]]
-            cost["Total Tokens"] = cb.total_tokens
-            cost["Prompt Tokens"] = cb.prompt_tokens
-            cost["Completion Tokens"] = cb.completion_tokens
-            cost["Total Cost (USD)"] = (
-                cb.total_cost
-            )  # 用了4o-mini以后变成0.0了，还没修改，也可以用户token乘单价计算
-
-        mapping_result = {
-            "a_db": {"index": query_json["index"], "Feature": query_json["Feature"]},
-            "b_db": resp_json,
-            "cost": cost,
-        }
-
-        print(mapping_result)
-        with open(dir_filename, "a", encoding="utf-8") as a:
-            json.dump(mapping_result, a, ensure_ascii=False)
-            a.write("\n")
+    # 按 feature index 断点续跑：批量检索 + 并发 LLM 映射
+    mapper = BatchedFeatureMapper(dir_filename, vectorstore=vectorstore)
+    mapper.run(
+        query_data,
+        lambda query_json: (
+            "About the feature "
+            + "".join(query_json["Feature"])
+            + " in "
+            + a_db
+            + ", what is the similar feature in "
+            + b_db
+            + "?"
+        ),
+        map_one,
+    )
 
 
 def rag_feature_mapping_llm_v2(
@@ -307,26 +321,14 @@ def rag_feature_mapping_llm_v2(
         + str(version_id)
         + ".jsonl",
     )
-    # 读取被检索b_db的feature_type的embedding data
-    data_b = load_feature_knowledge_embedding(b_db, feature_types, content_keys)
-
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = Chroma.from_documents(data_b, embeddings)
-    if search_k == 0:
-        retriever = vectorstore.as_retriever()
-    else:
-        retriever = vectorstore.as_retriever(search_k=search_k)
+    # 被检索b_db的feature_type向量库（磁盘持久化，embedding data 未变时不重新向量化）
+    vectorstore = load_feature_vectorstore(b_db, feature_types, content_keys)
 
     # 获取a_db的feature_type所有feature
     data_a = load_feature_knowledge_embedding(a_db, feature_types, content_keys)
 
     with open(a_merge_feature_filename, "r", encoding="utf-8") as read_lines:
-        query_data = read_lines.readlines()
-
-    processed_lines_cnt = 0
-    if os.path.exists(dir_filename):
-        with open(dir_filename, "r", encoding="utf-8") as direct_file_r:
-            processed_lines_cnt = sum(1 for line in direct_file_r)
+        query_data = [json.loads(line) for line in read_lines]
 
     response_schemas = [
         ResponseSchema(
@@ -338,65 +340,32 @@ def rag_feature_mapping_llm_v2(
     ]
 
     output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    format_instructions = output_parser.get_format_instructions()
-    for query in query_data:
-        query_json = json.loads(query)
-        print(query_json["index"])
-        if query_json["index"] < processed_lines_cnt:
-            continue
 
-        # 后70个
-        query_merged = """Use the following pieces of retrieved context to answer the question.
+    query_merged = """Use the following pieces of retrieved context to answer the question.
         Question: {question}
         Context: {context}
         Answer the mapping feature name and reason in json format:{{"Feature":"", "Explanation":"...."}}
         """
+    map_one = _llm_feature_mapper(
+        ChatPromptTemplate.from_template(query_merged), output_parser, tolerant=False
+    )
 
-        feature_name = ""
-        for item in query_json["Feature"]:
-            feature_name += item
-        prompt = ChatPromptTemplate.from_template(query_merged)
-        chain = (
-            {"context": retriever, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
-
-        cost = {}
-        with get_openai_callback() as cb:
-            resp = chain.invoke(
-                "About the feature "
-                + feature_name
-                + " in "
-                + a_db
-                + ", what is the similar feature in "
-                + b_db
-                + "?"
-                + data_a[query_json["index"]].page_content
-            )
-
-            resp_json = output_parser.parse(resp)
-            resp_json["index"] = -1
-            resp_json["Feature"] = [resp_json["Feature"]]
-            cost["Total Tokens"] = cb.total_tokens
-            cost["Prompt Tokens"] = cb.prompt_tokens
-            cost["Completion Tokens"] = cb.completion_tokens
-            cost["Total Cost (USD)"] = (
-                cb.total_cost
-            )  # 用了4o-mini以后变成0.0了，还没修改，也可以用户token乘单价计算
-
-        mapping_result = {
-            "a_db": {"index": query_json["index"], "Feature": query_json["Feature"]},
-            "b_db": resp_json,
-            "cost": cost,
-        }
-
-        print(mapping_result)
-
-        with open(dir_filename, "a", encoding="utf-8") as a:
-            json.dump(mapping_result, a, ensure_ascii=False)
-            a.write("\n")
+    # 按 feature index 断点续跑：批量检索 + 并发 LLM 映射
+    mapper = BatchedFeatureMapper(dir_filename, vectorstore=vectorstore)
+    mapper.run(
+        query_data,
+        lambda query_json: (
+            "About the feature "
+            + "".join(query_json["Feature"])
+            + " in "
+            + a_db
+            + ", what is the similar feature in "
+            + b_db
+            + "?"
+            + data_a[query_json["index"]].page_content
+        ),
+        map_one,
+    )
 
 
 def rag_feature_mapping_llm_v3(
@@ -425,23 +394,12 @@ def rag_feature_mapping_llm_v3(
         + str(version_id)
         + ".jsonl",
     )
-    # 读取被检索b_db的feature_type的embedding data
-    data_b = load_feature_knowledge_embedding(b_db, feature_types, content_keys)
-
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = Chroma.from_documents(data_b, embeddings)
-    retriever = vectorstore.as_retriever()
 
     # 获取a_db的feature_type所有feature
     data_a = load_feature_knowledge_embedding(a_db, feature_types, content_keys)
 
     with open(a_merge_feature_filename, "r", encoding="utf-8") as read_lines:
-        query_data = read_lines.readlines()
-
-    processed_lines_cnt = 0
-    if os.path.exists(dir_filename):
-        with open(dir_filename, "r", encoding="utf-8") as direct_file_r:
-            processed_lines_cnt = sum(1 for line in direct_file_r)
+        query_data = [json.loads(line) for line in read_lines]
 
     response_schemas = [
         ResponseSchema(
@@ -453,57 +411,30 @@ def rag_feature_mapping_llm_v3(
     ]
 
     output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    format_instructions = output_parser.get_format_instructions()
-    for query in query_data:
-        query_json = json.loads(query)
-        print(query_json["index"])
-        if query_json["index"] < processed_lines_cnt:
-            continue
 
-        # 后70个
-        query_merged = """Use the following pieces of retrieved context to answer the question.
+    query_merged = """Use the following pieces of retrieved context to answer the question.
         Question: {question}
         Answer the mapping feature name and reason in json format:{{"Feature":"", "Explanation":"...."}}
         """
+    map_one = _llm_feature_mapper(
+        ChatPromptTemplate.from_template(query_merged), output_parser, tolerant=False
+    )
 
-        feature_name = ""
-        for item in query_json["Feature"]:
-            feature_name += item
-        prompt = ChatPromptTemplate.from_template(query_merged)
-        chain = {"question": RunnablePassthrough()} | prompt | llm | StrOutputParser()
-
-        cost = {}
-        with get_openai_callback() as cb:
-            resp = chain.invoke(
-                "About the feature "
-                + feature_name
-                + " in "
-                + a_db
-                + ", what is the similar feature in "
-                + b_db
-                + "?"
-            )
-            resp_json = output_parser.parse(resp)
-            resp_json["index"] = -1
-            resp_json["Feature"] = [resp_json["Feature"]]
-            cost["Total Tokens"] = cb.total_tokens
-            cost["Prompt Tokens"] = cb.prompt_tokens
-            cost["Completion Tokens"] = cb.completion_tokens
-            cost["Total Cost (USD)"] = (
-                cb.total_cost
-            )  # 用了4o-mini以后变成0.0了，还没修改，也可以用户token乘单价计算
-
-        mapping_result = {
-            "a_db": {"index": query_json["index"], "Feature": query_json["Feature"]},
-            "b_db": resp_json,
-            "cost": cost,
-        }
-
-        print(mapping_result)
-
-        with open(dir_filename, "a", encoding="utf-8") as a:
-            json.dump(mapping_result, a, ensure_ascii=False)
-            a.write("\n")
+    # 按 feature index 断点续跑：该版本不使用检索上下文，仅并发 LLM 映射
+    mapper = BatchedFeatureMapper(dir_filename, vectorstore=None)
+    mapper.run(
+        query_data,
+        lambda query_json: (
+            "About the feature "
+            + "".join(query_json["Feature"])
+            + " in "
+            + a_db
+            + ", what is the similar feature in "
+            + b_db
+            + "?"
+        ),
+        map_one,
+    )
 
 
 def rag_feature_mapping_llm_v4(
@@ -533,15 +464,8 @@ def rag_feature_mapping_llm_v4(
         + str(version_id)
         + ".jsonl",
     )
-    # 读取被检索b_db的feature_type的embedding data
-    data_b = load_feature_knowledge_embedding(b_db, feature_types, content_keys)
-
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = Chroma.from_documents(data_b, embeddings)
-    if search_k == 0:
-        retriever = vectorstore.as_retriever()
-    else:
-        retriever = vectorstore.as_retriever(search_k=search_k)
+    # 被检索b_db的feature_type向量库（磁盘持久化，embedding data 未变时不重新向量化）
+    vectorstore = load_feature_vectorstore(b_db, feature_types, content_keys)
 
     # 获取a_db的feature_type所有feature
     data_a = load_feature_knowledge_embedding(a_db, feature_types, content_keys)
@@ -553,7 +477,7 @@ def rag_feature_mapping_llm_v4(
         "..", "..", "FeatureKnowledgeBase", a_db, "RAG_Embedding_Data", names + ".jsonl"
     )
     with open(merge_feature_filename, "r", encoding="utf-8") as read_lines:
-        query_data = read_lines.readlines()
+        query_data = [json.loads(line) for line in read_lines]
 
     b_names = "merge"
     for feature_type in feature_types:
@@ -569,40 +493,14 @@ def rag_feature_mapping_llm_v4(
     with open(b_merge_feature_filename, "r", encoding="utf-8") as read_lines:
         b_query_data = read_lines.readlines()
 
-    processed_lines_cnt = 0
-    if os.path.exists(dir_filename):
-        with open(dir_filename, "r", encoding="utf-8") as direct_file_r:
-            processed_lines_cnt = sum(1 for line in direct_file_r)
-
-    for query in query_data:
-        query_json = json.loads(query)
-        print(query_json["index"])
-        print(query_json)
-        if query_json["index"] < processed_lines_cnt:
-            continue
-
-        feature_name = ""
-        for item in query_json["Feature"]:
-            feature_name += item
-
+    def map_top1(query_json, question, docs):
         cost = {}
         with get_openai_callback() as cb:
-            query_temp = (
-                "About the feature "
-                + feature_name
-                + " in "
-                + a_db
-                + ", which feature has most similar function in "
-                + b_db
-                + "?"
-            )
-            docs = retriever.get_relevant_documents(query_temp)
             # 提取文档内容字符串
             if docs:  # 检查是否有返回结果
                 top_doc_content = docs[0].page_content  # 获取第一个文档的内容
             else:
                 top_doc_content = "-1:"
-            print(top_doc_content)
             index_temp = int(top_doc_content.split(":")[1].strip())
             feature_temp = json.loads(b_query_data[index_temp])["Feature"]
             cost["Total Tokens"] = cb.total_tokens
@@ -611,23 +509,194 @@ def rag_feature_mapping_llm_v4(
             cost["Total Cost (USD)"] = (
                 cb.total_cost
             )  # 用了4o-mini以后变成0.0了，还没修改，也可以用户token乘单价计算
-            mapping_result = {
-                "a_db": {
-                    "index": query_json["index"],
-                    "Feature": query_json["Feature"],
-                },
-                "b_db": {
-                    "index": index_temp,
-                    "Feature": feature_temp,
-                    "Explanation": "",
-                },
-                "cost": cost,
-            }
-
-        print(mapping_result)
-        with open(dir_filename, "a", encoding="utf-8") as a:
-            json.dump(mapping_result, a, ensure_ascii=False)
-            a.write("\n")
+        return {
+            "a_db": {
+                "index": query_json["index"],
+                "Feature": query_json["Feature"],
+            },
+            "b_db": {
+                "index": index_temp,
+                "Feature": feature_temp,
+                "Explanation": "",
+            },
+            "cost": cost,
+        }
+
+    # 按 feature index 断点续跑：批量检索后直接取 top1
+    mapper = BatchedFeatureMapper(dir_filename, vectorstore=vectorstore)
+    mapper.run(
+        query_data,
+        lambda query_json: (
+            "About the feature "
+            + "".join(query_json["Feature"])
+            + " in "
+            + a_db
+            + ", which feature has most similar function in "
+            + b_db
+            + "?"
+        ),
+        map_top1,
+    )
+
+
+def _candidate_sources(a_db, b_db, feature_types, content_keys, embedder):
+    """候选文件依赖的 a_db / b_db 知识库文件版本；文件缺失时返回 None（需要重建）。"""
+    try:
+        return candidate_sources(
+            [
+                feature_type_merge(a_db, feature_types),
+                feature_embedding_filename(a_db, feature_types, content_keys),
+            ],
+            [
+                feature_type_merge(b_db, feature_types),
+                feature_embedding_filename(b_db, feature_types, content_keys),
+            ],
+            embedder,
+        )
+    except OSError:
+        return None
+
+
+def rag_feature_mapping_candidates(
+    a_db, b_db, feature_types, content_keys, top_k=DEFAULT_TOP_K
+):
+    """离线计算 a_db 每个特征在 b_db 中的 top-k 相似候选（嵌入矩阵 .npy + 分块矩阵乘），写入候选文件。"""
+    for feature_type in feature_types:
+        feature_knowledge_merge(a_db, feature_type)
+        feature_knowledge_merge(b_db, feature_type)
+    a_merge_feature_filename = feature_type_merge(a_db, feature_types)
+    b_merge_feature_filename = feature_type_merge(b_db, feature_types)
+
+    embedder = get_local_embedder("all-MiniLM-L6-v2")
+    matrices = []
+    for db in (a_db, b_db):
+        data = load_feature_knowledge_embedding(db, feature_types, content_keys)
+        matrices.append(
+            load_embedding_matrix(
+                feature_embedding_filename(db, feature_types, content_keys),
+                [doc.page_content for doc in data],
+                embedder,
+            )
+        )
+    indices, scores = topk_cosine(matrices[0], matrices[1], top_k)
+
+    records = []
+    for merge_filename in (a_merge_feature_filename, b_merge_feature_filename):
+        with open(merge_filename, "r", encoding="utf-8") as read_lines:
+            records.append([json.loads(line) for line in read_lines])
+    candidates = build_candidate_lists(records[0], records[1], indices, scores)
+    candidates_filename = candidate_filename(
+        os.path.join("..", "..", "RAG_Feature_Mapping"),
+        a_db,
+        b_db,
+        feature_types[0],
+        top_k,
+    )
+    sources = _candidate_sources(a_db, b_db, feature_types, content_keys, embedder)
+    write_candidate_lists(candidates, candidates_filename, sources)
+    print(f"📋 候选列表已写入 {candidates_filename}（{len(candidates)} 个特征）")
+    return candidates_filename
+
+
+def rag_feature_mapping_llm_v5(
+    version_id, search_k, a_db, b_db, feature_types, content_keys
+):
+    """离线 top-k 候选代替逐条检索，LLM 只需从候选中确认映射特征。search_k 为候选个数（0 取默认值）。"""
+    top_k = search_k or DEFAULT_TOP_K
+    candidates_filename = candidate_filename(
+        os.path.join("..", "..", "RAG_Feature_Mapping"),
+        a_db,
+        b_db,
+        feature_types[0],
+        top_k,
+    )
+    # 知识库（merge / embedding 文件）变化后候选中的 index 会失效，按记录的内容哈希判断是否重建
+    if not os.path.exists(candidates_filename) or not candidate_sources_match(
+        candidates_filename,
+        _candidate_sources(
+            a_db,
+            b_db,
+            feature_types,
+            content_keys,
+            get_local_embedder("all-MiniLM-L6-v2"),
+        ),
+    ):
+        rag_feature_mapping_candidates(a_db, b_db, feature_types, content_keys, top_k)
+    candidates = read_candidate_lists(candidates_filename)
+    a_merge_feature_filename = feature_type_merge(a_db, feature_types)
+
+    dir_filename = os.path.join(
+        "..",
+        "..",
+        "RAG_Feature_Mapping",
+        a_db,
+        feature_types[0],
+        a_db
+        + "_mapping_"
+        + b_db
+        + "_k"
+        + str(search_k)
+        + "_"
+        + str(version_id)
+        + ".jsonl",
+    )
+    # 候选文档与 Chroma 检索返回的文档内容一致
+    data_b = load_feature_knowledge_embedding(b_db, feature_types, content_keys)
+
+    with open(a_merge_feature_filename, "r", encoding="utf-8") as read_lines:
+        query_data = [json.loads(line) for line in read_lines]
+
+    response_schemas = [
+        ResponseSchema(
+            type="string", name="Feature", description="The mapping feature name"
+        ),
+        ResponseSchema(
+            type="string", name="Explanation", description="Explain the mapping reason."
+        ),
+    ]
+
+    output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
+
+    query_merged = """Use the following candidate features to answer the question. Choose the most similar one from the candidates.
+        Question: {question}
+        Context: {context}
+        Answer the mapping feature name and reason in json format:{{"Feature":"", "Explanation":"...."}}
+        """
+    map_one = _llm_feature_mapper(
+        ChatPromptTemplate.from_template(query_merged), output_parser, tolerant=True
+    )
+
+    def confirm_candidate(query_json, question, docs):
+        mapping_result = map_one(query_json, question, docs)
+        # LLM 选中的特征若在候选中，回填其 b_db index
+        chosen = "".join(mapping_result["b_db"]["Feature"]).split("(")[0].lower().strip()
+        for candidate in candidates.get(query_json["index"], []):
+            name = "".join(candidate["Feature"]).split("(")[0].lower().strip()
+            if chosen and name == chosen:
+                mapping_result["b_db"]["index"] = candidate["index"]
+                break
+        return mapping_result
+
+    # 按 feature index 断点续跑：候选列表代替检索，并发 LLM 确认
+    mapper = BatchedFeatureMapper(
+        dir_filename,
+        retrieve_fn=lambda records, questions: [
+            [data_b[c["index"]] for c in candidates.get(r["index"], [])] for r in records
+        ],
+    )
+    mapper.run(
+        query_data,
+        lambda query_json: (
+            "About the feature "
+            + "".join(query_json["Feature"])
+            + " in "
+            + a_db
+            + ", what is the similar feature in "
+            + b_db
+            + "?"
+        ),
+        confirm_candidate,
+    )
 
 
 def rag_feature_mapping_llm(
@@ -650,6 +719,10 @@ def rag_feature_mapping_llm(
         rag_feature_mapping_llm_v4(
             version_id, search_k, a_db, b_db, feature_types, content_keys
         )
+    elif version_id == 5:
+        rag_feature_mapping_llm_v5(
+            version_id, search_k, a_db, b_db, feature_types, content_keys
+        )
 
 
 def rag_feature_mapping_llm_temp(version_id, a_db, b_db, feature_types, content_keys):
@@ -669,23 +742,14 @@ def rag_feature_mapping_llm_temp(version_id, a_db, b_db, feature_types, content_
         a_db,
         a_db + "_mapping_" + b_db + "_" + str(version_id) + ".jsonl",
     )
-    # 读取被检索b_db的feature_type的embedding data
-    data_b = load_feature_knowledge_embedding(b_db, feature_types, content_keys)
-
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = Chroma.from_documents(data_b, embeddings)
-    retriever = vectorstore.as_retriever()
+    # 被检索b_db的feature_type向量库（磁盘持久化，embedding data 未变时不重新向量化）
+    vectorstore = load_feature_vectorstore(b_db, feature_types, content_keys)
 
     # 获取a_db的feature_type所有feature
     data_a = load_feature_knowledge_embedding(a_db, feature_types, content_keys)
 
     with open(a_merge_feature_filename, "r", encoding="utf-8") as read_lines:
-        query_data = read_lines.readlines()
-
-    processed_lines_cnt = 0
-    if os.path.exists(dir_filename):
-        with open(dir_filename, "r", encoding="utf-8") as direct_file_r:
-            processed_lines_cnt = sum(1 for line in direct_file_r)
+        query_data = [json.loads(line) for line in read_lines]
 
     response_schemas = [
         ResponseSchema(
@@ -697,70 +761,32 @@ def rag_feature_mapping_llm_temp(version_id, a_db, b_db, feature_types, content_
     ]
 
     output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    format_instructions = output_parser.get_format_instructions()
-    for query in query_data:
-        query_json = json.loads(query)
-        print(query_json["index"])
-        if query_json["index"] < processed_lines_cnt:
-            continue
 
-        # 后70个
-        query_merged = """Use the following pieces of retrieved context to answer the question.
+    query_merged = """Use the following pieces of retrieved context to answer the question.
         Question: {question}
         Context: {context}
         Answer the mapping feature name and reason in json format:{{"Feature":"", "Explanation":"...."}}
         """
+    map_one = _llm_feature_mapper(
+        ChatPromptTemplate.from_template(query_merged), output_parser, tolerant=False
+    )
 
-        feature_name = ""
-        for item in query_json["Feature"]:
-            feature_name += item
-        prompt = ChatPromptTemplate.from_template(query_merged)
-        chain = (
-            {"context": retriever, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
-
-        cost = {}
-        with get_openai_callback() as cb:
-            resp = chain.invoke(
-                "关于"
-                + a_db
-                + "中的feature "
-                + feature_name
-                + "，"
-                + b_db
-                + "中与之功能相似的feature名称是什么？"
-                + data_a[query_json["index"]].page_content
-            )
-
-            """
-            resp = chain.invoke(
-                "About the feature " + feature_name + " in " + a_db + ", what is the similar feature in " + b_db +"?"
-            )
-            """
-            resp_json = output_parser.parse(resp)
-            resp_json["index"] = -1
-            resp_json["Feature"] = [resp_json["Feature"]]
-            cost["Total Tokens"] = cb.total_tokens
-            cost["Prompt Tokens"] = cb.prompt_tokens
-            cost["Completion Tokens"] = cb.completion_tokens
-            cost["Total Cost (USD)"] = (
-                cb.total_cost
-            )  # 用了4o-mini以后变成0.0了，还没修改，也可以用户token乘单价计算
-
-        mapping_result = {
-            "a_db": {"index": query_json["index"], "Feature": query_json["Feature"]},
-            "b_db": resp_json,
-            "cost": cost,
-        }
-
-        print(mapping_result)
-
-        with open(dir_filename, "a", encoding="utf-8") as a:
-            json.dump(mapping_result, a, ensure_ascii=False)
-            a.write("\n")
+    # 按 feature index 断点续跑：批量检索 + 并发 LLM 映射
+    mapper = BatchedFeatureMapper(dir_filename, vectorstore=vectorstore)
+    mapper.run(
+        query_data,
+        lambda query_json: (
+            "关于"
+            + a_db
+            + "中的feature "
+            + "".join(query_json["Feature"])
+            + "，"
+            + b_db
+            + "中与之功能相似的feature名称是什么？"
+            + data_a[query_json["index"]].page_content
+        ),
+        map_one,
+    )
 
 
 def rag_feature_mapping_process(
@@ -800,10 +826,15 @@ def rag_feature_mapping_process(
         + "_processed"
         + ".jsonl",
     )
-    processed_lines_cnt = 0
+    # 续跑：按已处理的 a_db feature index 跳过（而不是按行数，避免结果缺口导致错位）
+    processed_indexes = set()
     if os.path.exists(processed_dir_filename):
         with open(processed_dir_filename, "r", encoding="utf-8") as direct_file_r:
-            processed_lines_cnt = sum(1 for line in direct_file_r)
+            for line in direct_file_r:
+                try:
+                    processed_indexes.add(json.loads(line)["a_db"]["index"])
+                except (ValueError, KeyError, TypeError):
+                    continue
 
     a_names = "merge"
     for feature_type in feature_types:
@@ -831,10 +862,11 @@ def rag_feature_mapping_process(
     mapping_success_cnt = 0
     mapping_fail_cnt = {}
     mapping_category_cnt = {}
+    vectorstore = None
     for line in lines:
         value = json.loads(line)
         value_origin = value
-        if value["a_db"]["index"] < processed_lines_cnt:
+        if value["a_db"]["index"] in processed_indexes:
             continue
         print(value["a_db"]["index"])
 
@@ -875,9 +907,9 @@ def rag_feature_mapping_process(
             # print(b_db_feature)
 
             # 该feature未成功完全匹配到mapping feature：进行RAG相似度检索，取k=1
-            data_b = load_feature_knowledge_embedding(b_db, feature_types, ["Feature"])
-            embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-            vectorstore = Chroma.from_documents(data_b, embeddings)
+            if vectorstore is None:
+                # 整个循环只打开一次 b_db 向量库
+                vectorstore = load_feature_vectorstore(b_db, feature_types, ["Feature"])
             retriever = vectorstore.as_retriever()
             # 查询检索器并获取最相似的文档
             query = (
@@ -17,7 +17,7 @@ import json
 import os
 import sqlglot
 import re
-from src.Tools.DatabaseConnect.database_connector import exec_sql_statement
+import threading
 from langchain.prompts import ChatPromptTemplate
 from langchain.chat_models import ChatOpenAI
 from langchain.output_parsers import ResponseSchema
@@ -26,6 +26,12 @@ from langchain.chains import ConversationChain
 from langchain.callbacks import get_openai_callback
 from langchain.memory import ConversationBufferMemory
 from src.DialectRecognition.TokenType_not_op import TokenType_not_op
+from src.DialectRecognition.dialect_probe import probe_dialect_support, probe_stats
+from src.DialectRecognition.feature_index import (
+    feature_record_name,
+    get_feature_record_index,
+)
+from src.Tools.sql_analysis import analyze_sql
 
 
 effective_sqls_generator_v2_skip = [
@@ -57,9 +63,8 @@ effective_sqls_generator_v2_skip = [
 
 
 def tokenize_sql(sql):
-    """对 SQL 进行分词，返回 sqlglot 的 token 列表。"""
-    lists = sqlglot.tokenize(sql)
-    return lists
+    """对 SQL 进行分词，返回 sqlglot 的 token 列表（共享分析缓存中的结果，勿修改）。"""
+    return analyze_sql(sql).tokens
 
 
 # 判断枚举成员的名称
@@ -68,9 +73,9 @@ def is_member_name(name):
     return name in TokenType_not_op.__members__
 
 
-def potential_features_refiner_single_sql(origin_sql):
-    """识别单条 SQL 的潜在函数与操作符特征，返回对应下标与名称列表。"""
-    lists = tokenize_sql(origin_sql)  # 利用sqlglot分词函数得到origin_sql的分词列表
+def _refine_potential_features(analysis):
+    """在分词结果上识别潜在函数与操作符，结果挂在共享的 SQLAnalysis 上。"""
+    lists = analysis.tokens  # 利用sqlglot分词函数得到origin_sql的分词列表
     val_indexes = []  # 类型为VAL的分词的下标
     function_name_indexes = []  # potential functions的分词的下标
     operator_indexes = []  # potential functions的分词的下标
@@ -100,6 +105,18 @@ def potential_features_refiner_single_sql(origin_sql):
             function_name_indexes.append(VAL_index)
             function_names.append(lists[VAL_index].text)
 
+    return function_name_indexes, operator_indexes, function_names, operators
+
+
+def potential_features_refiner_single_sql(origin_sql):
+    """识别单条 SQL 的潜在函数与操作符特征，返回对应下标与名称列表。"""
+    refined = analyze_sql(origin_sql).derived(
+        "potential_features", _refine_potential_features
+    )
+    function_name_indexes, operator_indexes, function_names, operators = (
+        list(item) for item in refined
+    )
+
     print(origin_sql)
     """
     for item in lists:
@@ -177,28 +194,14 @@ def potential_dialect_features_process_and_map(
         "RAG_Embedding_Data",
         names + ".jsonl",
     )
-    with open(a_merge_feature_filename, "r", encoding="utf-8") as r:
-        a_merge_features = r.readlines()
+    # 持久化的行偏移 + 特征名索引（mmap），只解析命中的记录
+    a_merge_features = get_feature_record_index(a_merge_feature_filename)
 
     # 获取a_db -> b_db的预先搭建好的mapping结果
-    features_mapping_filename = os.path.join(
-        "..",
-        "..",
-        "RAG_Feature_Mapping",
-        a_db,
-        feature_types[0],
-        a_db
-        + "_mapping_"
-        + b_db
-        + "_k"
-        + str(search_k)
-        + "_"
-        + str(version_id)
-        + "_processed"
-        + ".jsonl",
+    features_mapping_filename = feature_mapping_filename(
+        a_db, b_db, feature_types[0], search_k, version_id
     )
-    with open(features_mapping_filename, "r", encoding="utf-8") as r:
-        mapping_info = r.readlines()
+    mapping_info = get_feature_record_index(features_mapping_filename, with_names=False)
 
     # 获取测试文件的数据内容
     if os.path.exists(dir_filename):
@@ -236,47 +239,44 @@ def potential_dialect_features_process_and_map(
             feature_name = str(lists[index].text)
             feature_searched_index = None
             # 在a_db的feature knowledge base processed中检索到该feature
-            for line in a_merge_features:
-                a_feature = json.loads(line)
-                a_feature_Feature = ""
-                for item in a_feature["Feature"]:
-                    a_feature_Feature += item
-                if (
-                    str(feature_name).lower().strip()
-                    in a_feature_Feature.split("(")[0].lower().strip()
-                ):
-                    feature_searched_index = a_feature["index"]
-                    break
+            line_no = a_merge_features.find_feature(feature_name)
+            if line_no is not None:
+                feature_searched_index = a_merge_features.record_at_line(line_no)[
+                    "index"
+                ]
             # 若未检索到该feature，先认为该feature为方言；若检索到该feature，选出最短的一个example sql作为方言检测example sql。
             if feature_searched_index:
                 # 成功检索到，获取该feature的example信息
-                feature_searched_content = json.loads(
-                    a_merge_features[feature_searched_index]
+                feature_searched_content = a_merge_features.record_at_line(
+                    feature_searched_index
                 )
                 # 选择最短的sql作为方言检测sql
                 effective_sqls = feature_searched_content["Examples"]
                 if len(effective_sqls):
                     dialect_recognize_sql = min(effective_sqls, key=len)
                     # 在b_db引擎上执行该方言检测example sql，若无法执行则认为是dialect（虽然其中可能包括由于example sql中其他feature造成的无法执行，这里暂且粗略认为是方言）。
-                    exec_result, exec_time, error_message = exec_sql_statement(
-                        tool, b_db, dialect_recognize_sql
+                    # 同一 (feature, b_db, 版本) 的探测结果持久化复用
+                    supported, _ = probe_dialect_support(
+                        tool,
+                        "temp",
+                        b_db,
+                        dialect_recognize_sql,
+                        feature=feature_record_name(feature_searched_content),
                     )
 
-                    if exec_result == None:
+                    if not supported:
                         # 说明无法执行
                         dialect_features_cnt += 1
                         potential_dialect.append(feature_name)
                         # 为方言添加对应的mapping index
                         print(feature_searched_content)
+                        mapping_record = mapping_info.record_at_line(
+                            feature_searched_index
+                        )
                         potential_dialect_mapping_index.append(
-                            [
-                                feature_searched_index,
-                                json.loads(mapping_info[feature_searched_index])[
-                                    "b_db"
-                                ]["index"],
-                            ]
+                            [feature_searched_index, mapping_record["b_db"]["index"]]
                         )
-                        print(json.loads(mapping_info[feature_searched_index]))
+                        print(mapping_record)
                     else:
                         not_dialect_features_cnt += 1
                         not_potential_dialect.append(feature_name)
@@ -319,6 +319,9 @@ def potential_dialect_features_process_and_map(
     print("feature在knowledge base中检索失败的个数" + str(features_searched_fail_cnt))
     print("feature中方言的个数" + str(dialect_features_cnt))
     print("feature中非方言的个数" + str(not_dialect_features_cnt))
+    print(
+        "方言探测实际执行 {executed} 次，缓存命中 {cached} 次".format(**probe_stats)
+    )
 
     print(not_dialects)
 
@@ -334,7 +337,24 @@ def sqlancer_potential_dialect_features_process_and_map(
     """
     potential_dialect_mapping_index = []  # 存储potential dialect map的feature
     # 获取a_db -> b_db的预先搭建好的mapping结果
-    features_mapping_filename = os.path.join(
+    features_mapping_filename = feature_mapping_filename(
+        a_db, b_db, feature_type, search_k, version_id
+    )
+    mapping_index = load_feature_mapping_index(features_mapping_filename)
+    if not mapping_index:
+        return potential_dialect_mapping_index
+
+    # 处理potential features，按函数名在索引中查找mapping结果
+    for dialect in potential_dialect:
+        mapping = mapping_index.get(str(dialect).lower().strip())
+        if mapping is not None:
+            # 为方言添加对应的mapping index
+            potential_dialect_mapping_index.append(list(mapping))
+    return potential_dialect_mapping_index
+
+
+def feature_mapping_filename(a_db, b_db, feature_type, search_k=0, version_id=1):
+    return os.path.join(
         "..",
         "..",
         "RAG_Feature_Mapping",
@@ -350,30 +370,51 @@ def sqlancer_potential_dialect_features_process_and_map(
         + "_processed"
         + ".jsonl",
     )
-    if not os.path.exists(features_mapping_filename):
-        return potential_dialect_mapping_index
-    with open(features_mapping_filename, "r", encoding="utf-8") as r:
-        mapping_info = r.readlines()
 
-    # 处理potential features，获取potential dialect features和mapping结果
 
-    for dialect in potential_dialect:
-        map_searched_index = None
-        # 在a_db -> b_db的预先搭建好的mapping结果中进行检索
-        for info in mapping_info:
-            map = json.loads(info)
-            a_feature_Feature = ""
-            for item in map["a_db"]["Feature"]:
-                a_feature_Feature += item
-            dialect_str = str(dialect).lower().strip()
-            a_feature_str = a_feature_Feature.split("(")[0].lower().strip()
-            if a_feature_str.startswith(dialect_str + "("):
-                # 为方言添加对应的mapping index
-                potential_dialect_mapping_index.append(
-                    [map["a_db"]["index"], map["b_db"]["index"]]
-                )
-                break
-    return potential_dialect_mapping_index
+# (mapping 文件绝对路径, mtime) -> {小写函数名: (a_db index, b_db index)}
+_feature_mapping_indexes = {}
+_feature_mapping_lock = threading.Lock()
+
+
+def build_feature_mapping_index(lines):
+    """
+    由 mapping jsonl 行构建前缀索引：Feature 中每个写法在 "(" 之前的小写函数名 -> mapping 对。
+    同名以文件中第一次出现的为准（与逐行检索命中第一条后 break 的行为一致）。
+    """
+    index = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        map = json.loads(line)
+        pair = (map["a_db"]["index"], map["b_db"]["index"])
+        for item in map["a_db"]["Feature"]:
+            name = str(item).split("(")[0].lower().strip()
+            if name:
+                index.setdefault(name, pair)
+    return index
+
+
+def load_feature_mapping_index(features_mapping_filename):
+    """加载（并在进程内缓存）mapping 文件的函数名索引；文件更新后自动重建，不存在时返回空索引。"""
+    path = os.path.abspath(features_mapping_filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    key = (path, mtime)
+    index = _feature_mapping_indexes.get(key)
+    if index is None:
+        with _feature_mapping_lock:
+            index = _feature_mapping_indexes.get(key)
+            if index is None:
+                with open(path, "r", encoding="utf-8") as r:
+                    index = build_feature_mapping_index(r)
+                # 同一路径只保留最新版本
+                for stale in [k for k in _feature_mapping_indexes if k[0] == path]:
+                    del _feature_mapping_indexes[stale]
+                _feature_mapping_indexes[key] = index
+    return index
 
 
 def potential_dialect_features_recognizer(
@@ -0,0 +1,189 @@
+"""
+方言探测：在目标数据库上执行 example SQL 判断是否支持，结果按 (feature, 目标库, 版本) 持久化缓存
+
+作用概述：
+- 方言识别用 feature 最短的 example SQL 在 b_db 上试执行，执行无错误即“非方言”。
+- 只有确定的结论才落盘：执行成功，或语法错误/未知函数等确定性报错；
+  连接断开、锁超时等偶发错误不缓存，下次重新探测。
+- 对同一目标库同一服务端版本，结论是稳定的：结果写入 SQLite（默认 Output/dialect_probe_cache.sqlite），
+  之后的运行（以及同一进程内的重复探测）不再访问数据库。
+- 目标库版本在每个进程内查询一次（SELECT version() 等），作为缓存键的一部分；
+  版本查询失败时不落盘，避免把连接失败记成“不支持”。
+- tools/warm_dialect_probe_cache.py 可预先并行探测整个知识库。
+
+环境变量：
+- QTRAN_PROBE_CACHE: on(默认) | off（off 时仅进程内缓存）
+- QTRAN_PROBE_CACHE_PATH: 缓存文件路径
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from src.Tools.DatabaseConnect.database_connector import exec_sql_statement
+
+current_file_path = os.path.abspath(__file__)
+current_dir = os.path.dirname(current_file_path)
+
+DEFAULT_PROBE_CACHE_PATH = os.path.join(
+    current_dir, "..", "..", "Output", "dialect_probe_cache.sqlite"
+)
+
+# 各数据库查询服务端版本的语句
+VERSION_QUERIES = {
+    "mysql": "SELECT VERSION();",
+    "mariadb": "SELECT VERSION();",
+    "tidb": "SELECT VERSION();",
+    "tdsql": "SELECT VERSION();",
+    "postgres": "SELECT version();",
+    "sqlite": "SELECT sqlite_version();",
+    "duckdb": "SELECT version();",
+    "clickhouse": "SELECT version();",
+    "monetdb": "SELECT value FROM sys.env() WHERE name = 'monet_version';",
+}
+
+# 表示“目标库确定不支持该写法”的错误（语法错误、未知函数/运算符/类型）；
+# 其余错误（连接断开、锁超时、缺少临时表等）视为偶发，不写入缓存
+DEFINITE_REJECTION_PATTERNS = re.compile(
+    r"syntax"
+    r"|parser error"
+    r"|no such (function|operator|unary operator|binary operator|type)"
+    r"|unknown (function|data ?type|type|aggregate function|operator)"
+    r"|(function|operator|type|aggregate)\b.*\bdoes not exist"
+    r"|does not exist.*\b(function|operator)"
+    r"|not supported|unsupported|not implemented",
+    re.IGNORECASE,
+)
+
+_versions = {}
+_probe_results = {}
+_lock = threading.Lock()
+probe_stats = {"executed": 0, "cached": 0}
+
+
+class ProbeResultStore:
+    """SQLite 持久化的探测结果表（线程安全）。"""
+
+    def __init__(self, path=None):
+        self.path = os.path.abspath(
+            path or os.environ.get("QTRAN_PROBE_CACHE_PATH") or DEFAULT_PROBE_CACHE_PATH
+        )
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dialect_probe (
+                target_db TEXT NOT NULL,
+                server_version TEXT NOT NULL,
+                feature TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                supported INTEGER NOT NULL,
+                probed_at REAL,
+                PRIMARY KEY (target_db, server_version, feature, sql)
+            )
+            """
+        )
+
+    def get(self, target_db, server_version, feature, sql):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT supported FROM dialect_probe WHERE target_db = ? AND "
+                "server_version = ? AND feature = ? AND sql = ?",
+                (target_db, server_version, feature, sql),
+            ).fetchone()
+        return None if row is None else bool(row[0])
+
+    def put(self, target_db, server_version, feature, sql, supported):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dialect_probe"
+                "(target_db, server_version, feature, sql, supported, probed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (target_db, server_version, feature, sql, int(supported), time.time()),
+            )
+
+    def count(self, target_db=None):
+        with self._lock:
+            if target_db is None:
+                return self._conn.execute("SELECT COUNT(*) FROM dialect_probe").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM dialect_probe WHERE target_db = ?", (target_db,)
+            ).fetchone()[0]
+
+
+_store = None
+
+
+def get_probe_result_store():
+    """进程级共享的持久化缓存；QTRAN_PROBE_CACHE=off 时返回 None。"""
+    global _store
+    if os.environ.get("QTRAN_PROBE_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    with _lock:
+        if _store is None:
+            _store = ProbeResultStore()
+        return _store
+
+
+def get_server_version(tool, exp, dbType):
+    """查询并缓存目标库的服务端版本串，失败时返回 "unknown"（不缓存，下次重试）。"""
+    key = (tool, str(dbType).lower())
+    if key in _versions:
+        return _versions[key]
+    query = VERSION_QUERIES.get(str(dbType).lower())
+    version = "unknown"
+    if query:
+        result, _, error = exec_sql_statement(tool, exp, dbType, query)
+        if not error and result:
+            row = result[0]
+            version = str(row[0] if isinstance(row, (list, tuple)) else row)
+            with _lock:
+                _versions[key] = version
+    return version
+
+
+def probe_dialect_support(tool, exp, dbType, sql, feature="", before_execute=None):
+    """
+    在目标库上探测 example SQL 是否可执行，返回 (可执行, 服务端版本)。
+    同一 (feature, 目标库, 版本, SQL) 只实际执行一次，结果跨运行复用。
+    before_execute: 未命中缓存、即将真正执行 SQL 前的回调（如重置探测库，避免 DDL 示例互相影响）。
+    """
+    target_db = str(dbType).lower()
+    version = get_server_version(tool, exp, dbType)
+    key = (target_db, version, feature, sql)
+    with _lock:
+        cached = _probe_results.get(key)
+    store = get_probe_result_store()
+    if cached is None and store is not None and version != "unknown":
+        cached = store.get(*key)
+    if cached is not None:
+        with _lock:
+            probe_stats["cached"] += 1
+            _probe_results[key] = cached
+        return cached, version
+    if before_execute is not None:
+        before_execute()
+    _, _, error = exec_sql_statement(tool, exp, dbType, sql)
+    # DDL/DML 及无结果集的语句成功时结果为 None，因此以错误是否为空判断
+    supported = not error
+    with _lock:
+        probe_stats["executed"] += 1
+    if not supported and not is_definite_rejection(error):
+        # 偶发错误：本次按不支持处理，但不缓存，下次重新探测
+        return supported, version
+    with _lock:
+        _probe_results[key] = supported
+    if store is not None and version != "unknown":
+        store.put(*key, supported)
+    return supported, version
+
+
+def is_definite_rejection(error):
+    """错误信息是否表示语法/未知函数等确定性的不支持（而非连接、超时等偶发故障）。"""
+    return bool(error) and DEFINITE_REJECTION_PATTERNS.search(str(error)) is not None
@@ -0,0 +1,131 @@
+"""
+特征知识库行索引：按行号 / 特征名定位 jsonl 记录，避免整文件逐行 json.loads
+
+作用概述：
+- 首次使用时扫描一遍 jsonl，记录每行的字节偏移和特征名（Feature 中 "(" 之前的小写部分），
+  持久化到 Output/cache/feature_index 下的 <文件名>.<路径哈希>.offsets（uint64 小端数组）
+  与 .names.json（不写进被跟踪的知识库目录）。
+- 知识库版本 = (文件大小, mtime_ns)；版本变化时自动重建。
+- 之后的进程直接 mmap jsonl 与偏移文件，只解析命中的那一行。
+- find_feature 的匹配规则与原逐行检索一致：按文件顺序第一个“名字包含该 feature”的记录，结果在进程内缓存。
+"""
+
+import json
+import mmap
+import os
+import sys
+import threading
+from array import array
+
+from src.Tools.cache_dir import source_cache_path
+
+
+def feature_record_name(record):
+    """与原检索逻辑一致：Feature 列表拼接后取 "(" 之前的部分，小写去空白。"""
+    return "".join(record.get("Feature", [])).split("(")[0].lower().strip()
+
+
+class FeatureRecordIndex:
+    def __init__(self, path, with_names=True):
+        self.path = os.path.abspath(path)
+        self.with_names = with_names
+        stat = os.stat(self.path)
+        self.version = [stat.st_size, stat.st_mtime_ns]
+        self._offsets_path = source_cache_path(self.path, ".offsets", "feature_index")
+        self._names_path = source_cache_path(self.path, ".names.json", "feature_index")
+        self._lookup_cache = {}
+        self._lock = threading.Lock()
+        if not self._load():
+            self._build()
+            self._load()
+
+    # ---------- 构建 / 加载 ---------- #
+    def _build(self):
+        offsets = array("Q")
+        names = []
+        position = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                offsets.append(position)
+                position += len(line)
+                if self.with_names:
+                    try:
+                        record = json.loads(line) if line.strip() else {}
+                        names.append(feature_record_name(record))
+                    except (json.JSONDecodeError, AttributeError):
+                        names.append("")
+        offsets.append(position)  # 末尾哨兵，第 i 行为 [offsets[i], offsets[i+1])
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        tmp = self._offsets_path + ".tmp"
+        with open(tmp, "wb") as f:
+            offsets.tofile(f)
+        os.replace(tmp, self._offsets_path)
+        tmp = self._names_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "names": names}, f, ensure_ascii=False)
+        os.replace(tmp, self._names_path)
+
+    def _load(self):
+        try:
+            with open(self._names_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != self.version:
+                return False
+            if self.with_names and len(meta["names"]) == 0 and self.version[0] > 0:
+                return False
+            self.names = meta["names"]
+            with open(self._offsets_path, "rb") as f:
+                self._offsets_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offsets = memoryview(self._offsets_mm).cast("Q")
+            if sys.byteorder != "little":
+                offsets = array("Q", offsets)
+                offsets.byteswap()
+            self.offsets = offsets
+            with open(self.path, "rb") as f:
+                self._data_mm = (
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    if self.version[0] > 0
+                    else b""
+                )
+            return len(self.offsets) >= 1
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+    # ---------- 查询 ---------- #
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def record_at_line(self, line_no):
+        """解析第 line_no 行（0 起）的记录。"""
+        start, end = self.offsets[line_no], self.offsets[line_no + 1]
+        return json.loads(bytes(self._data_mm[start:end]))
+
+    def find_feature(self, feature_name):
+        """按文件顺序返回第一个名字包含 feature_name 的行号，未找到返回 None。"""
+        query = str(feature_name).lower().strip()
+        if query in self._lookup_cache:
+            return self._lookup_cache[query]
+        line_no = next(
+            (i for i, name in enumerate(self.names) if query in name), None
+        )
+        with self._lock:
+            self._lookup_cache[query] = line_no
+        return line_no
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_feature_record_index(path, with_names=True):
+    """进程内共享的索引（文件版本变化后重建）。"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, with_names)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.version != [stat.st_size, stat.st_mtime_ns]:
+            index = FeatureRecordIndex(path, with_names=with_names)
+            _indexes[key] = index
+        return index
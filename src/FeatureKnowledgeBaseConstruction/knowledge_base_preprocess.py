@@ -22,7 +22,6 @@ from src.Tools.DatabaseConnect.database_connector import (
     database_clear,
 )
 from langchain.prompts import ChatPromptTemplate
-from langchain.chat_models import ChatOpenAI
 from langchain.output_parsers import ResponseSchema
 from langchain.output_parsers import StructuredOutputParser
 from langchain.chains import ConversationChain
@@ -30,6 +29,10 @@ from langchain.callbacks import get_openai_callback
 from langchain.memory import ConversationBufferMemory
 from src.DialectRecognition.TokenType_not_op import TokenType_not_op
 from src.Tools.DatabaseConnect.database_connector import get_database_connector_args
+from src.Tools.llm_cache import install_llm_cache
+from src.Tools.llm_gateway import get_chat_model
+
+install_llm_cache()
 
 current_file_path = os.path.abspath(__file__)
 current_dir = os.path.dirname(current_file_path)
@@ -193,7 +196,7 @@ def effective_sqls_refiner(tool, exp, dbType, featureType):
 def sql_generator_llm(
     tool, exp, dbType, temperature, model, content, max_cnt, with_table, with_examples
 ):
-    chat = ChatOpenAI(temperature=temperature, model=model)
+    chat = get_chat_model(temperature=temperature, model=model)
     memory = ConversationBufferMemory()  # 内存：对话缓冲区内存
     conversation = ConversationChain(
         llm=chat,
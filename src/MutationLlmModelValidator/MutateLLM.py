@@ -18,19 +18,18 @@ import json
 import os
 from json_repair import repair_json
 from src.Tools.DatabaseConnect.database_connector import exec_sql_statement
+from src.Tools.llm_cache import cached_chat_completion
+from src.Tools.llm_gateway import get_chat_model
 from src.Tools.OracleChecker.oracle_check import execSQL_result_convertor, Check
 from src.Tools.OracleChecker.oracle_check import Result
 from typing import Any, Dict, List, Optional
 
 # 可选引入（仅当使用 Agent 方案时才需要）
 try:
-    # LangChain OpenAI 驱动（与 translate_sqlancer.py 中的旧接口并行存在）
-    from langchain_openai import ChatOpenAI
     from langchain.agents import AgentExecutor, create_openai_functions_agent
     from langchain.tools import tool
     from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 except Exception:
-    ChatOpenAI = None
     AgentExecutor = None
     create_openai_functions_agent = None
     tool = None
@@ -80,7 +79,7 @@ def _build_agent(system_message: str) -> Optional[Any]:
 
     返回：AgentExecutor 或 None（当依赖缺失时）。
     """
-    if ChatOpenAI is None:
+    if create_openai_functions_agent is None:
         return None
 
     # 定义工具：预言机规则、语法校验、结构分析（与独立 demo 保持一致但缩减版）
@@ -192,8 +191,9 @@ def _build_agent(system_message: str) -> Optional[Any]:
         ]
     )
 
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_AGENT_MODEL", "gpt-4o-mini"), temperature=0.4
+    # 经 LLM 网关发请求，与其他调用共用并发/TPM 限制
+    llm = get_chat_model(
+        temperature=0.4, model=os.environ.get("OPENAI_AGENT_MODEL", "gpt-4o-mini")
     )
     agent = create_openai_functions_agent(llm, tools, prompt)
     return AgentExecutor(
@@ -479,8 +479,8 @@ def run_muatate_llm_single_sql(
             {"role": "user", "content": user_content},
         ]
         cost: Dict[str, Any] = {}
-        completion = client.chat.completions.create(
-            model=model_id, messages=formatted_input
+        completion = cached_chat_completion(
+            client, model=model_id, messages=formatted_input
         )
         response_content = completion.choices[0].message.content
 
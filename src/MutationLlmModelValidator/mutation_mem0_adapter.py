@@ -15,6 +15,10 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 import json
 
+from src.Tools.local_embedder import configure_mem0_embedder, install_mem0_embedder
+from src.Tools.mem0_write_queue import get_mem0_write_queue
+from src.Tools.sql_analysis import analyze_sql
+
 
 class MutationMemoryManager:
     """变异阶段的 Mem0 记忆管理器（使用 Qdrant）"""
@@ -64,7 +68,8 @@ class MutationMemoryManager:
                 }
             }
             
-            self.memory = Memory.from_config(config)
+            config = configure_mem0_embedder(config)
+            self.memory = install_mem0_embedder(Memory.from_config(config))
             self.user_id = user_id
             self.session_start_time = None
             self.session_data = {
@@ -80,6 +85,16 @@ class MutationMemoryManager:
                 f"Mem0 not installed. Please run: pip install mem0ai qdrant-client\n{e}"
             )
     
+    def _add(self, content: str, metadata: Dict[str, Any]):
+        """写入记忆：默认进入后台写队列，不阻塞变异主流程"""
+        write_queue = get_mem0_write_queue(
+            f"mutation_{self.user_id}", lambda: self.memory
+        )
+        if write_queue is None:
+            self.memory.add(content, user_id=self.user_id, metadata=metadata)
+        else:
+            write_queue.enqueue(content, self.user_id, metadata)
+    
     def start_session(self, db_type: str, oracle_type: str, sql_type: str = "unknown"):
         """
         开始变异会话
@@ -101,9 +116,8 @@ class MutationMemoryManager:
         )
         
         try:
-            self.memory.add(
+            self._add(
                 session_info,
-                user_id=self.user_id,
                 metadata={
                     "type": "session_start",
                     "db_type": db_type,
@@ -159,9 +173,8 @@ class MutationMemoryManager:
         )
         
         try:
-            self.memory.add(
+            self._add(
                 memory_content,
-                user_id=self.user_id,
                 metadata={
                     "type": "successful_mutation",
                     "db_type": db_type,
@@ -212,9 +225,8 @@ class MutationMemoryManager:
         )
         
         try:
-            self.memory.add(
+            self._add(
                 memory_content,
-                user_id=self.user_id,
                 metadata={
                     "type": "bug_pattern",
                     "bug_type": bug_type,
@@ -267,9 +279,8 @@ class MutationMemoryManager:
         )
         
         try:
-            self.memory.add(
+            self._add(
                 memory_content,
-                user_id=self.user_id,
                 metadata={
                     "type": "oracle_failure",
                     "oracle_type": oracle_type,
@@ -456,9 +467,8 @@ class MutationMemoryManager:
             )
             
             try:
-                self.memory.add(
+                self._add(
                     session_summary,
-                    user_id=self.user_id,
                     metadata={
                         "type": "session_end",
                         "success": success,
@@ -486,20 +496,29 @@ class MutationMemoryManager:
 🧬 Mutations generated: {total_mutations}
 ✅ Successful patterns: {successful}
 🐛 Bugs found: {bugs}
-============================================
 """
+        write_queue = get_mem0_write_queue(
+            f"mutation_{self.user_id}", lambda: self.memory
+        )
+        if write_queue is not None:
+            queue_stats = write_queue.snapshot()
+            report += (
+                f"📮 Write queue depth: {queue_stats['depth']} "
+                f"(written {queue_stats['written']}, failed {queue_stats['failed']})\n"
+                f"🗑️  Spilled: {queue_stats['spilled']}, dropped: {queue_stats['dropped']}\n"
+            )
+        report += "============================================\n"
         return report
     
     def _extract_sql_features(self, sql: str) -> Dict[str, Any]:
-        """提取 SQL 特征"""
-        import re
-        
-        sql_upper = sql.upper()
+        """提取 SQL 特征（大写文本与聚合判断复用共享的 SQLAnalysis）"""
+        analysis = analyze_sql(sql)
+        sql_upper = analysis.upper
         
         features = {
             "has_join": "JOIN" in sql_upper,
             "has_where": "WHERE" in sql_upper,
-            "has_aggregate": any(op in sql_upper for op in ["COUNT", "SUM", "AVG", "MAX", "MIN"]),
+            "has_aggregate": analysis.has_aggregate,
             "has_group_by": "GROUP BY" in sql_upper,
             "has_order_by": "ORDER BY" in sql_upper,
             "has_subquery": "SELECT" in sql_upper and "(" in sql,
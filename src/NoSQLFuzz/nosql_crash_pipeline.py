@@ -40,6 +40,14 @@ from src.Tools.DatabaseConnect.database_connector import (
     exec_sql_statement,
     get_database_connector_args,
 )
+from src.Tools.DatabaseConnect.nosql_client_pool import (
+    build_mongo_uri,
+    get_etcd_client,
+    get_http_session,
+    get_memcached_pool,
+    get_mongo_client,
+    get_redis_client,
+)
 
 DEFAULT_CMD_TIMEOUT = 3.0  # 单条命令执行超时秒
 DEFAULT_HEALTH_CHECK_INTERVAL = 0.5
@@ -70,45 +78,41 @@ def _health_check(dbType: str) -> bool:
     db = dbType.lower()
     try:
         args = get_database_connector_args(db)
+        # 探活复用与命令执行相同的共享客户端，不再每次新建连接
         if db == "redis":
-            import redis  # type: ignore
-
-            r = redis.Redis(
-                host=args.get("host", "127.0.0.1"),
-                port=int(args.get("port", 6379)),
+            r = get_redis_client(
+                args.get("host", "127.0.0.1"),
+                args.get("port", 6379),
+                args.get("username"),
+                args.get("password"),
                 socket_timeout=1,
             )
             return r.ping() is True
         if db == "memcached":
-            with socket.create_connection(
-                (args.get("host", "127.0.0.1"), int(args.get("port", 11211))), timeout=1
-            ) as s:
-                s.sendall(b"version\r\n")
-                resp = s.recv(64)
+            pool = get_memcached_pool(
+                args.get("host", "127.0.0.1"), args.get("port", 11211)
+            )
+            with pool.checkout() as lease:
+                lease.sock.sendall(b"version\r\n")
+                resp = lease.sock.recv(64)
+                if resp.endswith(b"\r\n"):
+                    lease.release_ok()
                 return b"VERSION" in resp
         if db == "etcd":
-            # 简单探活: 查看 docker exec etcdctl endpoint status
-            container = args.get("container_name", "etcd_QTRAN")
-            proc = subprocess.run(
-                ["docker", "exec", container, "etcdctl", "endpoint", "status"],
-                capture_output=True,
-                text=True,
-                timeout=2,
-            )
-            return proc.returncode == 0
+            # 简单探活: v3 gateway 的 maintenance/status（等价于 etcdctl endpoint status）
+            host = args.get("host", "127.0.0.1")
+            port = int(args.get("port", 2379))
+            get_etcd_client(host, port).status(timeout=2)
+            return True
         if db == "consul":
-            import requests
-
             host = args.get("host", "127.0.0.1")
             port = int(args.get("port", 8500))
-            r = requests.get(f"http://{host}:{port}/v1/status/leader", timeout=1)
+            r = get_http_session(host, port).get(
+                f"http://{host}:{port}/v1/status/leader", timeout=1
+            )
             return r.status_code == 200
         if db == "mongodb":
-            from pymongo import MongoClient
-
-            host = args.get("host", "127.0.0.1")
-            port = int(args.get("port", 27017))
-            client = MongoClient(host, port, serverSelectionTimeoutMS=800)
+            client = get_mongo_client(build_mongo_uri(args))
             client.admin.command("ping")
             return True
     except Exception:
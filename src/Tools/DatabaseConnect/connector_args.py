@@ -0,0 +1,62 @@
+"""
+连接参数缓存：database_connector_args.json 的内存化加载
+
+作用概述：
+- 进程内只解析一次 database_connector_args.json，按文件 mtime/size 变化自动热重载。
+- 返回写时复制视图（ChainMap），调用方的 args["dbname"] = ... 只落在本次视图上，不会污染缓存。
+- 供 database_connector / docker_create / nosql_crash_pipeline 等模块共享。
+"""
+
+import json
+import os
+import threading
+from collections import ChainMap
+from types import MappingProxyType
+
+current_file_path = os.path.abspath(__file__)
+current_dir = os.path.dirname(current_file_path)
+
+CONNECTOR_ARGS_PATH = os.path.join(current_dir, "database_connector_args.json")
+
+_cache_lock = threading.Lock()
+_cache_signature = None  # (st_mtime_ns, st_size)
+_cache_entries = {}  # dbType -> MappingProxyType(只读配置)
+
+
+def _load_entries(path):
+    with open(path, "r", encoding="utf-8") as r:
+        database_connection_args = json.load(r)
+    return {
+        key.lower(): MappingProxyType(dict(value))
+        for key, value in database_connection_args.items()
+        if isinstance(value, dict)
+    }
+
+
+def _current_entries():
+    """返回缓存的配置表；文件 mtime/size 变化时重新解析。"""
+    global _cache_signature, _cache_entries
+    stat = os.stat(CONNECTOR_ARGS_PATH)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if signature == _cache_signature:
+        return _cache_entries
+    with _cache_lock:
+        if signature != _cache_signature:
+            _cache_entries = _load_entries(CONNECTOR_ARGS_PATH)
+            _cache_signature = signature
+        return _cache_entries
+
+
+def get_database_connector_args(dbType):
+    """返回 dbType 的连接参数（写时复制视图），未配置时返回 None。"""
+    entry = _current_entries().get(dbType.lower())
+    if entry is None:
+        return None
+    return ChainMap({}, entry)
+
+
+def invalidate_connector_args_cache():
+    """丢弃缓存，下次调用强制重新读取文件。"""
+    global _cache_signature
+    with _cache_lock:
+        _cache_signature = None
@@ -24,7 +24,26 @@ from sqlalchemy import create_engine
 import subprocess
 import os
 from src.Tools.DatabaseConnect.docker_create import run_container
+from src.Tools.DatabaseConnect.connector_args import get_database_connector_args
+from src.Tools.DatabaseConnect.nosql_client_pool import (
+    build_mongo_uri,
+    get_etcd_client,
+    get_http_session,
+    get_memcached_pool,
+    get_mongo_client,
+    get_redis_client,
+)
+from src.Tools.DatabaseConnect.native_file_db import (
+    NativeFileDatabasePool,
+    native_backend_enabled,
+)
+from src.Tools.DatabaseConnect.mongo_shell_session import (
+    MongoShellStartError,
+    MongoShellTimeout,
+    get_mongo_shell_session,
+)
 import threading
+import atexit
 import sys
 import socket
 import base64
@@ -37,6 +56,65 @@ except Exception:  # pragma: no cover
 current_file_path = os.path.abspath(__file__)
 current_dir = os.path.dirname(current_file_path)
 
+# 并行 worker 的数据库命名空间（线程局部）：未设置时保持原有库名不变
+_worker_local = threading.local()
+
+
+def set_worker_namespace(worker_id):
+    """为当前线程设置 worker 编号；None 表示取消隔离（串行模式）。
+
+    设置后，本线程内 exec_sql_statement / database_clear 使用的库名会追加 `_w<id>` 后缀，
+    文件型库（sqlite/duckdb）对应不同文件，Redis 使用 `worker_id` 号逻辑库（0 号留给串行模式）。
+    memcached/etcd/consul 没有库的概念，无法隔离，调用方应通过 parallel_worker_limit 退回串行。
+    """
+    _worker_local.worker_id = worker_id
+
+
+def get_worker_namespace():
+    """返回当前线程的 worker 编号（未设置时为 None）。"""
+    return getattr(_worker_local, "worker_id", None)
+
+
+def build_dbname(tool, exp, dbType):
+    """按 tool/exp/dbType 生成场景库名，并叠加当前线程的 worker 命名空间。"""
+    dbname = (
+        f"{tool}_{exp}_{dbType}".lower()
+        if "tlp" not in exp
+        else f"{tool}_tlp_{dbType}".lower()
+    )
+    worker_id = get_worker_namespace()
+    if worker_id is not None:
+        dbname = f"{dbname}_w{worker_id}"
+    return dbname
+
+
+# 键空间无法按 worker 隔离的目标：database_clear 会清空全部键，只能串行
+SHARED_KEYSPACE_TARGETS = frozenset({"memcached", "etcd", "consul"})
+# Redis 默认 16 个逻辑库：0 号留给串行模式，worker 最多 15 个
+REDIS_MAX_WORKERS = 15
+
+
+def parallel_worker_limit(dbTypes):
+    """给定本次运行涉及的数据库类型，返回并行 worker 数上限（无限制时为 None）。"""
+    dbTypes = {str(db).lower() for db in dbTypes}
+    if dbTypes & SHARED_KEYSPACE_TARGETS:
+        return 1
+    if "redis" in dbTypes:
+        return REDIS_MAX_WORKERS
+    return None
+
+
+def _redis_db_index():
+    """当前 worker 对应的 Redis 逻辑库编号（串行模式为 0）。"""
+    worker_id = get_worker_namespace()
+    if worker_id is None:
+        return 0
+    if not 1 <= int(worker_id) <= REDIS_MAX_WORKERS:
+        raise ValueError(
+            f"redis worker id {worker_id} out of range 1..{REDIS_MAX_WORKERS}"
+        )
+    return int(worker_id)
+
 
 class DatabaseConnectionPool:
     def __init__(
@@ -49,6 +127,7 @@ class DatabaseConnectionPool:
         dbname,
         pool_size=20,
         max_overflow=20,
+        pool_pre_ping=False,
         **kwargs  # 接收额外参数，如 namespace (for SurrealDB)
     ):
         self.dbType = dbType.upper()
@@ -59,6 +138,8 @@ class DatabaseConnectionPool:
         self.dbname = dbname
         self.pool_size = pool_size
         self.max_overflow = max_overflow
+        # 取连接时先 ping 一次，长驻引擎据此剔除已失效的连接
+        self.pool_pre_ping = pool_pre_ping
         self.engine = None
         # 存储额外的配置参数（如 SurrealDB 的 namespace）
         for key, value in kwargs.items():
@@ -99,30 +180,37 @@ class DatabaseConnectionPool:
                     pool_size=self.pool_size,
                     max_overflow=self.max_overflow,
                     isolation_level="READ COMMITTED",
+                    pool_pre_ping=self.pool_pre_ping,
                 )
             elif self.dbType == "POSTGRES":
                 self.engine = create_engine(
                     f"postgresql+psycopg2://{self.username}:{self.password}@{self.host}:{self.port}/{self.dbname}",
                     pool_size=self.pool_size,
                     max_overflow=self.max_overflow,
+                    pool_pre_ping=self.pool_pre_ping,
                 )
             elif self.dbType == "MONETDB":
                 self.engine = create_engine(
                     f"monetdb+pymonetdb://{self.username}:{self.password}@{self.host}:{self.port}/{self.dbname}",
                     pool_size=self.pool_size,
+                    pool_pre_ping=self.pool_pre_ping,
                 )
             elif self.dbType == "SQLITE":
                 # For SQLite, it uses a file path, not a typical "host/database" format
                 db_path = f"sqlite:///{os.path.join(current_dir, self.dbname)}.db"
                 # db_path = f'sqlite:///{self.dbname}'
                 self.engine = create_engine(
-                    db_path, pool_size=self.pool_size, max_overflow=self.max_overflow
+                    db_path,
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_pre_ping=self.pool_pre_ping,
                 )
             elif self.dbType == "CLICKHOUSE":
                 self.engine = create_engine(
                     f"clickhouse+http://{self.username}:{self.password}@{self.host}:{self.port}/{self.dbname}",
                     pool_size=self.pool_size,
                     max_overflow=self.max_overflow,
+                    pool_pre_ping=self.pool_pre_ping,
                 )
             elif self.dbType == "OCEANBASE":
                 # For OceanBase, if SQLAlchemy is not supported, you would use a different mechanism
@@ -132,7 +220,10 @@ class DatabaseConnectionPool:
                 db_path = f"duckdb:///{os.path.join(current_dir, self.dbname)}.duckdb"
                 # db_path = f'duckdb:///{self.dbname}'
                 self.engine = create_engine(
-                    db_path, pool_size=self.pool_size, max_overflow=self.max_overflow
+                    db_path,
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_pre_ping=self.pool_pre_ping,
                 )
             elif self.dbType == "SURREALDB":
                 # SurrealDB 使用 HTTP API，不使用 SQLAlchemy engine
@@ -266,16 +357,124 @@ class DatabaseConnectionPool:
             # return None, 0 , error_message
             return None, 0, str(e)
 
+    def execBatch(self, queries, stop_on_error=False, transaction=False):
+        """在同一连接上顺序执行多条语句，返回逐条 (结果, 耗时, 错误) 列表。"""
+        if self.engine is None:
+            # SurrealDB/OceanBase 等无 engine 的类型逐条执行
+            outcomes = []
+            for query in queries:
+                outcomes.append(self.execSQL(query))
+                if (stop_on_error or transaction) and outcomes[-1][2]:
+                    break
+            return outcomes
+
+        outcomes = []
+        with self.engine.connect() as connection:
+            if self.dbType == "POSTGRES" and not transaction:
+                connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            for query in queries:
+                start_time = time.time()
+                try:
+                    res = connection.execute(text(query))
+                    result = None
+                    if res.returns_rows and not (
+                        query.strip()
+                        .upper()
+                        .startswith(("INSERT", "UPDATE", "DELETE", "CREATE"))
+                    ):
+                        result = res.fetchall()
+                    if not transaction:
+                        connection.commit()
+                    outcomes.append((result, time.time() - start_time, None))
+                except Exception as e:
+                    print(f"Error executing '{query}':", e)
+                    outcomes.append((None, 0, str(e)))
+                    connection.rollback()
+                    if stop_on_error or transaction:
+                        break
+            if transaction and outcomes and outcomes[-1][2] is None:
+                connection.commit()
+        errors = sum(1 for outcome in outcomes if outcome[2])
+        print(f"Batch executed: {len(outcomes)} statements, {errors} errors")
+        return outcomes
+
+
+# -------------------- Process-wide Engine Registry -------------------- #
+# 以 (dbType, host, port, dbname) 为键缓存 DatabaseConnectionPool，整个进程复用同一个
+# SQLAlchemy engine，避免每条语句都重新建引擎、握手再 dispose。
+_engine_registry = {}
+_engine_registry_lock = threading.Lock()
+
+
+def _engine_key(dbType, host, port, dbname):
+    return (str(dbType).upper(), str(host), str(port), str(dbname))
+
+
+def get_connection_pool(dbType, host, port, username, password, dbname, **kwargs):
+    """从进程级注册表取出连接池，不存在时创建并登记。
+
+    返回 (pool, created)：created 为 True 表示本次新建，调用方可据此做一次连通性检查。
+    引擎开启 pool_pre_ping，每次取连接时自动探活并替换失效连接。
+    """
+    key = _engine_key(dbType, host, port, dbname)
+    with _engine_registry_lock:
+        pool = _engine_registry.get(key)
+        if pool is not None:
+            return pool, False
+        if native_backend_enabled(dbType):
+            # sqlite/duckdb 走进程内原生后端，省去 SQLAlchemy 的逐条开销
+            pool = NativeFileDatabasePool(
+                dbType, host, port, username, password, dbname, **kwargs
+            )
+        else:
+            pool = DatabaseConnectionPool(
+                dbType,
+                host,
+                port,
+                username,
+                password,
+                dbname,
+                pool_pre_ping=True,
+                **kwargs,
+            )
+        _engine_registry[key] = pool
+        return pool, True
+
+
+def dispose_connection_pool(dbType, host, port, dbname):
+    """从注册表移除并关闭指定库的连接池（删库/删文件前调用，避免残留连接）。"""
+    key = _engine_key(dbType, host, port, dbname)
+    with _engine_registry_lock:
+        pool = _engine_registry.pop(key, None)
+    if pool is not None:
+        try:
+            pool.close()
+        except Exception as e:
+            print(f"关闭连接池失败 {key}: {e}")
+
+
+def shutdown_connection_pools():
+    """关闭注册表中的全部连接池；进程退出时自动调用，也可显式调用。"""
+    with _engine_registry_lock:
+        pools = list(_engine_registry.values())
+        _engine_registry.clear()
+    for pool in pools:
+        try:
+            pool.close()
+        except Exception as e:
+            print(f"关闭连接池失败: {e}")
+
+
+atexit.register(shutdown_connection_pools)
+
 
 # 每次执行后要清除数据库内的所有表格
 def database_clear(tool, exp, dbType):
     """按场景重置数据库：删除文件型库或在容器内重建/清空表。"""
     args = get_database_connector_args(dbType.lower())
-    args["dbname"] = (
-        f"{tool}_{exp}_{dbType}".lower()
-        if "tlp" not in exp
-        else f"{tool}_tlp_{dbType}".lower()
-    )
+    args["dbname"] = build_dbname(tool, exp, dbType)
+    # 删库/删文件前先释放缓存的引擎，否则残留连接会阻塞 DROP 或写入已删除的文件
+    dispose_connection_pool(args["dbType"], args["host"], args["port"], args["dbname"])
     # 特殊处理：删除对应的db文件即可
     if dbType.lower() in ["sqlite"]:
         db_filepath = os.path.join(current_dir, f'{args["dbname"]}.db')
@@ -291,12 +490,12 @@ def database_clear(tool, exp, dbType):
             print("redis 库未安装，无法清理")
             return
         try:
-            r = redis.Redis(
-                host=args.get("host", "127.0.0.1"),
-                port=int(args.get("port", 6379)),
-                username=args.get("username") or None,
-                password=args.get("password") or None,
-                decode_responses=False,
+            r = get_redis_client(
+                args.get("host", "127.0.0.1"),
+                args.get("port", 6379),
+                args.get("username"),
+                args.get("password"),
+                db=_redis_db_index(),
             )
             r.flushdb()
             print(args["dbname"] + " (redis) 已清空")
@@ -307,20 +506,10 @@ def database_clear(tool, exp, dbType):
         # MongoDB: 删除整个数据库（如果存在）
         try:
             try:
-                from pymongo import MongoClient  # 延迟导入，避免未安装时崩溃
+                client = get_mongo_client(build_mongo_uri(args, auth_db="admin"))
             except ImportError:
                 print("pymongo 未安装，无法清理 mongodb 数据库")
                 return
-            host = args.get("host", "127.0.0.1")
-            port = int(args.get("port", 27017))
-            username = args.get("username") or None
-            password = args.get("password") or None
-            # 构建连接 URI（支持无认证与用户密码）
-            if username and password:
-                uri = f"mongodb://{username}:{password}@{host}:{port}/admin"
-            else:
-                uri = f"mongodb://{host}:{port}/"
-            client = MongoClient(uri, serverSelectionTimeoutMS=3000)
             dbname = args["dbname"]
             if dbname in client.list_database_names():
                 client.drop_database(dbname)
@@ -333,13 +522,13 @@ def database_clear(tool, exp, dbType):
     elif dbType.lower() == "memcached":
         # 直接 flush_all
         try:
-            import socket as _s
-
             host = args.get("host", "127.0.0.1")
             port = int(args.get("port", 11211))
-            with _s.create_connection((host, port), timeout=3) as sk:
-                sk.sendall(b"flush_all\r\n")
-                resp = sk.recv(128).decode(errors="replace").strip()
+            with get_memcached_pool(host, port).checkout() as lease:
+                lease.sock.sendall(b"flush_all\r\n")
+                resp = lease.sock.recv(128).decode(errors="replace").strip()
+                if resp.upper().startswith(("OK", "RESET")):
+                    lease.release_ok()
             if resp.lower().startswith("ok") or resp.lower().startswith("reset"):
                 print(args["dbname"] + " (memcached) 已清空")
             else:
@@ -348,25 +537,12 @@ def database_clear(tool, exp, dbType):
             print("Memcached 清理失败:", e)
         return
     elif dbType.lower() == "etcd":
-        # 使用 etcdctl 删除全部 key: etcdctl del "" --from-key
+        # 通过 v3 gateway 删除全部 key（等价于 etcdctl del "" --from-key）
         try:
-            container = args.get("container_name", "etcd_QTRAN")
-            subprocess.run(
-                [
-                    "docker",
-                    "exec",
-                    container,
-                    "etcdctl",
-                    "--endpoints=localhost:2379",
-                    "del",
-                    "",
-                    "--from-key",
-                ],
-                check=False,
-                capture_output=True,
-                text=True,
-                timeout=10,
+            client = get_etcd_client(
+                args.get("host", "127.0.0.1"), int(args.get("port", 2379))
             )
+            client.delete("", from_key=True)
             print(args["dbname"] + " (etcd) 全部键已删除")
         except Exception as e:
             print("etcd 清理失败:", e)
@@ -374,10 +550,9 @@ def database_clear(tool, exp, dbType):
     elif dbType.lower() == "consul":
         # 遍历列出所有键然后逐个删除（避免依赖额外工具）。
         try:
-            import requests as _req
-
             host = args.get("host", "127.0.0.1")
             port = int(args.get("port", 8500))
+            _req = get_http_session(host, port)
             base = f"http://{host}:{port}/v1/kv"
             # 获取所有 key
             r = _req.get(f"{base}/?recurse=true")
@@ -448,7 +623,7 @@ def database_clear(tool, exp, dbType):
     elif dbType.lower() in ["tdsql"]:
         # TDSQL treated like MySQL/TiDB: use docker/container based reset via SQL scripts
         # fallthrough to generic handler below by constructing a pool and applying SQL clear JSON
-        pool = DatabaseConnectionPool(
+        pool, _ = get_connection_pool(
             args["dbType"],
             args["host"],
             args["port"],
@@ -466,7 +641,6 @@ def database_clear(tool, exp, dbType):
             ddl = ddl.replace("db_name", args["dbname"])
             pool.execSQL(ddl)
         print(args["dbname"] + "重置成功 (tdsql)")
-        pool.close()
     elif dbType.lower() in ["monetdb"]:
         container_name = args["container_name"]
         # 停止数据库
@@ -495,7 +669,7 @@ def database_clear(tool, exp, dbType):
         )
         print(dbType + "," + args["dbname"] + "重置成功")
     else:
-        pool = DatabaseConnectionPool(
+        pool, _ = get_connection_pool(
             args["dbType"],
             args["host"],
             args["port"],
@@ -513,7 +687,6 @@ def database_clear(tool, exp, dbType):
             ddl = ddl.replace("db_name", args["dbname"])
             pool.execSQL(ddl)
         print(args["dbname"] + "重置成功")
-        pool.close()
 
 
 # -------------------- Unified Normalization Helper -------------------- #
@@ -534,6 +707,14 @@ def _unify_result(op_type: str, success: bool, value, meta: dict | None = None):
 
 
 # -------------------- Memcached Execution & Normalization ------------- #
+def _memcached_error_reply(lower_buf):
+    """响应中是否有完整的 ERROR / CLIENT_ERROR / SERVER_ERROR 行（lower_buf 已小写且以 CRLF 结尾）。"""
+    return any(
+        line == b"error" or line.startswith((b"client_error", b"server_error"))
+        for line in lower_buf.split(b"\r\n")
+    )
+
+
 def exec_memcached_command(conn_args, tool, exp, command_text: str):
     """Execute a (possibly simplified) Memcached command via plain TCP socket.
 
@@ -635,8 +816,9 @@ def exec_memcached_command(conn_args, tool, exp, command_text: str):
 
     # ---------- 发送并接收 ---------- #
     try:
-        with socket.create_connection((host, port), timeout=3) as sock:
-            sock.settimeout(3)
+        # 复用池内 socket：只有读到完整响应（结束标记）才归还，超时/断开的连接直接丢弃
+        with get_memcached_pool(host, port).checkout() as lease:
+            sock = lease.sock
             sock.sendall(send_bytes)
             buf = b""
             # 读取：对 get 需要直到 END，对其它需要直到状态词行
@@ -649,19 +831,27 @@ def exec_memcached_command(conn_args, tool, exp, command_text: str):
                     break
                 buf += chunk
                 lower_buf = buf.lower()
+                if not lower_buf.endswith(b"\r\n"):
+                    continue  # 响应行尚未读完整
+                if _memcached_error_reply(lower_buf):
+                    # 错误响应：读完该行后停止，但不归还连接（协议状态不确定）
+                    break
                 if primary == "get":
-                    if b"\r\nend\r\n" in lower_buf or b"\r\nerror\r\n" in lower_buf:
+                    if lower_buf.startswith(b"end\r\n") or b"\r\nend\r\n" in lower_buf:
+                        lease.release_ok()
                         break
+                elif primary in {"incr", "decr"}:
+                    # 响应为单行：新值 / NOT_FOUND
+                    lease.release_ok()
+                    break
                 else:
                     if (
                         b"stored\r\n" in lower_buf
                         or b"not_stored\r\n" in lower_buf
                         or b"deleted\r\n" in lower_buf
                         or b"not_found\r\n" in lower_buf
-                        or b"error\r\n" in lower_buf
-                        or b"client_error" in lower_buf
-                        or b"server_error" in lower_buf
                     ):
+                        lease.release_ok()
                         break
         raw_text = buf.decode(errors="replace")
         lines = raw_text.splitlines()
@@ -838,17 +1028,19 @@ def exec_consul_command(conn_args, tool, exp, command_text: str):
     op = parts[0].upper()
     start = time.time()
     try:
+        # 共享 Session，复用 keep-alive 连接
+        http = get_http_session(host, port)
         if op == "PUT" and len(parts) >= 3:
             key = parts[1]
             value = " ".join(parts[2:])
-            resp = requests.put(f"{base}/{key}", data=value.encode())
+            resp = http.put(f"{base}/{key}", data=value.encode())
             success = resp.status_code == 200 and resp.text.strip() == "true"
             norm = _unify_result(
                 "kv_set", success, None, meta={"raw_code": resp.text.strip()}
             )
         elif op == "GET" and len(parts) == 2:
             key = parts[1]
-            resp = requests.get(f"{base}/{key}")
+            resp = http.get(f"{base}/{key}")
             if resp.status_code == 200:
                 try:
                     arr = resp.json()
@@ -885,14 +1077,14 @@ def exec_consul_command(conn_args, tool, exp, command_text: str):
                 )
         elif op == "DELETE" and len(parts) == 2:
             key = parts[1]
-            resp = requests.delete(f"{base}/{key}")
+            resp = http.delete(f"{base}/{key}")
             success = resp.status_code == 200 and resp.text.strip() == "true"
             norm = _unify_result(
                 "kv_delete", success, None, meta={"raw_code": resp.text.strip()}
             )
         elif op == "RANGE" and len(parts) == 2:
             prefix = parts[1]
-            resp = requests.get(f"{base}/{prefix}", params={"recurse": "true"})
+            resp = http.get(f"{base}/{prefix}", params={"recurse": "true"})
             if resp.status_code == 200:
                 try:
                     arr = resp.json()
@@ -920,59 +1112,69 @@ def exec_consul_command(conn_args, tool, exp, command_text: str):
 
 
 # -------------------- etcd Execution & Normalization ------------------ #
+def _etcd_int(value):
+    """gateway 以字符串返回 int64，统一转成 int（与 etcdctl -w json 一致）。"""
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return value
+
+
+def _etcd_error_code(e):
+    resp = getattr(e, "response", None)
+    if resp is not None:
+        return (resp.text or str(resp.status_code)).strip()[:60]
+    return str(e)[:60]
+
+
 def exec_etcd_command(conn_args, tool, exp, command_text: str):
-    """Execute simplified etcdctl commands via docker exec (etcdctl -w json ...).
+    """Execute simplified etcdctl-style commands via etcd's v3 JSON gateway.
 
     Supported textual forms:
       PUT <key> <value>
       GET <key>
       RANGE <prefix>
       DELETE <key>
-    Implementation detail: we rely on container name in args[container_name].
+    Implementation detail: requests go to args[host]:args[port] (the mapped
+    client port) over a pooled HTTP session instead of one docker exec per command.
     """
-    container = conn_args.get("container_name") or "etcd_QTRAN"
-    port = int(conn_args.get("port", 2379))  # not directly used (docker exec)
+    host = conn_args.get("host", "127.0.0.1")
+    port = int(conn_args.get("port", 2379))
     if not command_text or not command_text.strip():
         return {"type": "empty", "value": None}, 0, None
     parts = command_text.strip().split()
     op = parts[0].upper()
     start = time.time()
-    base_cmd = [
-        "docker",
-        "exec",
-        container,
-        "etcdctl",
-        "--endpoints=localhost:2379",
-        "-w",
-        "json",
-    ]
     try:
+        client = get_etcd_client(host, port)
         if op == "PUT" and len(parts) >= 3:
             key = parts[1]
             value = " ".join(parts[2:])
-            proc = subprocess.run(
-                base_cmd + ["put", key, value],
-                capture_output=True,
-                text=True,
-                timeout=8,
-            )
-            success = proc.returncode == 0
-            meta = {}
             try:
-                data = json.loads(proc.stdout or "{}")
-                header = data.get("header", {})
-                meta["revision"] = header.get("revision")
-            except Exception:
-                pass
-            norm = _unify_result("kv_set", success, None, meta=meta)
+                data = client.put(key, value)
+                norm = _unify_result(
+                    "kv_set",
+                    True,
+                    None,
+                    meta={
+                        "revision": _etcd_int(data.get("header", {}).get("revision"))
+                    },
+                )
+            except requests.HTTPError as he:
+                norm = _unify_result(
+                    "kv_set", False, None, meta={"raw_code": _etcd_error_code(he)}
+                )
         elif op == "GET" and len(parts) == 2:
             key = parts[1]
-            proc = subprocess.run(
-                base_cmd + ["get", key], capture_output=True, text=True, timeout=8
-            )
-            if proc.returncode == 0:
+            try:
+                data = client.get(key)
+            except requests.HTTPError as he:
+                data = None
+                norm = _unify_result(
+                    "kv_get", False, None, meta={"raw_code": _etcd_error_code(he)}
+                )
+            if data is not None:
                 try:
-                    data = json.loads(proc.stdout or "{}")
                     kvs = data.get("kvs", [])
                     if kvs:
                         value_b64 = kvs[0].get("value")
@@ -984,8 +1186,10 @@ def exec_etcd_command(conn_args, tool, exp, command_text: str):
                             True,
                             value,
                             meta={
-                                "version": kvs[0].get("version"),
-                                "revision": data.get("header", {}).get("revision"),
+                                "version": _etcd_int(kvs[0].get("version")),
+                                "revision": _etcd_int(
+                                    data.get("header", {}).get("revision")
+                                ),
                             },
                         )
                     else:
@@ -994,21 +1198,17 @@ def exec_etcd_command(conn_args, tool, exp, command_text: str):
                         )
                 except Exception as je:
                     return None, 0, f"json parse error: {je}"
-            else:
-                norm = _unify_result(
-                    "kv_get", False, None, meta={"raw_code": proc.stderr.strip()[:60]}
-                )
         elif op == "RANGE" and len(parts) == 2:
             prefix = parts[1]
-            proc = subprocess.run(
-                base_cmd + ["get", prefix, "--prefix"],
-                capture_output=True,
-                text=True,
-                timeout=12,
-            )
-            if proc.returncode == 0:
+            try:
+                data = client.get(prefix, prefix=True, timeout=12)
+            except requests.HTTPError as he:
+                data = None
+                norm = _unify_result(
+                    "kv_range", False, None, meta={"raw_code": _etcd_error_code(he)}
+                )
+            if data is not None:
                 try:
-                    data = json.loads(proc.stdout or "{}")
                     kvs = data.get("kvs", [])
                     items = []
                     for kv in kvs:
@@ -1024,28 +1224,28 @@ def exec_etcd_command(conn_args, tool, exp, command_text: str):
                         items,
                         meta={
                             "count": len(items),
-                            "revision": data.get("header", {}).get("revision"),
+                            "revision": _etcd_int(
+                                data.get("header", {}).get("revision")
+                            ),
                         },
                     )
                 except Exception as je:
                     return None, 0, f"json parse error: {je}"
-            else:
-                norm = _unify_result(
-                    "kv_range", False, None, meta={"raw_code": proc.stderr.strip()[:60]}
-                )
         elif op == "DELETE" and len(parts) == 2:
             key = parts[1]
-            proc = subprocess.run(
-                base_cmd + ["del", key], capture_output=True, text=True, timeout=8
-            )
-            success = proc.returncode == 0
-            deleted = None
             try:
-                data = json.loads(proc.stdout or "{}")
-                deleted = data.get("deleted")
-            except Exception:
-                pass
-            norm = _unify_result("kv_delete", success, None, meta={"deleted": deleted})
+                data = client.delete(key)
+                # gateway 在删除数为 0 时省略 deleted 字段
+                norm = _unify_result(
+                    "kv_delete",
+                    True,
+                    None,
+                    meta={"deleted": _etcd_int(data.get("deleted", 0))},
+                )
+            except requests.HTTPError:
+                norm = _unify_result(
+                    "kv_delete", False, None, meta={"deleted": None}
+                )
         else:
             norm = _unify_result("unsupported", False, None, meta={"raw_code": op})
         return norm, time.time() - start, None
@@ -1053,6 +1253,60 @@ def exec_etcd_command(conn_args, tool, exp, command_text: str):
         return None, 0, str(e)
 
 
+NOSQL_TARGETS = {"redis", "mongodb", "memcached", "etcd", "consul"}
+
+
+def _exec_nosql_statement(args, tool, exp, dbType, sql_statement):
+    """NoSQL 目标的单条命令分发（不使用 SQLAlchemy），返回 (结果, 耗时, 错误)。"""
+    lower = dbType.lower()
+    if lower == "redis":
+        return exec_redis_command(
+            {**args, "db": _redis_db_index()}, tool, exp, sql_statement
+        )
+    if lower == "mongodb":
+        # MongoDB 执行策略:
+        # 1. 如果是 dict 或 JSON 对象格式(带 "op" 字段),使用 JSON 操作模式
+        # 2. 否则默认使用容器 shell 执行模式(支持所有操作)
+        if isinstance(sql_statement, dict):
+            return exec_mongodb_json_operation(args, tool, exp, sql_statement)
+        if isinstance(sql_statement, str):
+            stripped = sql_statement.strip()
+            # 尝试解析为 JSON 操作对象
+            if stripped.startswith("{") and stripped.endswith("}"):
+                try:
+                    import json as _json
+
+                    op_obj = _json.loads(stripped)
+                    if isinstance(op_obj, dict) and op_obj.get("op"):
+                        return exec_mongodb_json_operation(args, tool, exp, op_obj)
+                except Exception:
+                    pass
+            # 默认使用容器 shell 执行模式(支持 findOne/aggregate/链式等所有操作)
+            return exec_mongodb_shell_in_container(args, tool, exp, sql_statement)
+        return (
+            None,
+            0,
+            f"unsupported mongo statement type: {type(sql_statement).__name__}",
+        )
+    if lower == "memcached":
+        if not isinstance(sql_statement, str):
+            return None, 0, "memcached command must be string"
+        return exec_memcached_command(args, tool, exp, sql_statement)
+    if lower == "consul":
+        if not isinstance(sql_statement, str):
+            return None, 0, "consul command must be string"
+        return exec_consul_command(args, tool, exp, sql_statement)
+    if lower == "etcd":
+        if not isinstance(sql_statement, str):
+            return None, 0, "etcd command must be string"
+        return exec_etcd_command(
+            {**args, "container_name": args.get("container_name", "etcd_QTRAN")},
+            tool,
+            exp,
+            sql_statement,
+        )
+
+
 def exec_sql_statement(tool, exp, dbType, sql_statement):
     """统一入口：根据 dbType 获取连接参数并执行 SQL，返回 (结果, 耗时, 错误)。"""
     # 创建连接池实例
@@ -1060,63 +1314,14 @@ def exec_sql_statement(tool, exp, dbType, sql_statement):
         tool = "sqlancer"
     args = get_database_connector_args(dbType.lower())
 
-    args["dbname"] = (
-        f"{tool}_{exp}_{dbType}".lower()
-        if "tlp" not in exp
-        else f"{tool}_tlp_{dbType}".lower()
-    )
-
-    nosql_targets = {"redis", "mongodb", "memcached", "etcd", "consul"}
-    # Redis 特殊处理：走单独的执行函数（不使用 SQLAlchemy）
-    if dbType.lower() in nosql_targets:
-        lower = dbType.lower()
-        if lower == "redis":
-            return exec_redis_command(args, tool, exp, sql_statement)
-        if lower == "mongodb":
-            # MongoDB 执行策略:
-            # 1. 如果是 dict 或 JSON 对象格式(带 "op" 字段),使用 JSON 操作模式
-            # 2. 否则默认使用容器 shell 执行模式(支持所有操作)
-            if isinstance(sql_statement, dict):
-                return exec_mongodb_json_operation(args, tool, exp, sql_statement)
-            if isinstance(sql_statement, str):
-                stripped = sql_statement.strip()
-                # 尝试解析为 JSON 操作对象
-                if stripped.startswith("{") and stripped.endswith("}"):
-                    try:
-                        import json as _json
+    args["dbname"] = build_dbname(tool, exp, dbType)
 
-                        op_obj = _json.loads(stripped)
-                        if isinstance(op_obj, dict) and op_obj.get("op"):
-                            return exec_mongodb_json_operation(args, tool, exp, op_obj)
-                    except Exception:
-                        pass
-                # 默认使用容器 shell 执行模式(支持 findOne/aggregate/链式等所有操作)
-                return exec_mongodb_shell_in_container(args, tool, exp, sql_statement)
-            return (
-                None,
-                0,
-                f"unsupported mongo statement type: {type(sql_statement).__name__}",
-            )
-        if lower == "memcached":
-            if not isinstance(sql_statement, str):
-                return None, 0, "memcached command must be string"
-            return exec_memcached_command(args, tool, exp, sql_statement)
-        if lower == "consul":
-            if not isinstance(sql_statement, str):
-                return None, 0, "consul command must be string"
-            return exec_consul_command(args, tool, exp, sql_statement)
-        if lower == "etcd":
-            if not isinstance(sql_statement, str):
-                return None, 0, "etcd command must be string"
-            return exec_etcd_command(
-                {**args, "container_name": args.get("container_name", "etcd_QTRAN")},
-                tool,
-                exp,
-                sql_statement,
-            )
+    # Redis/MongoDB 等 NoSQL 目标走单独的执行函数（不使用 SQLAlchemy）
+    if dbType.lower() in NOSQL_TARGETS:
+        return _exec_nosql_statement(args, tool, exp, dbType, sql_statement)
 
-    # 先检查容器是否打开，即数据库是否能正常链接，如果没有正常链接则打开容器
-    pool = DatabaseConnectionPool(
+    # 复用进程级引擎；仅在首次创建时检查容器是否打开，之后由 pool_pre_ping 在取连接时探活
+    pool, created = get_connection_pool(
         args["dbType"],
         args["host"],
         args["port"],
@@ -1125,13 +1330,56 @@ def exec_sql_statement(tool, exp, dbType, sql_statement):
         args["dbname"],
     )
 
-    if dbType not in ["clickhouse"] and not pool.check_connection():
+    if created and dbType not in ["clickhouse"] and not pool.check_connection():
         run_container(tool, exp, dbType)
     result, exec_time, error_message = pool.execSQL(sql_statement)
-    pool.close()
     return result, exec_time, error_message
 
 
+def exec_sql_batch(
+    tool, exp, dbType, statements, stop_on_error=False, transaction=False
+):
+    """在同一连接上顺序执行一组语句（DDL/DML 回放、NoSQL 命令回放）。
+
+    - SQL 目标：从进程级注册表取一次连接池，整批语句共用一个连接；
+      transaction=True 时整批放在一个事务里，任一语句失败即整体回滚并停止。
+    - NoSQL 目标：逐条分发到对应的共享客户端。
+    - stop_on_error=True 时遇到第一条错误即停止。
+
+    返回逐条 (结果, 耗时, 错误) 列表，只包含实际执行过的语句。
+    """
+    if tool.lower() in ["sqlancer", "sqlright"]:
+        tool = "sqlancer"
+    statements = [stmt for stmt in statements if stmt]
+    if not statements:
+        return []
+    args = get_database_connector_args(dbType.lower())
+    args["dbname"] = build_dbname(tool, exp, dbType)
+
+    if dbType.lower() in NOSQL_TARGETS:
+        outcomes = []
+        for stmt in statements:
+            outcome = _exec_nosql_statement(args, tool, exp, dbType, stmt)
+            outcomes.append(outcome)
+            if stop_on_error and outcome[2]:
+                break
+        return outcomes
+
+    pool, created = get_connection_pool(
+        args["dbType"],
+        args["host"],
+        args["port"],
+        args["username"],
+        args["password"],
+        args["dbname"],
+    )
+    if created and dbType not in ["clickhouse"] and not pool.check_connection():
+        run_container(tool, exp, dbType)
+    return pool.execBatch(
+        statements, stop_on_error=stop_on_error, transaction=transaction
+    )
+
+
 def exec_redis_command(conn_args, tool, exp, redis_command):
     """
     执行 Redis 命令，返回统一三元组：(标准化结果, 耗时, 错误)。
@@ -1150,13 +1398,9 @@ def exec_redis_command(conn_args, tool, exp, redis_command):
         port = int(conn_args.get("port", 6379))
         username = conn_args.get("username") or None
         password = conn_args.get("password") or None
-        # 建立连接（短连接模式；如需性能可加入连接池/全局缓存）
-        client = redis.Redis(
-            host=host,
-            port=port,
-            username=username,
-            password=password,
-            decode_responses=False,
+        # 复用进程级客户端（redis-py 内部自带线程安全的连接池）
+        client = get_redis_client(
+            host, port, username, password, db=int(conn_args.get("db", 0))
         )
 
         # 解析命令：按空白切分，首元素为命令
@@ -1283,7 +1527,7 @@ def exec_mongodb_json_operation(conn_args, tool, exp, op_obj):
     返回: (标准化结果dict, 耗时, 错误)
     """
     try:
-        from pymongo import MongoClient
+        import pymongo  # 仅检查依赖是否安装
     except ImportError:
         return None, 0, "pymongo not installed"
 
@@ -1306,21 +1550,13 @@ def exec_mongodb_json_operation(conn_args, tool, exp, op_obj):
     if op_name not in allowed_ops:
         return None, 0, f"unsupported op: {op_name}"
 
-    host = conn_args.get("host", "127.0.0.1")
-    port = int(conn_args.get("port", 27017))
-    username = conn_args.get("username") or None
-    password = conn_args.get("password") or None
     dbname = conn_args["dbname"]
-    if username and password:
-        uri = f"mongodb://{username}:{password}@{host}:{port}/"
-    else:
-        uri = f"mongodb://{host}:{port}/"
 
     start = time.time()
     try:
         from pymongo.errors import CollectionInvalid
 
-        client = MongoClient(uri, serverSelectionTimeoutMS=3000)
+        client = get_mongo_client(build_mongo_uri(conn_args))
         db = client[dbname]
 
         if op_name == "createCollection":
@@ -1405,6 +1641,66 @@ def exec_mongodb_json_operation(conn_args, tool, exp, op_obj):
         return None, 0, str(e)
 
 
+def _mongo_shell_output_result(output, shell_binary, exec_time, extra_meta=None):
+    """把 mongo shell 的输出文本转成标准化结果 (result, 耗时, None)。"""
+    extra_meta = extra_meta or {}
+    # 尝试解析为 JSON(如果是 find/aggregate 等返回)
+    try:
+        if output:
+            # MongoDB shell 可能返回 JSON 数组或对象
+            parsed = json.loads(output)
+            return (
+                {
+                    "type": "shell_result",
+                    "success": True,
+                    "value": parsed,
+                    "meta": {
+                        "shell": shell_binary,
+                        "raw_output": output[:200],
+                        **extra_meta,
+                    },
+                },
+                exec_time,
+                None,
+            )
+        else:
+            # 空输出(可能是写操作)
+            return (
+                {
+                    "type": "shell_result",
+                    "success": True,
+                    "value": None,
+                    "meta": {
+                        "shell": shell_binary,
+                        "message": "command executed",
+                        **extra_meta,
+                    },
+                },
+                exec_time,
+                None,
+            )
+    except json.JSONDecodeError:
+        # 非 JSON 输出,直接返回原文
+        return (
+            {
+                "type": "shell_result",
+                "success": True,
+                "value": output,
+                "meta": {"shell": shell_binary, "format": "text", **extra_meta},
+            },
+            exec_time,
+            None,
+        )
+
+
+def _mongo_shell_session_enabled():
+    return os.environ.get("QTRAN_MONGO_SHELL_SESSION", "true").lower() not in (
+        "0",
+        "false",
+        "no",
+    )
+
+
 def exec_mongodb_shell_in_container(conn_args, tool, exp, shell_command):
     """通过 docker exec 在容器里执行原生 MongoDB shell 命令(默认模式)。
 
@@ -1413,6 +1709,12 @@ def exec_mongodb_shell_in_container(conn_args, tool, exp, shell_command):
       - 无需解析复杂语法
       - 与 MongoDB shell 完全兼容
 
+    执行方式:
+      - 优先复用 (容器, 库) 对应的常驻 mongosh 会话(见 mongo_shell_session)，省掉每条语句的 shell 启动开销。
+      - 会话无法包裹的语句(如 show/use)或会话启动失败时，回退到一次性 `--eval` 执行；
+        命令已发给会话后出错则直接返回错误，不再重放(避免非幂等写入执行两次)。
+      - 设置 QTRAN_MONGO_SHELL_SESSION=false 可强制使用一次性执行。
+
     参数:
       conn_args: 连接参数字典(包含 container_name, dbname)
       tool: 工具名称
@@ -1430,6 +1732,27 @@ def exec_mongodb_shell_in_container(conn_args, tool, exp, shell_command):
     # 清理命令:去掉结尾分号
     cmd = shell_command.strip().rstrip(";")
 
+    if _mongo_shell_session_enabled():
+        start = time.time()
+        try:
+            session = get_mongo_shell_session(container, dbname)
+            status, output = session.execute(cmd, timeout=30)
+            if status == "ok":
+                return _mongo_shell_output_result(
+                    output, "mongosh", time.time() - start, {"session": True}
+                )
+            if status == "error":
+                return None, 0, f"mongosh error: {output}"
+            # status == "unparsed": 语句无法按表达式包裹，走一次性执行
+        except MongoShellTimeout:
+            return None, 0, "mongosh execution timeout (30s)"
+        except MongoShellStartError:
+            # 会话启动失败(如容器内没有 mongosh)，命令尚未发送，回退到一次性执行
+            pass
+        except Exception as e:
+            # 命令已发送(会话中途退出等)，可能已经生效，不能重放
+            return None, 0, f"mongosh session error: {e}"
+
     # 构造 mongosh 命令(MongoDB 5.0+ 使用 mongosh,旧版使用 mongo)
     # 尝试 mongosh 优先,失败则回退到 mongo
     start = time.time()
@@ -1454,52 +1777,7 @@ def exec_mongodb_shell_in_container(conn_args, tool, exp, shell_command):
             if proc.returncode == 0:
                 output = proc.stdout.strip()
                 exec_time = time.time() - start
-
-                # 尝试解析为 JSON(如果是 find/aggregate 等返回)
-                try:
-                    if output:
-                        # MongoDB shell 可能返回 JSON 数组或对象
-                        parsed = json.loads(output)
-                        return (
-                            {
-                                "type": "shell_result",
-                                "success": True,
-                                "value": parsed,
-                                "meta": {
-                                    "shell": shell_binary,
-                                    "raw_output": output[:200],
-                                },
-                            },
-                            exec_time,
-                            None,
-                        )
-                    else:
-                        # 空输出(可能是写操作)
-                        return (
-                            {
-                                "type": "shell_result",
-                                "success": True,
-                                "value": None,
-                                "meta": {
-                                    "shell": shell_binary,
-                                    "message": "command executed",
-                                },
-                            },
-                            exec_time,
-                            None,
-                        )
-                except json.JSONDecodeError:
-                    # 非 JSON 输出,直接返回原文
-                    return (
-                        {
-                            "type": "shell_result",
-                            "success": True,
-                            "value": output,
-                            "meta": {"shell": shell_binary, "format": "text"},
-                        },
-                        exec_time,
-                        None,
-                    )
+                return _mongo_shell_output_result(output, shell_binary, exec_time)
             else:
                 # 命令执行失败
                 stderr = proc.stderr.strip()
@@ -1539,7 +1817,7 @@ def exec_mongodb_command(conn_args, tool, exp, mongo_command):
       - 不支持聚合 / 复杂链式（可后续扩展）。
     """
     try:
-        from pymongo import MongoClient
+        import pymongo  # 仅检查依赖是否安装
     except ImportError:
         return None, 0, "pymongo not installed"
 
@@ -1599,18 +1877,10 @@ def exec_mongodb_command(conn_args, tool, exp, mongo_command):
     except ValueError as ve:
         return None, 0, f"json parse error: {ve}"
 
-    # 连接
-    host = conn_args.get("host", "127.0.0.1")
-    port = int(conn_args.get("port", 27017))
-    username = conn_args.get("username") or None
-    password = conn_args.get("password") or None
+    # 连接（复用进程级 MongoClient）
     dbname = conn_args["dbname"]
-    if username and password:
-        uri = f"mongodb://{username}:{password}@{host}:{port}/"
-    else:
-        uri = f"mongodb://{host}:{port}/"
     try:
-        client = MongoClient(uri, serverSelectionTimeoutMS=3000)
+        client = get_mongo_client(build_mongo_uri(conn_args))
         db = client[dbname]
         coll_ref = db[collection]
         if op_name == "insertOne":
@@ -1685,16 +1955,19 @@ def run_with_timeout(func, timeout, *args, **kwargs):
 
 
 def database_define_pinolo(tool, exp, dbType):
-    # 创建连接池实例
+    """执行 pinolo 场景的建表/插数脚本（整批共用一个连接）。
+
+    库名沿用 pinolo 原有的 f"{tool}_{exp}_{dbType}"（不转小写、不加 worker 后缀），
+    与既有的 pinolo 环境保持一致，因此不经过 build_dbname / exec_sql_batch。
+    """
     args = get_database_connector_args(dbType.lower())
-    args["dbname"] = f"{tool}_{exp}_{dbType}"
-    pool = DatabaseConnectionPool(
+    pool, _ = get_connection_pool(
         args["dbType"],
         args["host"],
         args["port"],
         args["username"],
         args["password"],
-        args["dbname"],
+        f"{tool}_{exp}_{dbType}",
     )
     with open(
         os.path.join(current_dir, tool.lower(), exp.lower(), dbType.lower() + ".json"),
@@ -1702,18 +1975,7 @@ def database_define_pinolo(tool, exp, dbType):
         encoding="utf-8",
     ) as rf:
         ddls = json.load(rf)
-        for ddl in ddls:
-            pool.execSQL(ddl)
-    pool.close()
-
-
-def get_database_connector_args(dbType):
-    with open(
-        os.path.join(current_dir, "database_connector_args.json"), "r", encoding="utf-8"
-    ) as r:
-        database_connection_args = json.load(r)
-    if dbType.lower() in database_connection_args:
-        return database_connection_args[dbType.lower()]
+    pool.execBatch([ddl for ddl in ddls if ddl])
 
 
 def database_connect_test():
@@ -0,0 +1,351 @@
+"""
+快速重置引擎：每个 (tool, molt, db) 取一次干净快照，之后从快照廉价恢复
+
+作用概述：
+- database_clear 每次都整库删除重建（MonetDB 需 5 次 docker exec），translate_sqlancer 每个 bug 会调用多次。
+- 首次重置走 database_clear 得到干净库并做快照，后续按后端选择的模式恢复：
+    template   : Postgres，DROP DATABASE + CREATE DATABASE ... TEMPLATE <快照库>
+    drop_tables: MySQL/MariaDB/TiDB/TDSQL/MonetDB，保留库与连接池，删除库内全部用户对象
+                 （表、视图、序列、触发器、事件、存储过程/函数）
+    file_copy  : SQLite/DuckDB，用快照文件覆盖库文件
+    recreate   : 其它后端，直接调用 database_clear
+- 模式覆盖（优先级从高到低）：环境变量 QTRAN_RESET_MODE_<DB>（如 QTRAN_RESET_MODE_POSTGRES）、
+  环境变量 QTRAN_RESET_MODE、database_connector_args.json 中的 "reset_mode"。
+  覆盖值只能是该后端的默认模式或 recreate，不适用的值（如给 MySQL 指定 template）会被忽略。
+- 恢复失败时回退到 database_clear 并在下次重新取快照；每次重置耗时计入 get_reset_stats()。
+"""
+
+import os
+import shutil
+import threading
+import time
+
+from sqlalchemy import text
+
+from src.Tools.DatabaseConnect.connector_args import get_database_connector_args
+from src.Tools.DatabaseConnect.database_connector import (
+    build_dbname,
+    current_dir,
+    database_clear,
+    dispose_connection_pool,
+    get_connection_pool,
+)
+from src.Tools.DatabaseConnect.native_file_db import in_memory_mode
+
+RESET_MODES = {
+    "postgres": "template",
+    "mysql": "drop_tables",
+    "mariadb": "drop_tables",
+    "tidb": "drop_tables",
+    "tdsql": "drop_tables",
+    "monetdb": "drop_tables",
+    "sqlite": "file_copy",
+    "duckdb": "file_copy",
+}
+
+_FILE_SUFFIX = {"sqlite": ".db", "duckdb": ".duckdb"}
+
+_snapshots = set()  # 已取快照的 (dbType, dbname)
+_ignored_overrides = set()  # 已提示过的无效覆盖 (dbType, mode)
+_stats = {}  # (dbType, mode) -> {"count", "total", "max"}
+_lock = threading.Lock()
+
+
+def select_reset_mode(dbType, args=None):
+    """返回 dbType 使用的重置模式（QTRAN_RESET_MODE_<DB> > QTRAN_RESET_MODE > 连接配置 > 默认表）。
+
+    覆盖值只在该后端支持时生效（默认模式或 recreate），否则忽略并提示一次。
+    """
+    db = dbType.lower()
+    default = RESET_MODES.get(db, "recreate")
+    if db in _FILE_SUFFIX and in_memory_mode():
+        # 内存库没有文件可复制，关闭连接即清空
+        return "recreate"
+    overrides = (
+        os.environ.get(f"QTRAN_RESET_MODE_{db.upper()}"),
+        os.environ.get("QTRAN_RESET_MODE"),
+        args.get("reset_mode") if args is not None else None,
+    )
+    for mode in overrides:
+        if not mode:
+            continue
+        mode = str(mode).lower()
+        if mode in (default, "recreate"):
+            return mode
+        with _lock:
+            first = (db, mode) not in _ignored_overrides
+            _ignored_overrides.add((db, mode))
+        if first:
+            print(f"⚠️ 重置模式 {mode} 不适用于 {db}，忽略（可用: {default}, recreate）")
+    return default
+
+
+# ---------------- 快照 ---------------- #
+def _template_name(dbname):
+    return f"{dbname}_tpl"
+
+
+def _admin_pool(tool, dbType, args):
+    pool, _ = get_connection_pool(
+        args["dbType"],
+        args["host"],
+        args["port"],
+        args["username"],
+        args["password"],
+        f"{tool.lower()}_temp_{dbType.lower()}",
+    )
+    return pool
+
+
+def _exec_or_raise(pool, sql):
+    _, _, error = pool.execSQL(sql)
+    if error:
+        raise RuntimeError(error)
+
+
+def _file_path(dbType, dbname):
+    return os.path.join(current_dir, dbname + _FILE_SUFFIX[dbType.lower()])
+
+
+def _take_snapshot(mode, tool, dbType, args):
+    dbname = args["dbname"]
+    if mode == "template":
+        # 刚由 database_clear 重建的空库即为模板源；模板库不能有活动连接
+        dispose_connection_pool(args["dbType"], args["host"], args["port"], dbname)
+        pool = _admin_pool(tool, dbType, args)
+        _exec_or_raise(pool, f"DROP DATABASE IF EXISTS {_template_name(dbname)};")
+        _exec_or_raise(
+            pool, f"CREATE DATABASE {_template_name(dbname)} TEMPLATE {dbname};"
+        )
+    elif mode == "file_copy":
+        # 先让引擎落盘出一个空库文件，再复制为快照
+        pool, _ = get_connection_pool(
+            args["dbType"],
+            args["host"],
+            args["port"],
+            args["username"],
+            args["password"],
+            dbname,
+        )
+        _exec_or_raise(pool, "SELECT 1;")
+        dispose_connection_pool(args["dbType"], args["host"], args["port"], dbname)
+        path = _file_path(dbType, dbname)
+        shutil.copyfile(path, path + ".clean")
+    # drop_tables 模式的"快照"就是空库本身，无需额外动作
+
+
+# ---------------- 恢复 ---------------- #
+def _catalog_rows(conn, sql, params=None):
+    """查询可选的系统目录（如 TiDB 没有事件/触发器实现）；目录不存在即视为没有此类对象。"""
+    try:
+        return conn.execute(text(sql), params or {}).fetchall()
+    except Exception:
+        return []
+
+
+def _drop_statements_mysql(conn, dbname):
+    """库内全部用户对象：触发器、事件、表/视图/序列、存储过程与函数。"""
+    stmts = []
+    for (name,) in _catalog_rows(
+        conn,
+        "SELECT trigger_name FROM information_schema.triggers "
+        "WHERE trigger_schema = :db",
+        {"db": dbname},
+    ):
+        stmts.append(f"DROP TRIGGER IF EXISTS `{dbname}`.`{name}`")
+    for (name,) in _catalog_rows(
+        conn,
+        "SELECT event_name FROM information_schema.events WHERE event_schema = :db",
+        {"db": dbname},
+    ):
+        stmts.append(f"DROP EVENT IF EXISTS `{dbname}`.`{name}`")
+    rows = conn.execute(
+        text(
+            "SELECT table_name, table_type FROM information_schema.tables "
+            "WHERE table_schema = :db"
+        ),
+        {"db": dbname},
+    ).fetchall()
+    for name, table_type in rows:
+        kind = {"VIEW": "VIEW", "SEQUENCE": "SEQUENCE"}.get(
+            str(table_type).upper(), "TABLE"
+        )
+        stmts.append(f"DROP {kind} IF EXISTS `{dbname}`.`{name}`")
+    rows = conn.execute(
+        text(
+            "SELECT routine_name, routine_type FROM information_schema.routines "
+            "WHERE routine_schema = :db"
+        ),
+        {"db": dbname},
+    ).fetchall()
+    for name, routine_type in rows:
+        stmts.append(f"DROP {routine_type} IF EXISTS `{dbname}`.`{name}`")
+    return stmts
+
+
+# sys.functions.type -> DROP ALL 语句中的对象类别（DROP ALL 一并删除同名重载）
+_MONETDB_FUNCTION_KINDS = {
+    1: "FUNCTION",
+    2: "PROCEDURE",
+    3: "AGGREGATE",
+    4: "FILTER FUNCTION",
+    5: "FUNCTION",
+    7: "LOADER",
+}
+
+
+def _drop_statements_monetdb(conn):
+    """当前 schema 的用户对象：触发器、视图、表、函数/过程（序列见 _drop_sequence_statements_monetdb）。"""
+    triggers = [
+        f'DROP TRIGGER IF EXISTS "{name}"'
+        for (name,) in conn.execute(
+            text(
+                "SELECT tr.name FROM sys.triggers tr "
+                "JOIN sys.tables t ON tr.table_id = t.id "
+                "JOIN sys.schemas s ON t.schema_id = s.id "
+                "WHERE s.name = CURRENT_SCHEMA AND t.system = false"
+            )
+        ).fetchall()
+    ]
+    rows = conn.execute(
+        text(
+            "SELECT t.name, t.type FROM sys.tables t "
+            "JOIN sys.schemas s ON t.schema_id = s.id "
+            "WHERE s.name = CURRENT_SCHEMA AND t.system = false AND t.temporary = 0"
+        )
+    ).fetchall()
+    # 先删视图再删表，CASCADE 兜底依赖关系
+    views = [f'DROP VIEW IF EXISTS "{name}" CASCADE' for name, t in rows if t == 1]
+    tables = [f'DROP TABLE IF EXISTS "{name}" CASCADE' for name, t in rows if t != 1]
+    functions = []
+    for name, ftype in conn.execute(
+        text(
+            "SELECT DISTINCT f.name, f.type FROM sys.functions f "
+            "JOIN sys.schemas s ON f.schema_id = s.id "
+            "WHERE s.name = CURRENT_SCHEMA AND f.system = false"
+        )
+    ).fetchall():
+        kind = _MONETDB_FUNCTION_KINDS.get(int(ftype), "FUNCTION")
+        statement = f'DROP ALL {kind} "{name}" CASCADE'
+        if statement not in functions:
+            functions.append(statement)
+    return triggers + views + tables + functions
+
+
+def _drop_sequence_statements_monetdb(conn):
+    """删表之后剩下的独立序列（自增列的序列已随表删除，因此必须在删表后查询）。"""
+    return [
+        f'DROP SEQUENCE "{name}"'
+        for (name,) in conn.execute(
+            text(
+                "SELECT q.name FROM sys.sequences q "
+                "JOIN sys.schemas s ON q.schema_id = s.id "
+                "WHERE s.name = CURRENT_SCHEMA"
+            )
+        ).fetchall()
+    ]
+
+
+def _restore(mode, tool, dbType, args):
+    dbname = args["dbname"]
+    if mode == "template":
+        dispose_connection_pool(args["dbType"], args["host"], args["port"], dbname)
+        pool = _admin_pool(tool, dbType, args)
+        _exec_or_raise(pool, f"DROP DATABASE IF EXISTS {dbname};")
+        _exec_or_raise(
+            pool, f"CREATE DATABASE {dbname} TEMPLATE {_template_name(dbname)};"
+        )
+    elif mode == "file_copy":
+        dispose_connection_pool(args["dbType"], args["host"], args["port"], dbname)
+        path = _file_path(dbType, dbname)
+        for leftover in (path + "-wal", path + "-journal", path + ".wal"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        shutil.copyfile(path + ".clean", path)
+    elif mode == "drop_tables":
+        # 复用进程级连接池，库本身与连接都保留
+        pool, _ = get_connection_pool(
+            args["dbType"],
+            args["host"],
+            args["port"],
+            args["username"],
+            args["password"],
+            dbname,
+        )
+        with pool.engine.connect() as conn:
+            if dbType.lower() == "monetdb":
+                stmts = _drop_statements_monetdb(conn)
+            else:
+                conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+                stmts = _drop_statements_mysql(conn, dbname)
+            for stmt in stmts:
+                conn.execute(text(stmt))
+            if dbType.lower() == "monetdb":
+                for stmt in _drop_sequence_statements_monetdb(conn):
+                    conn.execute(text(stmt))
+            else:
+                conn.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+            conn.commit()
+    else:
+        raise ValueError(f"unknown reset mode: {mode}")
+
+
+def _record(dbType, mode, elapsed):
+    with _lock:
+        entry = _stats.setdefault(
+            (dbType.lower(), mode), {"count": 0, "total": 0.0, "max": 0.0}
+        )
+        entry["count"] += 1
+        entry["total"] += elapsed
+        entry["max"] = max(entry["max"], elapsed)
+
+
+def database_reset(tool, exp, dbType):
+    """把 (tool, exp, dbType) 对应的库恢复到干净状态，返回本次耗时（秒）。
+
+    与 database_clear 语义相同（结束后库存在且为空），但首次之后走快照恢复。
+    """
+    start = time.time()
+    args = get_database_connector_args(dbType.lower())
+    mode = select_reset_mode(dbType, args)
+    if args is None or mode == "recreate":
+        database_clear(tool, exp, dbType)
+        mode = "recreate"
+    else:
+        args["dbname"] = build_dbname(tool, exp, dbType)
+        key = (dbType.lower(), args["dbname"])
+        if key not in _snapshots:
+            database_clear(tool, exp, dbType)
+            try:
+                _take_snapshot(mode, tool, dbType, args)
+                with _lock:
+                    _snapshots.add(key)
+            except Exception as e:
+                print(f"⚠️ {args['dbname']} 快照失败，继续使用 database_clear: {e}")
+            mode = "snapshot"
+        else:
+            try:
+                _restore(mode, tool, dbType, args)
+            except Exception as e:
+                print(f"⚠️ {args['dbname']} 快照恢复失败({mode})，回退 database_clear: {e}")
+                with _lock:
+                    _snapshots.discard(key)
+                database_clear(tool, exp, dbType)
+                mode = "recreate"
+    elapsed = time.time() - start
+    _record(dbType, mode, elapsed)
+    return elapsed
+
+
+def get_reset_stats():
+    """返回各 (dbType, mode) 的重置次数、总耗时、平均与最大耗时。"""
+    with _lock:
+        return {
+            f"{db}/{mode}": {
+                "count": v["count"],
+                "total": round(v["total"], 4),
+                "avg": round(v["total"] / v["count"], 4) if v["count"] else 0.0,
+                "max": round(v["max"], 4),
+            }
+            for (db, mode), v in _stats.items()
+        }
@@ -4,12 +4,21 @@
 作用概述：
 - 依据配置文件生成各数据库容器，创建工具/实验隔离的数据库实例。
 - 提供 run_container 与 docker_create_databases 以供主流程在启动时准备环境。
+- 启动后以就绪探测（端口 + SELECT 1 / ping）加指数退避等待，代替固定 sleep。
+- bootstrap_databases 按数据库类型并发准备环境；已按相同配置建好的库通过幂等缓存跳过。
 """
 
+import hashlib
 import json
+import socket
 import subprocess
+import threading
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.Tools.DatabaseConnect.connector_args import get_database_connector_args
+from src.Tools.cache_dir import cache_path
 
 current_file_path = os.path.abspath(__file__)
 # 获取当前文件所在目录
@@ -20,14 +29,9 @@ with open(
 ) as r:
     docker_commands = json.load(r)
 
-
-def get_database_connector_args(dbType):
-    with open(
-        os.path.join(current_dir, "database_connector_args.json"), "r", encoding="utf-8"
-    ) as r:
-        database_connection_args = json.load(r)
-    if dbType.lower() in database_connection_args:
-        return database_connection_args[dbType.lower()]
+READY_TIMEOUT = 90  # 单个容器就绪等待上限（秒）
+BOOTSTRAP_CACHE_FILENAME = "docker_bootstrap.json"  # 位于 Output/cache（见 src/Tools/cache_dir.py）
+_bootstrap_cache_lock = threading.Lock()
 
 
 def run_command(command, capture_output=True, shell=True):
@@ -36,6 +40,7 @@ def run_command(command, capture_output=True, shell=True):
     :param command: 要执行的命令列表。
     :param capture_output: 是否捕获输出。
     :param shell: 是否通过 shell 执行。
+    :return: subprocess.CompletedProcess（不检查返回码，由调用方依据 returncode 判断成败）。
     """
     import platform
 
@@ -123,6 +128,240 @@ def is_container_running(container_name):
     return container_name in result.stdout  # 如果 stdout 非空，表示镜像存在
 
 
+def _command_ok(command):
+    """执行命令，返回其退出码是否为 0。"""
+    return run_command(command).returncode == 0
+
+
+# -------------------- 就绪探测 -------------------- #
+def _port_open(host, port, timeout=1.0):
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def probe_ready(dbType, args):
+    """单次就绪探测：端口可连且服务能响应最小请求（SELECT 1 / ping）。"""
+    db = dbType.lower()
+    host = args.get("host") or "127.0.0.1"
+    port = args.get("port")
+    if not port or not _port_open(host, port):
+        return False
+    try:
+        if db in ("mysql", "mariadb", "tidb", "tdsql"):
+            import pymysql
+
+            conn = pymysql.connect(
+                host=host,
+                port=int(port),
+                user=args.get("username"),
+                password=args.get("password") or "",
+                connect_timeout=2,
+            )
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            finally:
+                conn.close()
+        elif db == "postgres":
+            import psycopg2
+
+            conn = psycopg2.connect(
+                host=host,
+                port=int(port),
+                user=args.get("username"),
+                password=args.get("password"),
+                dbname="postgres",
+                connect_timeout=2,
+            )
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            finally:
+                conn.close()
+        elif db == "clickhouse":
+            from urllib.request import urlopen
+
+            with urlopen(f"http://{host}:{port}/ping", timeout=2) as resp:
+                return resp.status == 200
+        elif db == "redis":
+            from src.Tools.DatabaseConnect.nosql_client_pool import get_redis_client
+
+            return bool(
+                get_redis_client(
+                    host,
+                    port,
+                    args.get("username"),
+                    args.get("password"),
+                    socket_timeout=1,
+                ).ping()
+            )
+        elif db == "mongodb":
+            from src.Tools.DatabaseConnect.nosql_client_pool import (
+                build_mongo_uri,
+                get_mongo_client,
+            )
+
+            get_mongo_client(build_mongo_uri(args)).admin.command("ping")
+        elif db == "memcached":
+            with socket.create_connection((host, int(port)), timeout=1) as sock:
+                sock.sendall(b"version\r\n")
+                return sock.recv(64).startswith(b"VERSION")
+        elif db == "etcd":
+            from src.Tools.DatabaseConnect.nosql_client_pool import get_etcd_client
+
+            get_etcd_client(host, port).status(timeout=2)
+        elif db == "consul":
+            from urllib.request import urlopen
+
+            with urlopen(f"http://{host}:{port}/v1/status/leader", timeout=2) as resp:
+                return resp.status == 200
+        # 其它类型（如 monetdb）端口可连即视为就绪
+        return True
+    except Exception:
+        return False
+
+
+def probe_database(dbType, args):
+    """
+    探测 args["dbname"] 对应的测试库本身是否可用（而不只是服务在线）：
+    SQL 类连接到该库执行 SELECT 1（ClickHouse 用 EXISTS DATABASE），
+    NoSQL 类没有独立的库实体，退化为 probe_ready。
+    """
+    db = dbType.lower()
+    host = args.get("host") or "127.0.0.1"
+    port = args.get("port")
+    dbname = args.get("dbname")
+    if db not in ("mysql", "mariadb", "tidb", "tdsql", "postgres", "clickhouse", "monetdb"):
+        return probe_ready(dbType, args)
+    if not port or not _port_open(host, port):
+        return False
+    try:
+        if db in ("mysql", "mariadb", "tidb", "tdsql"):
+            import pymysql
+
+            conn = pymysql.connect(
+                host=host,
+                port=int(port),
+                user=args.get("username"),
+                password=args.get("password") or "",
+                database=dbname,
+                connect_timeout=2,
+            )
+        elif db == "postgres":
+            import psycopg2
+
+            conn = psycopg2.connect(
+                host=host,
+                port=int(port),
+                user=args.get("username"),
+                password=args.get("password"),
+                dbname=dbname,
+                connect_timeout=2,
+            )
+        elif db == "monetdb":
+            import pymonetdb
+
+            conn = pymonetdb.connect(
+                hostname=host,
+                port=int(port),
+                username=args.get("username"),
+                password=args.get("password"),
+                database=dbname,
+                connect_timeout=2,
+            )
+        else:  # clickhouse
+            from urllib.parse import quote
+            from urllib.request import Request, urlopen
+
+            request = Request(
+                f"http://{host}:{port}/?query="
+                + quote(f"EXISTS DATABASE `{dbname}`"),
+                headers={
+                    "X-ClickHouse-User": args.get("username") or "default",
+                    "X-ClickHouse-Key": args.get("password") or "",
+                },
+            )
+            with urlopen(request, timeout=2) as resp:
+                return resp.read().strip() == b"1"
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            return True
+        finally:
+            conn.close()
+    except Exception:
+        return False
+
+
+def wait_until_ready(dbType, args, timeout=READY_TIMEOUT):
+    """指数退避轮询 probe_ready，直到就绪或超时；返回是否就绪。"""
+    deadline = time.time() + timeout
+    delay = 0.25
+    while True:
+        if probe_ready(dbType, args):
+            return True
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            print(f"⚠️ {dbType} 在 {timeout}s 内未就绪")
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 5)
+
+
+# -------------------- 幂等缓存 -------------------- #
+def _container_id(container_name):
+    """返回容器 ID，不存在时返回空串（不经 run_command，避免刷屏）。"""
+    if not container_name:
+        return ""
+    try:
+        proc = subprocess.run(
+            ["docker", "inspect", "-f", "{{.Id}}", container_name],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        return proc.stdout.strip() if proc.returncode == 0 else ""
+    except Exception:
+        return ""
+
+
+def _bootstrap_fingerprint(container_id, commands_formatted):
+    """容器实例 + 建库命令的指纹：容器重建或建库配置变化都会使缓存失效。"""
+    payload = json.dumps(
+        {"container_id": container_id, "commands": commands_formatted},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _load_bootstrap_cache():
+    try:
+        with open(cache_path(BOOTSTRAP_CACHE_FILENAME), "r", encoding="utf-8") as rf:
+            return json.load(rf)
+    except (OSError, ValueError):
+        return {}
+
+
+def _bootstrap_cache_get(key):
+    with _bootstrap_cache_lock:
+        return _load_bootstrap_cache().get(key)
+
+
+def _bootstrap_cache_put(key, fingerprint):
+    with _bootstrap_cache_lock:
+        cache = _load_bootstrap_cache()
+        cache[key] = fingerprint
+        path = cache_path(BOOTSTRAP_CACHE_FILENAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as wf:
+            json.dump(cache, wf, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
 def docker_create_databases(tool, exp, dbType):
     """
     根据 docker_create_commands.json 的配置，
@@ -137,7 +376,8 @@ def docker_create_databases(tool, exp, dbType):
       - dbType: 数据库类型（字符串），对应 docker_create_commands.json 中的键。
 
     行为：根据 dbType 的不同走不同逻辑（例如 TiDB/ClickHouse/其他），包含拉镜像、启动容器、进入容器执行建库语句等操作。
-    错误处理：若命令返回非零会捕获 subprocess.CalledProcessError 并打印错误信息（保留原有行为）。
+    错误处理：create_databases 中任一命令返回非零或容器未在时限内就绪时，不写入幂等缓存，
+    下次调用会重新执行初始化；命令无法启动（docker 不存在等）时打印错误并返回。
     """
     if dbType.lower() not in docker_commands:
         return
@@ -146,17 +386,31 @@ def docker_create_databases(tool, exp, dbType):
     args["dbname"] = f"{tool}_{exp}_{dbType}"
     commands_formatted = format_dict_strings(commands, **args)
 
+    # 幂等：同一容器实例上已按相同命令建好且测试库本身可连，则直接跳过
+    cache_key = f"{dbType.lower()}:{args['dbname']}"
+    container_id = _container_id(commands_formatted.get("container_name"))
+    if (
+        container_id
+        and _bootstrap_cache_get(cache_key)
+        == _bootstrap_fingerprint(container_id, commands_formatted)
+        and probe_database(dbType, args)
+    ):
+        print(f"✅ {args['dbname']} ({dbType}) 已就绪，跳过创建")
+        return
+
+    ok = True  # 全部建库命令退出码为 0 且容器就绪
     try:
         if dbType.lower() in ("tidb", "tdsql"):
             # run_tidb / tdsql (tdsql treated as MySQL-protocol-compatible service)
             run_command(commands_formatted["run_container"])
+            ok = wait_until_ready(dbType, args) and ok
             # exec_into_container, login_mysql, create_databases
             for sql in commands_formatted["create_databases"]:
-                run_command(
+                ok = _command_ok(
                     commands_formatted["enter_container"]
                     + commands_formatted["login_in"]
                     + ["'" + sql + "'"]
-                )
+                ) and ok
         elif dbType.lower() == "clickhouse":
             # pull_docker
             if not check_image_exists(commands_formatted["docker_name"]):
@@ -164,7 +418,7 @@ def docker_create_databases(tool, exp, dbType):
             # run_docker_container
             if not is_container_running(commands_formatted["container_name"]):
                 run_command(commands_formatted["run_container"])
-                time.sleep(15)
+                ok = wait_until_ready(dbType, args) and ok
             # enable access
             if (
                 "vim"
@@ -181,17 +435,17 @@ def docker_create_databases(tool, exp, dbType):
             # exec_into_container, login_mysql, create_databases
             for sql in commands_formatted["create_databases"]:
                 if isinstance(sql, list):
-                    run_command(
+                    ok = _command_ok(
                         commands_formatted["enter_container"]
                         + commands_formatted["login_in"]
                         + sql
-                    )
+                    ) and ok
                 elif isinstance(sql, str):
-                    run_command(
+                    ok = _command_ok(
                         commands_formatted["enter_container"]
                         + commands_formatted["login_in"]
                         + ["'" + sql + "'"]
-                    )
+                    ) and ok
         elif dbType.lower() == "redis":
             # pull image
             if not check_image_exists(commands_formatted["docker_name"]):
@@ -199,16 +453,16 @@ def docker_create_databases(tool, exp, dbType):
             # run container
             if not is_container_running(commands_formatted["container_name"]):
                 run_command(commands_formatted["run_container"])
-                time.sleep(5)
+                ok = wait_until_ready(dbType, args) and ok
             # run create_databases commands (通常为 redis-cli 调用)
             for cmd in commands_formatted.get("create_databases", []):
                 if isinstance(cmd, list):
-                    run_command(commands_formatted["enter_container"] + cmd)
+                    ok = _command_ok(commands_formatted["enter_container"] + cmd) and ok
                 elif isinstance(cmd, str):
                     # 字符串形式的命令，通过 shell 执行
-                    run_command(
+                    ok = _command_ok(
                         commands_formatted["enter_container"] + ["sh", "-c", cmd]
-                    )
+                    ) and ok
 
         elif dbType.lower() == "mongodb":
             # pull image
@@ -217,19 +471,19 @@ def docker_create_databases(tool, exp, dbType):
             # run container
             if not is_container_running(commands_formatted["container_name"]):
                 run_command(commands_formatted["run_container"])
-                time.sleep(8)  # 给 mongod 一点启动时间
+                ok = wait_until_ready(dbType, args) and ok  # 等 mongod 可 ping
             # 执行初始化 JS 语句（使用 mongosh --eval）
             for js in commands_formatted.get("create_databases", []):
                 if isinstance(js, list):
                     # 若以后需要拆分成数组形式，可在配置中放 list
-                    run_command(commands_formatted["enter_container"] + js)
+                    ok = _command_ok(commands_formatted["enter_container"] + js) and ok
                 elif isinstance(js, str):
                     # login_in 已包含 --eval，因此拼接 login_in + [js]
-                    run_command(
+                    ok = _command_ok(
                         commands_formatted["enter_container"]
                         + commands_formatted["login_in"]
                         + [js]
-                    )
+                    ) and ok
 
         elif dbType.lower() in ["memcached", "etcd", "consul"]:
             # 通用：拉镜像
@@ -238,17 +492,17 @@ def docker_create_databases(tool, exp, dbType):
             # 启动容器
             if not is_container_running(commands_formatted["container_name"]):
                 run_command(commands_formatted["run_container"])
-                # 适度等待服务启动
-                time.sleep(5)
+                # 等待服务可响应
+                ok = wait_until_ready(dbType, args) and ok
             # 执行 create_databases / KV 测试写读
             for op in commands_formatted.get("create_databases", []):
                 if isinstance(op, list):
-                    run_command(commands_formatted["enter_container"] + op)
+                    ok = _command_ok(commands_formatted["enter_container"] + op) and ok
                 elif isinstance(op, str):
                     # memcached 的 echo/nc 形式是一个 shell 字符串
-                    run_command(
+                    ok = _command_ok(
                         commands_formatted["enter_container"] + ["sh", "-c", op]
-                    )
+                    ) and ok
 
         else:
             # pull_docker
@@ -257,26 +511,61 @@ def docker_create_databases(tool, exp, dbType):
             # run_docker_container
             if not is_container_running(commands_formatted["container_name"]):
                 run_command(commands_formatted["run_container"])
-                time.sleep(15)
+                ok = wait_until_ready(dbType, args) and ok
             # exec_into_container, login_mysql, create_databases
             for sql in commands_formatted["create_databases"]:
                 if isinstance(sql, list):
-                    run_command(
+                    ok = _command_ok(
                         commands_formatted["enter_container"]
                         + commands_formatted["login_in"]
                         + sql
-                    )
+                    ) and ok
                 elif isinstance(sql, str):
-                    run_command(
+                    ok = _command_ok(
                         commands_formatted["enter_container"]
                         + commands_formatted["login_in"]
                         + ["'" + sql + "'"]
-                    )
+                    ) and ok
 
-    except subprocess.CalledProcessError as e:
+        container_id = _container_id(commands_formatted.get("container_name"))
+        if not ok:
+            print(f"⚠️ {args['dbname']} ({dbType}) 初始化未完全成功，不写入幂等缓存")
+        elif container_id:
+            _bootstrap_cache_put(
+                cache_key, _bootstrap_fingerprint(container_id, commands_formatted)
+            )
+    except (subprocess.SubprocessError, OSError) as e:
+        # run_command 不检查返回码；这里只兜住命令本身无法启动的情况
         print(f"命令执行失败：{e}")
-        print(f"标准输出: {e.output}")
-        print(f"标准错误: {e.stderr}")
+
+
+def bootstrap_databases(tool, dbs, exps, max_workers=None):
+    """并发准备多个数据库环境。
+
+    每种数据库一个线程（不同容器互不影响），线程内按 exps 顺序串行建库，
+    避免同一容器被重复启动。返回 {dbType: 耗时秒数}。
+    """
+    dbs = list(dict.fromkeys(dbs))
+    if not dbs:
+        return {}
+    elapsed = {}
+
+    def _prepare(db):
+        start = time.time()
+        for exp in exps:
+            docker_create_databases(tool, exp, db)
+        return time.time() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(dbs)) as executor:
+        futures = {executor.submit(_prepare, db): db for db in dbs}
+        for future in as_completed(futures):
+            db = futures[future]
+            try:
+                elapsed[db] = future.result()
+                print(f"🐳 {db} 准备完成，用时 {elapsed[db]:.1f}s")
+            except Exception as e:
+                print(f"❌ {db} 初始化失败: {e}")
+    return elapsed
 
 
 def run_container(tool, exp, dbType):
@@ -299,13 +588,12 @@ def run_container(tool, exp, dbType):
         else:
             # run_docker_container
             run_command(["docker", "start", commands_formatted["container_name"]])
-            time.sleep(15)
             """
             if not is_container_running(commands_formatted["container_name"]):
                 run_command(["docker", "start", commands_formatted["container_name"]])
                 time.sleep(12)
             """
-    except subprocess.CalledProcessError as e:
+        wait_until_ready(dbType, args)
+    except (subprocess.SubprocessError, OSError) as e:
+        # run_command 不检查返回码；这里只兜住命令本身无法启动的情况
         print(f"命令执行失败：{e}")
-        print(f"标准输出: {e.output}")
-        print(f"标准错误: {e.stderr}")
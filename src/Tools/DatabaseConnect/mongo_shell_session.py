@@ -0,0 +1,215 @@
+"""
+MongoDB 常驻 shell 会话：每个 (容器, 数据库) 维持一个交互式 mongosh 进程
+
+作用概述：
+- 替代每条语句一次 `docker exec ... mongosh --eval` 的做法，省掉 shell 启动开销（数百毫秒/条）。
+- 语句通过 stdin 流式写入，每条用唯一标记包裹输出，实现按命令分隔与单条超时。
+- 会话超时或进程退出后自动丢弃，下一条命令重新拉起；语法无法包裹的语句以及多行/含 // 的语句
+  返回 "unparsed"，由调用方回退到一次性执行。
+- 只有会话启动失败（命令尚未发出）时抛出 MongoShellStartError，调用方可安全回退；
+  命令发出后的失败不能回退，否则非幂等写操作会被执行两次。
+
+协议（每条命令两行输入）：
+  try { let __qtran_r = (<cmd>); ...; print(BEGIN); print(__qtran_r); } catch (e) { print(ERROR + e.message); }
+  print(END)
+- 读到 BEGIN ... END：成功，中间内容即 --eval 模式下的输出。
+- 读到 ERROR：命令执行报错。
+- 只读到 END：第一行未能解析（如 `show collections`），交给调用方回退。
+"""
+
+import atexit
+import itertools
+import queue
+import subprocess
+import threading
+import time
+
+DEFAULT_COMMAND_TIMEOUT = 30
+STARTUP_TIMEOUT = 15
+
+_BEGIN = "__QTRAN_BEGIN_{}__"
+_ERROR = "__QTRAN_ERROR_{}__"
+_END = "__QTRAN_END_{}__"
+
+
+class MongoShellTimeout(Exception):
+    """单条命令在超时时间内没有返回结束标记。"""
+
+
+class MongoShellStartError(Exception):
+    """会话进程未能启动或未就绪；此时命令尚未发送。"""
+
+
+class MongoShellSession:
+    """容器内的单个常驻 mongosh 进程（同一会话内命令串行执行）。"""
+
+    def __init__(self, container, dbname, shell_binary="mongosh"):
+        self.container = container
+        self.dbname = dbname
+        self.shell_binary = shell_binary
+        self._proc = None
+        self._lines = queue.Queue()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    # ---------- 进程管理 ---------- #
+    def _start(self):
+        self._proc = subprocess.Popen(
+            [
+                "docker",
+                "exec",
+                "-i",
+                self.container,
+                self.shell_binary,
+                self.dbname,
+                "--quiet",
+                "--norc",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+        self._lines = queue.Queue()
+        reader = threading.Thread(
+            target=self._pump, args=(self._proc.stdout, self._lines), daemon=True
+        )
+        reader.start()
+        # 关闭提示符，并确认 shell 已就绪
+        self._send_raw("prompt = ''")
+        self._roundtrip(None, STARTUP_TIMEOUT)
+
+    @staticmethod
+    def _pump(stream, lines):
+        for line in iter(stream.readline, ""):
+            lines.put(line.rstrip("\n"))
+        lines.put(None)  # EOF：进程已退出
+
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            if proc.poll() is None:
+                proc.stdin.write("exit\n")
+                proc.stdin.flush()
+                proc.wait(timeout=2)
+        except Exception:
+            pass
+        if proc.poll() is None:
+            proc.kill()
+
+    # ---------- 命令执行 ---------- #
+    def _send_raw(self, text):
+        self._proc.stdin.write(text + "\n")
+        self._proc.stdin.flush()
+
+    def _roundtrip(self, cmd, timeout):
+        """发送一条命令并读到结束标记；返回 (status, payload)。
+
+        status: "ok" | "error" | "unparsed"
+        """
+        seq = next(self._seq)
+        begin, error, end = _BEGIN.format(seq), _ERROR.format(seq), _END.format(seq)
+        if cmd is not None:
+            self._send_raw(
+                "try { let __qtran_r = ("
+                + cmd
+                + "); if (__qtran_r && typeof __qtran_r.toArray === 'function') "
+                "{ __qtran_r = __qtran_r.toArray(); } "
+                f"print('{begin}'); if (__qtran_r !== undefined) {{ print(__qtran_r); }} }} "
+                f"catch (__qtran_e) {{ print('{error}' + __qtran_e.message); }}"
+            )
+        self._send_raw(f"print('{end}')")
+
+        deadline = time.time() + timeout
+        status = "unparsed"
+        payload = []
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise MongoShellTimeout()
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                raise MongoShellTimeout()
+            if line is None:
+                raise RuntimeError("mongo shell session exited")
+            if end in line:
+                break
+            if begin in line:
+                status = "ok"
+                rest = line.split(begin, 1)[1]
+                if rest.strip():
+                    payload.append(rest)
+                continue
+            if error in line:
+                status = "error"
+                payload = [line.split(error, 1)[1]]
+                continue
+            if status == "ok":
+                payload.append(line)
+        return status, "\n".join(payload).strip()
+
+    def execute(self, cmd, timeout=DEFAULT_COMMAND_TIMEOUT):
+        """执行单条语句，返回 (status, output)；超时或进程异常时关闭会话并抛出。
+
+        会话启动失败抛出 MongoShellStartError（命令未发送）；之后的异常意味着命令可能已执行。
+        """
+        # 交互模式按行求值，命令必须是单行：多行命令压成一行可能改变语义
+        # （// 行注释会吞掉后面的包裹代码，模板字符串内容会变），含 // 的也同样交给调用方回退
+        one_line = cmd.strip()
+        if "\n" in one_line or "\r" in one_line or "//" in one_line:
+            return "unparsed", ""
+        with self._lock:
+            if not self.alive():
+                try:
+                    self._start()
+                except Exception as e:
+                    self.close()
+                    raise MongoShellStartError(str(e)) from e
+            try:
+                return self._roundtrip(one_line, timeout)
+            except Exception:
+                self.close()
+                raise
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_mongo_shell_session(container, dbname, shell_binary="mongosh"):
+    """返回 (container, dbname, shell_binary) 对应的共享会话（惰性启动）。"""
+    key = (container, dbname, shell_binary)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = MongoShellSession(container, dbname, shell_binary)
+            _sessions[key] = session
+        return session
+
+
+def close_mongo_shell_sessions():
+    """关闭全部常驻 shell 进程。"""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+atexit.register(close_mongo_shell_sessions)
+
+
+__all__ = [
+    "MongoShellSession",
+    "MongoShellTimeout",
+    "MongoShellStartError",
+    "get_mongo_shell_session",
+    "close_mongo_shell_sessions",
+]
@@ -0,0 +1,169 @@
+"""
+SQLite / DuckDB 进程内执行后端：绕过 SQLAlchemy，直接使用 sqlite3 / duckdb 原生 API
+
+作用概述：
+- sqlancer sqlite→X 转换时每条语句都走 SQLAlchemy 的连接检出/text()/Row 封装，单条开销占主导。
+- NativeFileDatabasePool 与 DatabaseConnectionPool 接口一致（execSQL / execBatch / check_connection / close），
+  execSQL 保持 (结果, 耗时, 错误) 三元组约定，结果为元组列表。
+- 每个库（含 worker 命名空间后缀）只持有一个长连接，自动提交；同一连接内执行串行化。
+- QTRAN_FILE_DB_BACKEND=sqlalchemy 可切回原 SQLAlchemy 实现；
+  QTRAN_FILE_DB_MODE=memory 使用内存库（每个 worker 的库名不同，天然互相隔离）。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import duckdb
+except Exception:  # pragma: no cover
+    duckdb = None  # type: ignore
+
+current_file_path = os.path.abspath(__file__)
+current_dir = os.path.dirname(current_file_path)
+
+NATIVE_FILE_DB_TYPES = {"SQLITE", "DUCKDB"}
+_FILE_SUFFIX = {"SQLITE": ".db", "DUCKDB": ".duckdb"}
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "CREATE")
+
+
+def native_backend_enabled(dbType):
+    """sqlite/duckdb 是否走原生后端（默认开启；duckdb 未安装时退回 SQLAlchemy）。"""
+    db = str(dbType).upper()
+    if db not in NATIVE_FILE_DB_TYPES:
+        return False
+    if os.environ.get("QTRAN_FILE_DB_BACKEND", "native").lower() != "native":
+        return False
+    return db != "DUCKDB" or duckdb is not None
+
+
+def in_memory_mode():
+    return os.environ.get("QTRAN_FILE_DB_MODE", "file").lower() == "memory"
+
+
+class NativeFileDatabasePool:
+    """sqlite3 / duckdb 原生连接，接口与 DatabaseConnectionPool 保持一致。"""
+
+    def __init__(self, dbType, host, port, username, password, dbname, **kwargs):
+        self.dbType = dbType.upper()
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.dbname = dbname
+        self.engine = None  # 无 SQLAlchemy engine
+        self.in_memory = in_memory_mode()
+        self._lock = threading.Lock()
+        self._conn = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    @property
+    def db_path(self):
+        if self.in_memory:
+            return ":memory:"
+        return os.path.join(current_dir, self.dbname) + _FILE_SUFFIX[self.dbType]
+
+    def _connection(self):
+        if self._conn is None:
+            if self.dbType == "SQLITE":
+                # isolation_level=None：自动提交，语句中的 BEGIN/COMMIT 由用户 SQL 自行控制
+                self._conn = sqlite3.connect(
+                    self.db_path, isolation_level=None, check_same_thread=False
+                )
+            else:
+                self._conn = duckdb.connect(self.db_path)
+        return self._conn
+
+    def check_connection(self):
+        _, _, error = self.execSQL("SELECT 1;")
+        if error:
+            print(f"连接失败: {error}")
+            return False
+        return True
+
+    def close(self):
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"Failed to close database connection: {e}")
+                raise
+
+    def execSQL(self, query):
+        start_time = time.time()
+        result = None
+        try:
+            with self._lock:
+                cursor = self._connection().cursor()
+                try:
+                    cursor.execute(query)
+                    affected_rows = cursor.rowcount
+                    if (
+                        not query.strip().upper().startswith(_WRITE_PREFIXES)
+                        and cursor.description is not None
+                    ):
+                        result = [tuple(row) for row in cursor.fetchall()]
+                finally:
+                    cursor.close()
+            execution_time = time.time() - start_time
+            print("Affected rows:", affected_rows)
+            return result, execution_time, None
+        except Exception as e:
+            print(f"Error executing '{query}':", e)
+            return None, 0, str(e)
+
+    def _begin(self, conn):
+        """开启事务；连接上已有事务时不重复 BEGIN，返回本次是否由自己开启。"""
+        if self.dbType == "SQLITE":
+            if conn.in_transaction:
+                return False
+            conn.execute("BEGIN")
+            return True
+        try:
+            conn.execute("BEGIN")
+        except duckdb.TransactionException:
+            # duckdb 不暴露事务状态，已在事务中时 BEGIN 会报错
+            return False
+        return True
+
+    def execBatch(self, queries, stop_on_error=False, transaction=False):
+        """在同一连接上顺序执行多条语句，返回逐条 (结果, 耗时, 错误) 列表。
+
+        transaction=True 时整批包在 BEGIN/COMMIT 中，任一语句失败即 ROLLBACK 并停止；
+        若连接上已有未结束的事务（用户 SQL 自行 BEGIN），则并入该事务，提交/回滚交给用户 SQL。
+        """
+        outcomes = []
+        if not queries:
+            return outcomes
+        with self._lock:
+            conn = self._connection()
+            owns_transaction = transaction and self._begin(conn)
+            for query in queries:
+                start_time = time.time()
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query)
+                    result = None
+                    if (
+                        not query.strip().upper().startswith(_WRITE_PREFIXES)
+                        and cursor.description is not None
+                    ):
+                        result = [tuple(row) for row in cursor.fetchall()]
+                    outcomes.append((result, time.time() - start_time, None))
+                except Exception as e:
+                    print(f"Error executing '{query}':", e)
+                    outcomes.append((None, 0, str(e)))
+                    if stop_on_error or transaction:
+                        break
+                finally:
+                    cursor.close()
+            if owns_transaction:
+                failed = any(outcome[2] for outcome in outcomes)
+                conn.execute("ROLLBACK" if failed else "COMMIT")
+        errors = sum(1 for outcome in outcomes if outcome[2])
+        print(f"Batch executed: {len(outcomes)} statements, {errors} errors")
+        return outcomes
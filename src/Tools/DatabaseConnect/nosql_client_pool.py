@@ -0,0 +1,283 @@
+"""
+NoSQL 长连接池：Redis / MongoDB / Memcached / Consul(HTTP) 客户端的进程级复用
+
+作用概述：
+- 按目标地址缓存客户端，避免每条命令都重新建立 TCP 连接。
+- redis.Redis 与 MongoClient 自带线程安全的连接池，这里只负责按键复用实例。
+- Memcached 使用简单的 socket 池：命令完整读到结束标记才归还，异常/超时的 socket 直接丢弃。
+- Consul 使用 requests.Session（底层 urllib3 连接池）复用 HTTP keep-alive 连接。
+- etcd 走 v3 JSON gateway（/v3/kv/*），同样复用 HTTP 会话，替代逐条 docker exec etcdctl。
+- 进程退出时自动关闭全部客户端，也可显式调用 close_nosql_clients()。
+"""
+
+import atexit
+import base64
+import hashlib
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+
+try:
+    import redis  # redis-py client
+except Exception:  # pragma: no cover
+    redis = None  # type: ignore
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:  # pragma: no cover
+    requests = None  # type: ignore
+    HTTPAdapter = None  # type: ignore
+
+MEMCACHED_POOL_SIZE = 8
+HTTP_POOL_SIZE = 16
+
+_lock = threading.Lock()
+_redis_clients = {}
+_mongo_clients = {}
+_memcached_pools = {}
+_http_sessions = {}
+
+
+def get_redis_client(
+    host, port, username=None, password=None, db=0, socket_timeout=None
+):
+    """返回 (host, port, username, password, db, socket_timeout) 对应的共享 redis.Redis 客户端。
+
+    socket_timeout 默认不限（与原短连接行为一致）；探活等场景可传入较短超时，单独成池。
+    键中只保存密码摘要：同一地址换密码会得到新客户端，而不是复用旧凭据的连接。
+    """
+    if redis is None:
+        raise ImportError("redis library not installed")
+    password_digest = (
+        hashlib.sha256(password.encode("utf-8")).hexdigest() if password else None
+    )
+    key = (host, int(port), username or None, password_digest, int(db), socket_timeout)
+    with _lock:
+        client = _redis_clients.get(key)
+        if client is None:
+            client = redis.Redis(
+                host=host,
+                port=int(port),
+                username=username or None,
+                password=password or None,
+                db=int(db),
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=3,
+                health_check_interval=30,
+                decode_responses=False,
+            )
+            _redis_clients[key] = client
+        return client
+
+
+def get_mongo_client(uri, server_selection_timeout_ms=3000):
+    """返回 uri 对应的共享 MongoClient（MongoClient 自身线程安全且带连接池）。"""
+    from pymongo import MongoClient  # 延迟导入，避免未安装时崩溃
+
+    with _lock:
+        client = _mongo_clients.get(uri)
+        if client is None:
+            client = MongoClient(
+                uri, serverSelectionTimeoutMS=server_selection_timeout_ms
+            )
+            _mongo_clients[uri] = client
+        return client
+
+
+def build_mongo_uri(conn_args, auth_db=""):
+    """按连接参数拼接 MongoDB URI（支持无认证与用户密码）。"""
+    host = conn_args.get("host", "127.0.0.1")
+    port = int(conn_args.get("port", 27017))
+    username = conn_args.get("username") or None
+    password = conn_args.get("password") or None
+    if username and password:
+        return f"mongodb://{username}:{password}@{host}:{port}/{auth_db}"
+    return f"mongodb://{host}:{port}/"
+
+
+class MemcachedSocketPool:
+    """Memcached 文本协议 socket 池。
+
+    checkout() 以上下文管理器形式借出 socket；调用方读完整个响应后调用
+    release_ok() 标记可复用，否则退出时关闭该 socket（防止残留数据串到下一条命令）。
+    """
+
+    def __init__(self, host, port, timeout=3, max_idle=MEMCACHED_POOL_SIZE):
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.settimeout(self.timeout)
+        return sock
+
+    @contextmanager
+    def checkout(self):
+        try:
+            sock = self._idle.get_nowait()
+        except queue.Empty:
+            sock = self._connect()
+        lease = _SocketLease(sock)
+        try:
+            yield lease
+        finally:
+            if lease.reusable:
+                try:
+                    self._idle.put_nowait(sock)
+                except queue.Full:
+                    sock.close()
+            else:
+                sock.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            except Exception:
+                pass
+
+
+class _SocketLease:
+    def __init__(self, sock):
+        self.sock = sock
+        self.reusable = False
+
+    def release_ok(self):
+        self.reusable = True
+
+
+def get_memcached_pool(host, port, timeout=3):
+    """返回 (host, port) 对应的共享 Memcached socket 池。"""
+    key = (host, int(port))
+    with _lock:
+        pool = _memcached_pools.get(key)
+        if pool is None:
+            pool = MemcachedSocketPool(host, port, timeout=timeout)
+            _memcached_pools[key] = pool
+        return pool
+
+
+def get_http_session(host, port):
+    """返回 (host, port) 对应的共享 requests.Session（用于 Consul HTTP API）。"""
+    if requests is None:
+        raise ImportError("requests not installed")
+    key = (host, int(port))
+    with _lock:
+        session = _http_sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=HTTP_POOL_SIZE
+            )
+            session.mount("http://", adapter)
+            _http_sessions[key] = session
+        return session
+
+
+def _b64(text):
+    return base64.b64encode(text.encode()).decode()
+
+
+def _prefix_range_end(prefix):
+    """etcd 前缀查询的 range_end：最后一个不为 0xff 的字节加一（与 etcdctl --prefix 相同）。"""
+    raw = bytearray(prefix.encode())
+    for i in range(len(raw) - 1, -1, -1):
+        if raw[i] < 0xFF:
+            raw[i] += 1
+            return base64.b64encode(bytes(raw[: i + 1])).decode()
+    return _b64("\0")
+
+
+class EtcdGatewayClient:
+    """etcd v3 JSON gateway 客户端（基于共享 requests.Session）。
+
+    返回值与 `etcdctl -w json` 输出结构一致（header/kvs/deleted，key/value 为 base64），
+    gateway 以字符串形式返回的 int64 字段由调用方按需转换。
+    """
+
+    def __init__(self, host, port, timeout=8):
+        self.base_url = f"http://{host}:{int(port)}/v3"
+        self.timeout = timeout
+        self.session = get_http_session(host, port)
+
+    def _post(self, path, payload, timeout=None):
+        resp = self.session.post(
+            f"{self.base_url}/{path}", json=payload, timeout=timeout or self.timeout
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def put(self, key, value):
+        return self._post("kv/put", {"key": _b64(key), "value": _b64(value)})
+
+    def get(self, key, prefix=False, timeout=None):
+        payload = {"key": _b64(key)}
+        if prefix:
+            payload["range_end"] = _prefix_range_end(key)
+        return self._post("kv/range", payload, timeout=timeout)
+
+    def delete(self, key, from_key=False):
+        payload = {"key": _b64(key)}
+        if from_key:
+            # range_end = "\0" 表示 [key, +inf)，与 etcdctl del --from-key 相同
+            payload["range_end"] = _b64("\0")
+        return self._post("kv/deleterange", payload)
+
+    def status(self, timeout=None):
+        return self._post("maintenance/status", {}, timeout=timeout)
+
+
+def get_etcd_client(host, port):
+    """返回 (host, port) 对应的 etcd gateway 客户端（底层共享 HTTP 会话）。"""
+    return EtcdGatewayClient(host, port)
+
+
+def close_nosql_clients():
+    """关闭全部缓存的 NoSQL 客户端。"""
+    with _lock:
+        redis_clients = list(_redis_clients.values())
+        mongo_clients = list(_mongo_clients.values())
+        memcached_pools = list(_memcached_pools.values())
+        http_sessions = list(_http_sessions.values())
+        _redis_clients.clear()
+        _mongo_clients.clear()
+        _memcached_pools.clear()
+        _http_sessions.clear()
+    for client in redis_clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+    for client in mongo_clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+    for pool in memcached_pools:
+        pool.close()
+    for session in http_sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+atexit.register(close_nosql_clients)
+
+
+__all__ = [
+    "get_redis_client",
+    "get_mongo_client",
+    "build_mongo_uri",
+    "get_memcached_pool",
+    "get_http_session",
+    "get_etcd_client",
+    "EtcdGatewayClient",
+    "close_nosql_clients",
+]
@@ -18,6 +18,10 @@ from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 import os
 
 from src.Tools.DatabaseConnect.database_connector import get_database_connector_args
+from src.Tools.DatabaseConnect.nosql_client_pool import (
+    get_mongo_client,
+    get_redis_client,
+)
 
 try:
     from pymongo import MongoClient
@@ -89,7 +93,7 @@ def exec_mongodb_statement(tool: str, exp: str, statement: Dict[str, Any]) -> Tu
             auth = f"{username}:{password}@"
             mongo_uri = f"mongodb://{auth}{host}:{port}"
 
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        client = get_mongo_client(mongo_uri, server_selection_timeout_ms=5000)
         db_name = statement.get("database") or f"{tool}_{exp}_mongodb".lower()
         db = client[db_name]
         col = db[statement.get("collection", "t")]
@@ -172,7 +176,7 @@ def exec_redis_statement(tool: str, exp: str, statement: Union[List[Any], Dict[s
 
     start = time.time()
     try:
-        client = redis_pkg.Redis(host=host, port=port, username=username or None, password=password or None, decode_responses=False)
+        client = get_redis_client(host, port, username, password)
 
         if isinstance(statement, dict):
             cmd = statement.get("cmd")
@@ -0,0 +1,41 @@
+"""
+派生缓存文件的统一存放位置：Output/cache（已加入 .gitignore）
+
+作用概述：
+- 知识库的行偏移索引、嵌入矩阵、Chroma 集合、容器引导记录等都是可再生的派生数据，
+  不应写进被 git 跟踪的 FeatureKnowledgeBase / RAG_Feature_Mapping / 源码目录。
+- source_cache_path 按源文件绝对路径的哈希区分同名文件（不同 db 目录下的 merge_function.jsonl 等），
+  内容版本由各调用方自己的元数据（大小/mtime、内容哈希）校验。
+
+环境变量：
+- QTRAN_CACHE_DIR: 覆盖缓存根目录
+"""
+
+import hashlib
+import os
+
+current_file_path = os.path.abspath(__file__)
+current_dir = os.path.dirname(current_file_path)
+
+DEFAULT_CACHE_DIR = os.path.join(current_dir, "..", "..", "Output", "cache")
+
+
+def cache_root():
+    return os.path.abspath(os.environ.get("QTRAN_CACHE_DIR") or DEFAULT_CACHE_DIR)
+
+
+def cache_path(*parts):
+    """缓存根目录下的路径（自动创建父目录）。"""
+    path = os.path.join(cache_root(), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def source_cache_path(source_path, suffix, subdir):
+    """
+    源文件对应的派生缓存路径：<cache>/<subdir>/<文件名>.<路径哈希><suffix>
+    :param suffix: 如 ".offsets"、".npy"；为空时返回的路径可作为目录使用
+    """
+    source_path = os.path.abspath(source_path)
+    digest = hashlib.sha1(source_path.encode("utf-8")).hexdigest()[:12]
+    return cache_path(subdir, f"{os.path.basename(source_path)}.{digest}{suffix}")
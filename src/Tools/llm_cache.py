@@ -0,0 +1,280 @@
+"""
+LLM 响应缓存：按 (模型, 温度, 完整消息列表) 内容寻址的持久化缓存
+
+作用概述：
+- 转换（ConversationChain.predict）、RAG 映射等 LangChain 调用通过 set_llm_cache 接入；
+  变异阶段的 OpenAI SDK 调用通过 cached_chat_completion 接入。
+- 键为请求内容的 sha256（LangChain 的 llm_string 已包含模型名与温度），值为序列化响应与 token 用量。
+- 同一请求在一次运行内第 N 次出现对应第 N 条缓存（重试仍会拿到新的响应），
+  崩溃后重跑时按相同顺序回放。
+- SQLite 存储，按最近访问时间做 LRU 淘汰，条目数上限可配。
+
+环境变量：
+- QTRAN_LLM_CACHE: readwrite(默认) | readonly(只读，未命中照常调用但不写入) | replay(只读，未命中直接报错) | off
+- QTRAN_LLM_CACHE_PATH: 缓存文件路径（默认 Output/llm_cache.sqlite）
+- QTRAN_LLM_CACHE_MAX_ENTRIES: LRU 上限（默认 50000）
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+current_file_path = os.path.abspath(__file__)
+current_dir = os.path.dirname(current_file_path)
+
+DEFAULT_CACHE_PATH = os.path.join(current_dir, "..", "..", "Output", "llm_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 50000
+_EVICT_EVERY = 100  # 每写入 N 条检查一次上限
+
+CACHE_MODES = ("readwrite", "readonly", "replay", "off")
+
+
+class LLMCacheMiss(RuntimeError):
+    """replay 模式下请求未命中缓存。"""
+
+
+def cache_mode():
+    mode = os.environ.get("QTRAN_LLM_CACHE", "readwrite").lower()
+    return mode if mode in CACHE_MODES else "readwrite"
+
+
+def fingerprint(payload):
+    """对请求内容做稳定哈希（键排序的 JSON）。"""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseStore:
+    """SQLite 持久化的内容寻址响应表（线程安全，LRU 淘汰）。"""
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = os.path.abspath(
+            path or os.environ.get("QTRAN_LLM_CACHE_PATH") or DEFAULT_CACHE_PATH
+        )
+        self.max_entries = int(
+            max_entries
+            or os.environ.get("QTRAN_LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT,
+                model TEXT,
+                response TEXT NOT NULL,
+                usage TEXT,
+                created_at REAL,
+                last_access REAL,
+                hits INTEGER DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)"
+        )
+        self._occurrences = Counter()  # 本次运行内每个指纹已消费的次数
+        self._writes_since_evict = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "saved_tokens": 0,
+        }
+
+    def _key(self, fp, occurrence):
+        return fp if occurrence == 0 else f"{fp}:{occurrence}"
+
+    def get(self, fp):
+        """查找当前出现序号对应的缓存，命中时返回 (response, usage) 并推进序号。"""
+        with self._lock:
+            key = self._key(fp, self._occurrences[fp])
+            row = self._conn.execute(
+                "SELECT response, usage FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._occurrences[fp] += 1
+            if cache_mode() == "readwrite":
+                self._conn.execute(
+                    "UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (time.time(), key),
+                )
+            usage = json.loads(row[1]) if row[1] else {}
+            self.stats["hits"] += 1
+            self.stats["saved_tokens"] += int(usage.get("total_tokens") or 0)
+            return row[0], usage
+
+    def put(self, fp, response, kind="", model="", usage=None):
+        """写入当前出现序号对应的缓存（仅 readwrite 模式）。"""
+        with self._lock:
+            key = self._key(fp, self._occurrences[fp])
+            self._occurrences[fp] += 1
+            if cache_mode() != "readwrite":
+                return
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache"
+                "(key, kind, model, response, usage, created_at, last_access, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (
+                    key,
+                    kind,
+                    model,
+                    response,
+                    json.dumps(usage or {}),
+                    now,
+                    now,
+                ),
+            )
+            self.stats["writes"] += 1
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= _EVICT_EVERY:
+                self._writes_since_evict = 0
+                self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+            self.stats["evictions"] += excess
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._occurrences.clear()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_llm_response_store():
+    """返回进程级共享的响应缓存；QTRAN_LLM_CACHE=off 时返回 None。"""
+    global _store
+    if cache_mode() == "off":
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = LLMResponseStore()
+        return _store
+
+
+def get_llm_cache_stats():
+    store = _store
+    return dict(store.stats) if store is not None else {}
+
+
+# ---------------- OpenAI SDK 调用 ---------------- #
+def _create_completion(client, **kwargs):
+    # 网关开启时经与该客户端 api_key/base_url 相同的 LLMGateway 限流/退避，否则直接走 SDK 客户端
+    from src.Tools.llm_gateway import gateway_enabled, get_client_gateway
+
+    if gateway_enabled():
+        return get_client_gateway(client).chat_completion(**kwargs)
+    return client.chat.completions.create(**kwargs)
+
+
+def cached_chat_completion(client, **kwargs):
+    """带缓存的 client.chat.completions.create，参数与返回值与原调用一致。"""
+    store = get_llm_response_store()
+    if store is None:
+        return _create_completion(client, **kwargs)
+    fp = fingerprint({"kind": "openai.chat.completions", **kwargs})
+    cached = store.get(fp)
+    if cached is not None:
+        from openai.types.chat import ChatCompletion
+
+        return ChatCompletion.model_validate_json(cached[0])
+    if cache_mode() == "replay":
+        raise LLMCacheMiss(f"replay 模式未命中缓存: model={kwargs.get('model')}")
+    completion = _create_completion(client, **kwargs)
+    usage = completion.usage.model_dump() if completion.usage else {}
+    store.put(
+        fp,
+        completion.model_dump_json(),
+        kind="openai.chat.completions",
+        model=str(kwargs.get("model", "")),
+        usage=usage,
+    )
+    return completion
+
+
+# ---------------- LangChain 全局缓存 ---------------- #
+try:
+    from langchain_core.caches import BaseCache
+    from langchain_core.load import dumps, loads
+except Exception:  # pragma: no cover
+    BaseCache = object  # type: ignore
+
+
+class QtranLangChainCache(BaseCache):
+    """LangChain BaseCache 适配：prompt 为完整消息列表的序列化，llm_string 含模型与温度。"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def lookup(self, prompt, llm_string):
+        fp = fingerprint({"kind": "langchain", "prompt": prompt, "llm": llm_string})
+        cached = self.store.get(fp)
+        if cached is not None:
+            return [loads(item) for item in json.loads(cached[0])]
+        if cache_mode() == "replay":
+            raise LLMCacheMiss("replay 模式未命中缓存 (langchain)")
+        return None
+
+    def update(self, prompt, llm_string, return_val):
+        fp = fingerprint({"kind": "langchain", "prompt": prompt, "llm": llm_string})
+        usage = {}
+        message = getattr(return_val[0], "message", None) if return_val else None
+        if message is not None and getattr(message, "usage_metadata", None):
+            usage = dict(message.usage_metadata)
+        self.store.put(
+            fp,
+            json.dumps([dumps(gen) for gen in return_val]),
+            kind="langchain",
+            usage=usage,
+        )
+
+    def clear(self, **kwargs):
+        self.store.clear()
+
+
+_langchain_installed = False
+
+
+def install_llm_cache():
+    """把缓存注册为 LangChain 全局 LLM 缓存（幂等；QTRAN_LLM_CACHE=off 时不生效）。"""
+    global _langchain_installed
+    if _langchain_installed:
+        return
+    store = get_llm_response_store()
+    if store is None:
+        return
+    try:
+        from langchain_core.globals import set_llm_cache
+
+        set_llm_cache(QtranLangChainCache(store))
+        _langchain_installed = True
+    except Exception as e:
+        print(f"⚠️ LLM 缓存注册失败: {e}")
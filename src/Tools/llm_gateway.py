@@ -0,0 +1,437 @@
+"""
+LLM 异步网关：统一的并发上限、TPM 预算与 429/Retry-After 退避
+
+作用概述：
+- 后台线程常驻一个 asyncio 事件循环，持有 AsyncOpenAI 客户端；同步调用方（各 worker 线程）
+  通过 chat_completion() 提交请求，异步调用方直接 await achat_completion()。
+- 同时在途的请求数由信号量限制；按分钟 token 预算（令牌桶）在发出请求前等待额度，
+  返回后按实际 usage 校正。
+- 429 / 5xx / 连接错误按 Retry-After（retry-after-ms / retry-after）等待，无该头时指数退避 + 全抖动。
+- GatewayChatModel 是 LangChain 聊天模型适配，供 ConversationChain / LCEL 链使用，
+  token 用量写入 usage_metadata，get_openai_callback 照常计费。
+
+环境变量：
+- QTRAN_LLM_GATEWAY: on(默认) | off（off 时 get_chat_model 返回原 ChatOpenAI，SDK 调用直连）
+- QTRAN_LLM_MAX_INFLIGHT: 最大在途请求数（默认 8）
+- QTRAN_LLM_TPM: 每分钟 token 预算（默认 0 = 不限）
+- QTRAN_LLM_MAX_RETRIES: 最大重试次数（默认 6）
+- QTRAN_LLM_BASE_URL: 覆盖所有请求的 API 地址（如本地桩服务 tools/llm_stub_server.py）
+
+网关按 (api_key, base_url) 区分：SDK 调用使用传入客户端自身的配置，不会被改投到其他端点。
+"""
+
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+DEFAULT_MAX_INFLIGHT = 8
+DEFAULT_MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+_DEFAULT_COMPLETION_ESTIMATE = 512
+
+
+def gateway_enabled():
+    if os.environ.get("QTRAN_LLM_GATEWAY", "on").lower() in ("0", "off", "false", "no"):
+        return False
+    try:
+        from openai import AsyncOpenAI  # noqa
+    except Exception:
+        return False
+    return True
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """粗略估计一次请求消耗的 token（约 4 字符/词元 + 预计输出）。"""
+    chars = 0
+    for message in messages or []:
+        content = message.get("content") if isinstance(message, dict) else message
+        chars += len(str(content or ""))
+    return chars // 4 + (max_tokens or _DEFAULT_COMPLETION_ESTIMATE)
+
+
+def parse_retry_after(headers):
+    """从响应头解析等待秒数：retry-after-ms 优先，其次 retry-after（秒或 HTTP 日期）。"""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, when.timestamp() - time.time())
+        except Exception:
+            return None
+
+
+class TokenBudget:
+    """按分钟补充的 token 令牌桶（仅在网关事件循环内使用）。"""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = float(tokens_per_minute)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self.updated) * self.capacity / 60.0
+        )
+        self.updated = now
+
+    async def acquire(self, tokens):
+        if self.capacity <= 0:
+            return
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep(
+                    (tokens - self.available) * 60.0 / self.capacity
+                )
+
+    def settle(self, estimated, actual):
+        """用实际用量校正预扣额度（可为负，后续请求会相应等待）。"""
+        if self.capacity <= 0 or actual is None:
+            return
+        self.available = min(self.capacity, self.available + estimated - actual)
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        max_in_flight=None,
+        tokens_per_minute=None,
+        max_retries=None,
+        base_url=None,
+        api_key=None,
+    ):
+        self.max_in_flight = int(
+            max_in_flight
+            or os.environ.get("QTRAN_LLM_MAX_INFLIGHT", DEFAULT_MAX_INFLIGHT)
+        )
+        self.tokens_per_minute = int(
+            tokens_per_minute or os.environ.get("QTRAN_LLM_TPM", 0)
+        )
+        self.max_retries = int(
+            max_retries
+            if max_retries is not None
+            else os.environ.get("QTRAN_LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+        )
+        self.api_key, self.base_url = _gateway_config(api_key, base_url)
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+            "total_tokens": 0,
+        }
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._client = None
+        self._semaphore = None
+        self._budget = None
+
+    # ---------- 事件循环 ---------- #
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="qtran-llm-gateway",
+                    daemon=True,
+                )
+                self._thread.start()
+        return self._loop
+
+    def _ensure_primitives(self):
+        # 必须在网关事件循环内创建
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            # 重试由网关自己负责，关闭 SDK 内置重试
+            self._client = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._budget = TokenBudget(self.tokens_per_minute)
+
+    # ---------- 请求 ---------- #
+    def _retry_delay(self, attempt, error):
+        response = getattr(error, "response", None)
+        retry_after = parse_retry_after(
+            getattr(response, "headers", None) if response is not None else None
+        )
+        if retry_after is not None:
+            # 服务端给出的等待时间再加少量抖动，避免多个请求同时醒来
+            return retry_after + random.uniform(0, 0.25 * max(retry_after, 1.0))
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2**attempt)))
+
+    @staticmethod
+    def _retryable(error):
+        import openai
+
+        if isinstance(
+            error,
+            (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError),
+        ):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    async def achat_completion(self, **kwargs):
+        """异步发起 chat.completions.create，参数与返回值同 OpenAI SDK。"""
+        import openai
+
+        self._ensure_primitives()
+        estimated = estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+        attempt = 0
+        while True:
+            await self._budget.acquire(estimated)
+            async with self._semaphore:
+                self.stats["in_flight"] += 1
+                self.stats["peak_in_flight"] = max(
+                    self.stats["peak_in_flight"], self.stats["in_flight"]
+                )
+                self.stats["requests"] += 1
+                try:
+                    completion = await self._client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    error = e
+                else:
+                    error = None
+                finally:
+                    self.stats["in_flight"] -= 1
+            if error is None:
+                actual = getattr(completion.usage, "total_tokens", None)
+                self._budget.settle(estimated, actual)
+                self.stats["total_tokens"] += actual or 0
+                return completion
+            # 失败的请求不计入预算
+            self._budget.settle(estimated, 0)
+            if not self._retryable(error) or attempt >= self.max_retries:
+                self.stats["failures"] += 1
+                raise error
+            if isinstance(error, openai.RateLimitError) or (
+                getattr(error, "status_code", None) == 429
+            ):
+                self.stats["rate_limited"] += 1
+            delay = self._retry_delay(attempt, error)
+            self.stats["retries"] += 1
+            print(
+                f"⏳ LLM 请求失败({type(error).__name__})，{delay:.1f}s 后重试 "
+                f"({attempt + 1}/{self.max_retries})"
+            )
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def chat_completion(self, **kwargs):
+        """同步接口：把请求提交到网关事件循环并等待结果（可在多个线程中并发调用）。"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self.achat_completion(**kwargs), loop
+        )
+        return future.result()
+
+    def close(self):
+        loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), loop).result(5)
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_gateways = {}
+_gateway_lock = threading.Lock()
+_OPENAI_DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+def _gateway_config(api_key=None, base_url=None):
+    """规范化 (api_key, base_url)：未指定时与 OpenAI SDK 的默认取值一致，QTRAN_LLM_BASE_URL 覆盖所有地址。"""
+    api_key = api_key or os.environ.get("OPENAI_API_KEY", "")
+    base_url = (
+        os.environ.get("QTRAN_LLM_BASE_URL")
+        or (str(base_url) if base_url else None)
+        or os.environ.get("OPENAI_BASE_URL")
+        or _OPENAI_DEFAULT_BASE_URL
+    )
+    return api_key, base_url.rstrip("/")
+
+
+def get_llm_gateway(api_key=None, base_url=None):
+    """
+    返回进程级共享的 LLM 网关：每组 (api_key, base_url) 一个实例，
+    使用同一配置的所有 worker 共用同一组并发/TPM 限制。
+    """
+    config = _gateway_config(api_key, base_url)
+    with _gateway_lock:
+        gateway = _gateways.get(config)
+        if gateway is None:
+            gateway = LLMGateway(api_key=config[0], base_url=config[1])
+            _gateways[config] = gateway
+        return gateway
+
+
+def get_client_gateway(client):
+    """按 OpenAI SDK 客户端的 api_key / base_url 取对应的网关。"""
+    return get_llm_gateway(
+        api_key=getattr(client, "api_key", None),
+        base_url=getattr(client, "base_url", None),
+    )
+
+
+# ---------------- LangChain 适配 ---------------- #
+try:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    _LANGCHAIN_AVAILABLE = True
+except Exception:  # pragma: no cover
+    BaseChatModel = object  # type: ignore
+    _LANGCHAIN_AVAILABLE = False
+
+_ROLE_BY_TYPE = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def _to_openai_messages(messages):
+    converted = []
+    for message in messages:
+        if message.type == "function":
+            converted.append(
+                {"role": "function", "name": message.name, "content": message.content}
+            )
+            continue
+        if message.type == "tool":
+            converted.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": message.tool_call_id,
+                    "content": message.content,
+                }
+            )
+            continue
+        entry = {
+            "role": _ROLE_BY_TYPE.get(message.type, "user"),
+            "content": message.content,
+        }
+        # Agent（create_openai_functions_agent）回传的函数调用
+        for key in ("function_call", "tool_calls"):
+            if message.additional_kwargs.get(key):
+                entry[key] = message.additional_kwargs[key]
+                entry["content"] = message.content or None
+        converted.append(entry)
+    return converted
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    经 LLMGateway 发请求的 LangChain 聊天模型（ConversationChain / LCEL 链可直接替换 ChatOpenAI）。
+    bind(functions=...) 的参数原样透传，函数调用结果放在 additional_kwargs，可用于 OpenAI functions agent。
+    """
+
+    model_name: str = "gpt-4o-mini"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+
+    @property
+    def _llm_type(self):
+        return "qtran-gateway-openai"
+
+    @property
+    def _identifying_params(self):
+        return {
+            "model_name": self.model_name,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+
+    def _request(self, messages, stop):
+        request = {
+            "model": self.model_name,
+            "messages": _to_openai_messages(messages),
+            "temperature": self.temperature,
+        }
+        if stop:
+            request["stop"] = stop
+        if self.max_tokens:
+            request["max_tokens"] = self.max_tokens
+        return request
+
+    def _to_result(self, completion):
+        usage = completion.usage
+        usage_metadata = None
+        token_usage = {}
+        if usage is not None:
+            token_usage = usage.model_dump()
+            usage_metadata = {
+                "input_tokens": usage.prompt_tokens,
+                "output_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+            }
+        choice = completion.choices[0].message
+        additional_kwargs = {}
+        if getattr(choice, "function_call", None):
+            additional_kwargs["function_call"] = choice.function_call.model_dump()
+        if getattr(choice, "tool_calls", None):
+            additional_kwargs["tool_calls"] = [
+                tool_call.model_dump() for tool_call in choice.tool_calls
+            ]
+        message = AIMessage(
+            content=choice.content or "",
+            additional_kwargs=additional_kwargs,
+            usage_metadata=usage_metadata,
+            response_metadata={"model_name": completion.model},
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": token_usage, "model_name": completion.model},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        completion = get_llm_gateway().chat_completion(
+            **self._request(messages, stop), **kwargs
+        )
+        return self._to_result(completion)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        gateway = get_llm_gateway()
+        loop = gateway._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            gateway.achat_completion(**self._request(messages, stop), **kwargs), loop
+        )
+        completion = await asyncio.wrap_future(future)
+        return self._to_result(completion)
+
+
+def get_chat_model(temperature=0.0, model="gpt-4o-mini"):
+    """返回 LangChain 聊天模型：网关开启时为 GatewayChatModel，否则为原 ChatOpenAI。"""
+    if gateway_enabled() and _LANGCHAIN_AVAILABLE:
+        return GatewayChatModel(model_name=model, temperature=temperature)
+    from langchain.chat_models import ChatOpenAI
+
+    return ChatOpenAI(temperature=temperature, model=model)
@@ -0,0 +1,191 @@
+"""
+本地向量化：sentence-transformers（CPU）+ 持久化向量缓存，供 Mem0 与 RAG 共用
+
+作用概述：
+- LocalEmbedder 惰性加载 SentenceTransformer，未命中缓存的文本按批编码。
+- 向量按 sha256(模型名 + 文本) 存入 SQLite（float32 二进制），跨进程、跨运行复用。
+- 同时提供 Mem0 embedder 接口（embed）和 LangChain Embeddings 接口（embed_documents / embed_query），
+  RAG 映射的 Chroma 可直接使用。
+- QTRAN_MEM0_EMBEDDER=local 时 Mem0 改用本地模型（不再调用 OpenAI embedding），
+  向量维度随模型变化，集合名加 "_local" 后缀以免与 1536 维的 OpenAI 集合冲突。
+
+环境变量：
+- QTRAN_MEM0_EMBEDDER: openai(默认) | local
+- QTRAN_EMBED_MODEL: 本地模型名（默认 all-MiniLM-L6-v2，与 RAG 映射一致）
+- QTRAN_EMBED_BATCH_SIZE: 编码批大小（默认 64）
+- QTRAN_EMBED_CACHE_PATH: 向量缓存文件（默认 Output/embedding_cache.sqlite）
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+current_file_path = os.path.abspath(__file__)
+current_dir = os.path.dirname(current_file_path)
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_CACHE_PATH = os.path.join(
+    current_dir, "..", "..", "Output", "embedding_cache.sqlite"
+)
+_SQLITE_VARS = 500  # 单条 IN 查询的参数上限
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:  # pragma: no cover
+    Embeddings = object  # type: ignore
+
+
+def local_mem0_embedder_enabled():
+    return os.environ.get("QTRAN_MEM0_EMBEDDER", "openai").lower() == "local"
+
+
+class LocalEmbedder(Embeddings):
+    """本地 sentence-transformers 编码器，带 SQLite 持久化向量缓存（线程安全）。"""
+
+    def __init__(self, model_name=None, cache_path=None, batch_size=None, device="cpu"):
+        self.model_name = model_name or os.environ.get("QTRAN_EMBED_MODEL", DEFAULT_MODEL)
+        self.batch_size = int(
+            batch_size or os.environ.get("QTRAN_EMBED_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        )
+        self.device = device
+        self.cache_path = os.path.abspath(
+            cache_path or os.environ.get("QTRAN_EMBED_CACHE_PATH") or DEFAULT_CACHE_PATH
+        )
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.cache_path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self.stats = {"cache_hits": 0, "encoded": 0, "batches": 0}
+
+    # ---------- 模型 ---------- #
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    # ---------- 缓存 ---------- #
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self, keys):
+        import numpy as np
+
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_VARS):
+                chunk = keys[i : i + _SQLITE_VARS]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _save(self, items):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(key, vector) VALUES (?, ?)", items
+            )
+            self._conn.execute("COMMIT")
+
+    # ---------- 编码 ---------- #
+    def embed_many(self, texts):
+        """批量编码：先查缓存，未命中的文本去重后按 batch_size 编码并回写缓存。"""
+        import numpy as np
+
+        texts = ["" if text is None else str(text) for text in texts]
+        keys = [self._key(text) for text in texts]
+        vectors = self._load(list(set(keys)))
+        self.stats["cache_hits"] += sum(1 for key in keys if key in vectors)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            pending_keys = list(missing)
+            for i in range(0, len(pending_keys), self.batch_size):
+                chunk = pending_keys[i : i + self.batch_size]
+                encoded = self.model.encode(
+                    [missing[key] for key in chunk],
+                    batch_size=self.batch_size,
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                ).astype(np.float32)
+                self._save([(key, vec.tobytes()) for key, vec in zip(chunk, encoded)])
+                for key, vec in zip(chunk, encoded):
+                    vectors[key] = vec.tolist()
+                self.stats["batches"] += 1
+            self.stats["encoded"] += len(pending_keys)
+        return [vectors[key] for key in keys]
+
+    # Mem0 embedder 接口
+    def embed(self, text, *args, **kwargs):
+        return self.embed_many([text])[0]
+
+    # LangChain Embeddings 接口
+    def embed_documents(self, texts):
+        return self.embed_many(texts)
+
+    def embed_query(self, text):
+        return self.embed_many([text])[0]
+
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def get_local_embedder(model_name=None):
+    """按模型名返回进程内共享的 LocalEmbedder。"""
+    model_name = model_name or os.environ.get("QTRAN_EMBED_MODEL", DEFAULT_MODEL)
+    with _embedders_lock:
+        embedder = _embedders.get(model_name)
+        if embedder is None:
+            embedder = LocalEmbedder(model_name)
+            _embedders[model_name] = embedder
+        return embedder
+
+
+# ---------------- Mem0 接入 ---------------- #
+def configure_mem0_embedder(config):
+    """QTRAN_MEM0_EMBEDDER=local 时改写 Mem0 配置：huggingface 本地模型、维度与集合名。"""
+    if not local_mem0_embedder_enabled():
+        return config
+    embedder = get_local_embedder()
+    dims = embedder.dimension
+    config["embedder"] = {
+        "provider": "huggingface",
+        "config": {"model": embedder.model_name, "embedding_dims": dims},
+    }
+    store_config = config["vector_store"]["config"]
+    if not store_config["collection_name"].endswith("_local"):
+        store_config["collection_name"] += "_local"
+    if config["vector_store"]["provider"] == "qdrant":
+        store_config["embedding_model_dims"] = dims
+    return config
+
+
+def install_mem0_embedder(memory):
+    """把 Mem0 实例的 embedding_model 换成共享的 LocalEmbedder（复用同一模型与向量缓存）。"""
+    if local_mem0_embedder_enabled() and memory is not None:
+        memory.embedding_model = get_local_embedder()
+    return memory
@@ -0,0 +1,133 @@
+"""
+Mem0 检索缓存：memory.search 前的两级本地缓存
+
+作用概述：
+- 每条语句的 prompt 增强都会做 memory.search（一次远程 embedding + 一次 Qdrant 查询），
+  而同一批测试里大量语句只有字面量不同（相同形状的 CREATE TABLE / INSERT）。
+- 第一级：按完整查询串精确匹配的 LRU；
+  第二级：按 sqlglot 去掉字面量后的 SQL 模板匹配（解析失败时退回正则替换）。
+- 条目带 TTL；某个 user_id 写入新记忆后，该 user_id 的已有条目过期时间收紧到 ADD_GRACE 秒内。
+
+环境变量：
+- QTRAN_MEM0_SEARCH_CACHE: on(默认) | off
+- QTRAN_MEM0_SEARCH_CACHE_SIZE: 每级条目上限（默认 1024）
+- QTRAN_MEM0_SEARCH_TTL: 条目存活秒数（默认 600）
+- QTRAN_MEM0_SEARCH_ADD_GRACE: 写入新记忆后旧条目最多再存活的秒数（默认 30）
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import sqlglot
+    from sqlglot import exp
+except Exception:  # pragma: no cover
+    sqlglot = None
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_TTL = 600.0
+DEFAULT_ADD_GRACE = 30.0
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def search_cache_enabled():
+    return os.environ.get("QTRAN_MEM0_SEARCH_CACHE", "on").lower() not in (
+        "0",
+        "off",
+        "false",
+        "no",
+    )
+
+
+def sql_template(sql, dialect=None):
+    """去掉字面量的 SQL 模板（sqlglot 解析，失败时按正则替换字符串/数字字面量）。"""
+    if sqlglot is not None:
+        for read in ((dialect, None) if dialect else (None,)):
+            try:
+                tree = sqlglot.parse_one(sql, read=read)
+            except Exception:
+                continue
+            if tree is None:
+                break
+            tree = tree.transform(
+                lambda node: exp.Placeholder() if isinstance(node, exp.Literal) else node
+            )
+            return tree.sql()
+    return _SPACE_RE.sub(" ", _LITERAL_RE.sub("?", sql)).strip()
+
+
+class SearchResultCache:
+    """两级（精确串 / SQL 模板）LRU + TTL 缓存，线程安全。"""
+
+    def __init__(self, max_size=None, ttl=None, add_grace=None):
+        self.max_size = int(
+            max_size or os.environ.get("QTRAN_MEM0_SEARCH_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+        )
+        self.ttl = float(ttl or os.environ.get("QTRAN_MEM0_SEARCH_TTL", DEFAULT_TTL))
+        self.add_grace = float(
+            add_grace
+            if add_grace is not None
+            else os.environ.get("QTRAN_MEM0_SEARCH_ADD_GRACE", DEFAULT_ADD_GRACE)
+        )
+        self._lock = threading.Lock()
+        # 每级: key -> [expires_at, user_id, value]
+        self._tiers = {"exact": OrderedDict(), "template": OrderedDict()}
+        self.stats = {"exact_hits": 0, "template_hits": 0, "misses": 0}
+
+    def _get(self, tier, key, now):
+        entries = self._tiers[tier]
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry
+
+    def lookup(self, exact_key, template_key=None):
+        """返回 (结果, 命中级别)；未命中返回 (None, None)。"""
+        now = time.time()
+        with self._lock:
+            entry = self._get("exact", exact_key, now)
+            if entry is not None:
+                self.stats["exact_hits"] += 1
+                return entry[2], "exact"
+            if template_key is not None:
+                entry = self._get("template", template_key, now)
+                if entry is not None:
+                    self.stats["template_hits"] += 1
+                    return entry[2], "template"
+            self.stats["misses"] += 1
+            return None, None
+
+    def store(self, user_id, value, exact_key, template_key=None):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for tier, key in (("exact", exact_key), ("template", template_key)):
+                if key is None:
+                    continue
+                entries = self._tiers[tier]
+                entries[key] = [expires_at, user_id, value]
+                entries.move_to_end(key)
+                while len(entries) > self.max_size:
+                    entries.popitem(last=False)
+
+    def on_add(self, user_id):
+        """user_id 写入了新记忆：其已有条目最多再存活 add_grace 秒。"""
+        deadline = time.time() + self.add_grace
+        with self._lock:
+            for entries in self._tiers.values():
+                for entry in entries.values():
+                    if entry[1] == user_id and entry[0] > deadline:
+                        entry[0] = deadline
+
+    def hit_rate(self):
+        total = sum(self.stats.values())
+        hits = self.stats["exact_hits"] + self.stats["template_hits"]
+        return hits / total if total else 0.0
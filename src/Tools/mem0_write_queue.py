@@ -0,0 +1,261 @@
+"""
+Mem0 后台写队列（write-behind）：记录操作不再阻塞翻译/变异主流程
+
+作用概述：
+- memory.add 每次都会触发一次 LLM 抽取和一次向量化，原先同步调用直接卡在下一轮 LLM 之前。
+- Mem0WriteQueue 把写入放进有界内存队列，由后台线程按批取出写入；
+  同一批内完全相同的 (user_id, 内容) 只写一次。
+- 队列满时写入溢出文件（JSONL，逐条落盘）；溢出文件也写不进去才计为丢弃。
+- 进程退出时在限定时间内刷完队列，剩余条目落盘；下次启动时先回放溢出文件。
+- add_write_listener 注册的回调在每条记忆实际写入后以 user_id 调用（如让检索缓存失效）。
+
+环境变量：
+- QTRAN_MEM0_WRITE_BEHIND: on(默认) | off（off 时同步写入，与原行为一致）
+- QTRAN_MEM0_QUEUE_MAX: 内存队列上限（默认 1000）
+- QTRAN_MEM0_BATCH_SIZE: 每批最多取出条数（默认 16）
+- QTRAN_MEM0_FLUSH_TIMEOUT: 退出时刷队列的最长等待秒数（默认 30）
+- QTRAN_MEM0_SPILL_DIR: 溢出文件目录（默认 .mem0_spill）
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+DEFAULT_QUEUE_MAX = 1000
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_FLUSH_TIMEOUT = 30.0
+DEFAULT_SPILL_DIR = ".mem0_spill"
+
+
+def write_behind_enabled():
+    return os.environ.get("QTRAN_MEM0_WRITE_BEHIND", "on").lower() not in (
+        "0",
+        "off",
+        "false",
+        "no",
+    )
+
+
+class Mem0WriteQueue:
+    """有界后台写队列；memory_getter 返回 Mem0 Memory 实例（在后台线程中首次调用，连接也不阻塞调用方）。"""
+
+    def __init__(self, name, memory_getter, max_size=None, batch_size=None, spill_dir=None):
+        self.name = name
+        self._memory_getter = memory_getter
+        self.max_size = int(
+            max_size or os.environ.get("QTRAN_MEM0_QUEUE_MAX", DEFAULT_QUEUE_MAX)
+        )
+        self.batch_size = int(
+            batch_size or os.environ.get("QTRAN_MEM0_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        )
+        spill_dir = spill_dir or os.environ.get("QTRAN_MEM0_SPILL_DIR", DEFAULT_SPILL_DIR)
+        self.spill_path = os.path.join(spill_dir, f"{name}.jsonl")
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._listeners = []
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "deduplicated": 0,
+            "failed": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "dropped": 0,
+        }
+        self._replay_spill()
+        self._thread = threading.Thread(
+            target=self._run, name=f"mem0-writer-{name}", daemon=True
+        )
+        self._thread.start()
+
+    # ---------- 统计 ---------- #
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["depth"] = self.depth
+        return stats
+
+    # ---------- 写入回调 ---------- #
+    def add_write_listener(self, callback):
+        """注册写入完成回调 callback(user_id)（同一回调只注册一次）。"""
+        with self._stats_lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def _notify_written(self, user_id):
+        with self._stats_lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(user_id)
+            except Exception as e:
+                print(f"⚠️ Mem0 写入回调失败: {e}")
+
+    # ---------- 入队 ---------- #
+    def enqueue(self, message, user_id, metadata=None):
+        """非阻塞入队；队列满或已停止时写入溢出文件。"""
+        item = {"message": message, "user_id": user_id, "metadata": metadata or {}}
+        if not self._stopped.is_set():
+            try:
+                self._queue.put_nowait(item)
+                self._count("enqueued")
+                return
+            except queue.Full:
+                pass
+        self._spill([item])
+
+    # ---------- 溢出文件 ---------- #
+    def _spill(self, items):
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    for item in items:
+                        f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._count("spilled", len(items))
+        except Exception as e:
+            print(f"⚠️ Mem0 溢出文件写入失败，丢弃 {len(items)} 条: {e}")
+            self._count("dropped", len(items))
+
+    def _replay_spill(self):
+        """把上次遗留的溢出条目放回队列（放不下的重新落盘）。"""
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            try:
+                with open(self.spill_path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+                os.remove(self.spill_path)
+            except Exception as e:
+                print(f"⚠️ Mem0 溢出文件读取失败: {e}")
+                return
+        overflow = []
+        for line in lines:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            try:
+                self._queue.put_nowait(item)
+                self._count("replayed")
+            except queue.Full:
+                overflow.append(item)
+        if overflow:
+            self._spill(overflow)
+        if lines:
+            print(f"♻️ Mem0 回放溢出记录 {len(lines) - len(overflow)} 条 ({self.name})")
+
+    # ---------- 后台写入 ---------- #
+    def _take_batch(self, timeout):
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        seen = set()
+        memory = None
+        for item in batch:
+            key = (item["user_id"], item["message"])
+            if key in seen:
+                self._count("deduplicated")
+                continue
+            seen.add(key)
+            try:
+                if memory is None:
+                    memory = self._memory_getter()
+                memory.add(
+                    item["message"], user_id=item["user_id"], metadata=item["metadata"]
+                )
+                self._count("written")
+                self._notify_written(item["user_id"])
+            except Exception as e:
+                print(f"⚠️ Mem0 后台写入失败: {e}")
+                self._count("failed")
+
+    def _run(self):
+        while True:
+            batch = self._take_batch(timeout=0.5)
+            if batch:
+                try:
+                    self._write_batch(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            elif self._stopped.is_set():
+                return
+
+    def flush(self, timeout=None):
+        """等待队列写完（最多 timeout 秒），返回是否已清空。"""
+        deadline = time.time() + (timeout if timeout is not None else DEFAULT_FLUSH_TIMEOUT)
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+    def close(self, timeout=None):
+        """停止接收新条目，刷队列；超时后把剩余条目落盘，下次启动回放。"""
+        if timeout is None:
+            timeout = float(
+                os.environ.get("QTRAN_MEM0_FLUSH_TIMEOUT", DEFAULT_FLUSH_TIMEOUT)
+            )
+        self._stopped.set()
+        if not self.flush(timeout):
+            remaining = []
+            while True:
+                try:
+                    remaining.append(self._queue.get_nowait())
+                    self._queue.task_done()
+                except queue.Empty:
+                    break
+            if remaining:
+                print(f"💾 Mem0 写队列未刷完，{len(remaining)} 条写入 {self.spill_path}")
+                self._spill(remaining)
+        self._thread.join(timeout=2)
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_mem0_write_queue(name, memory_getter):
+    """按名称返回进程内共享的写队列；QTRAN_MEM0_WRITE_BEHIND=off 时返回 None。"""
+    if not write_behind_enabled():
+        return None
+    with _queues_lock:
+        write_queue = _queues.get(name)
+        if write_queue is None:
+            write_queue = Mem0WriteQueue(name, memory_getter)
+            _queues[name] = write_queue
+        return write_queue
+
+
+def close_mem0_write_queues():
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for write_queue in queues:
+        write_queue.close()
+
+
+atexit.register(close_mem0_write_queues)
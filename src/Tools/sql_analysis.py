@@ -0,0 +1,173 @@
+"""
+SQL 分析缓存：同一条 SQL 只分词 / 解析一次，各阶段共享结果
+
+作用概述：
+- 方言识别（潜在特征提取、映射阶段再次 tokenize）、翻译阶段的特征提取、Mem0 提示增强的关键词/复杂度判断、
+  变异阶段的特征提取、sql_mutator 的种子解析，原来各自对同一 SQL 重复 upper / 正则 / sqlglot 分词解析。
+- analyze_sql(sql, dialect) 返回按 sha1(dialect + SQL) 缓存的 SQLAnalysis 对象（有界 LRU），
+  各字段首次访问时才计算：
+  * upper / clean（去注释）/ clean_upper / words（大写标识符序列）
+  * tokens（sqlglot.tokenize）/ statements（sqlglot.parse，失败时缓存异常并重复抛出）
+  * function_names（VAR 后紧跟 "(" 的分词）/ has_aggregate
+  * derived(name, builder)：各阶段自己的派生结果（如潜在特征下标）也挂在同一对象上
+- tokens / statements 为共享对象，调用方不得原地修改（sql_mutator 变异前会 copy()）。
+
+环境变量：
+- QTRAN_SQL_ANALYSIS_CACHE_SIZE: 缓存条目上限（默认 4096）
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import sqlglot
+except Exception:  # pragma: no cover
+    sqlglot = None
+
+DEFAULT_CACHE_SIZE = 4096
+AGGREGATE_FUNCTIONS = ("COUNT", "SUM", "AVG", "MAX", "MIN")
+
+_LINE_COMMENT_RE = re.compile(r"--.*$", re.MULTILINE)
+_BLOCK_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_WORD_RE = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]*\b")
+
+_UNSET = object()
+
+
+class SQLAnalysis:
+    """单条 SQL 的惰性分析结果（线程安全，字段计算一次后复用）。"""
+
+    def __init__(self, sql, dialect=None):
+        self.sql = sql
+        self.dialect = dialect
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def derived(self, name, builder):
+        """按名称缓存 builder(self) 的结果；builder 抛出的异常同样缓存并重复抛出。"""
+        value = self._values.get(name, _UNSET)
+        if value is _UNSET:
+            with self._lock:
+                value = self._values.get(name, _UNSET)
+                if value is _UNSET:
+                    try:
+                        value = (True, builder(self))
+                    except Exception as e:
+                        value = (False, e)
+                    self._values[name] = value
+        ok, result = value
+        if not ok:
+            raise result
+        return result
+
+    # ---------- 文本层 ---------- #
+    @property
+    def upper(self):
+        return self.derived("upper", lambda a: a.sql.upper())
+
+    @property
+    def clean(self):
+        """去掉 -- 与 /* */ 注释后的 SQL。"""
+        return self.derived(
+            "clean",
+            lambda a: _BLOCK_COMMENT_RE.sub("", _LINE_COMMENT_RE.sub("", a.sql)),
+        )
+
+    @property
+    def clean_upper(self):
+        return self.derived("clean_upper", lambda a: a.clean.upper())
+
+    @property
+    def words(self):
+        """clean_upper 中的标识符/关键字序列（保持出现顺序，含重复）。"""
+        return self.derived("words", lambda a: _WORD_RE.findall(a.clean_upper))
+
+    @property
+    def has_aggregate(self):
+        return self.derived(
+            "has_aggregate",
+            lambda a: any(op in a.upper for op in AGGREGATE_FUNCTIONS),
+        )
+
+    # ---------- sqlglot 层 ---------- #
+    @property
+    def tokens(self):
+        """sqlglot 分词结果（共享，勿修改）。"""
+        return self.derived("tokens", lambda a: sqlglot.tokenize(a.sql))
+
+    @property
+    def statements(self):
+        """按 dialect 解析的语句列表（共享 AST，修改前请 copy()）。"""
+        return self.derived(
+            "statements", lambda a: list(sqlglot.parse(a.sql, read=a.dialect))
+        )
+
+    @property
+    def function_names(self):
+        """VAR 分词后紧跟 "(" 的名字（按出现顺序）。"""
+
+        def build(a):
+            tokens = a.tokens
+            return [
+                tokens[i].text
+                for i in range(len(tokens) - 1)
+                if tokens[i].token_type == sqlglot.TokenType.VAR
+                and tokens[i + 1].token_type == sqlglot.TokenType.L_PAREN
+            ]
+
+        return self.derived("function_names", build)
+
+
+class SQLAnalysisCache:
+    """以 SQL 文本哈希为键的有界 LRU（线程安全）。"""
+
+    def __init__(self, max_size=None):
+        self.max_size = int(
+            max_size or os.environ.get("QTRAN_SQL_ANALYSIS_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+        )
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(sql, dialect):
+        return hashlib.sha1(f"{dialect or ''}\0{sql}".encode("utf-8")).hexdigest()
+
+    def get(self, sql, dialect=None):
+        key = self._key(sql, dialect)
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return analysis
+            self.stats["misses"] += 1
+            analysis = SQLAnalysis(sql, dialect)
+            self._entries[key] = analysis
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return analysis
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sql_analysis_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLAnalysisCache()
+        return _cache
+
+
+def analyze_sql(sql, dialect=None):
+    """返回共享的 SQLAnalysis；dialect 只影响 statements 的解析方言。"""
+    return get_sql_analysis_cache().get("" if sql is None else str(sql), dialect)
@@ -37,6 +37,11 @@ from typing import Iterable, List, Optional, Tuple
 import sqlglot
 from sqlglot import exp
 
+try:
+    from src.Tools.sql_analysis import analyze_sql
+except ImportError:  # run as a script: python src/Tools/sql_mutator.py
+    from sql_analysis import analyze_sql
+
 
 # 32/64-bit integer edges commonly useful for DB fuzzing
 INT32_MAX = 2**31 - 1
@@ -249,9 +254,10 @@ def mutate_once(expr: exp.Expression, cfg: MutatorConfig) -> Optional[exp.Expres
 
 
 def generate_variants(sql_text: str, cfg: MutatorConfig) -> List[str]:
-    # Parse all statements, then for each create variants nearby and concatenate
+    # Parse all statements, then for each create variants nearby and concatenate.
+    # The seed AST comes from the shared analysis cache; mutate_once() copies before editing.
     try:
-        stmts = _parse_statements(sql_text, cfg.dialect)
+        stmts = analyze_sql(sql_text, cfg.dialect).statements
     except Exception as e:
         raise SystemExit(f"Parse error for seed SQL with dialect='{cfg.dialect}': {e}")
 
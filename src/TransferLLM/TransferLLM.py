@@ -29,6 +29,11 @@ from langchain.callbacks import get_openai_callback
 from src.Tools.DatabaseConnect.database_connector import exec_sql_statement
 from src.NoSQLFuzz.nosql_crash_pipeline import run_nosql_sequence
 from src.Tools.json_utils import safe_parse_result
+from src.Tools.llm_cache import install_llm_cache
+from src.Tools.llm_gateway import get_chat_model
+
+# 转换阶段的 LangChain 调用走持久化响应缓存（QTRAN_LLM_CACHE 控制）
+install_llm_cache()
 
 # Optional: Redis KB adapter for prompt augmentation (lazy import)
 try:
@@ -995,7 +1000,6 @@ def _build_transfer_agent(origin_db: str, target_db: str) -> Optional[Any]:
     - 适用于 Redis→MongoDB 等 NoSQL 场景
     """
     try:
-        from langchain_openai import ChatOpenAI
         from langchain.agents import AgentExecutor, create_openai_functions_agent
         from langchain.tools import tool
         from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
@@ -1078,9 +1082,10 @@ Key Points:
         ]
     )
 
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_TRANSFER_AGENT_MODEL", "gpt-4o-mini"),
+    # 经 LLM 网关发请求，与其他调用共用并发/TPM 限制
+    llm = get_chat_model(
         temperature=0.3,
+        model=os.environ.get("OPENAI_TRANSFER_AGENT_MODEL", "gpt-4o-mini"),
     )
     agent = create_openai_functions_agent(llm, tools, prompt)
     return AgentExecutor(
@@ -1190,17 +1195,11 @@ def transfer_llm_sql_semantic(
     mem0_manager = None
     if use_mem0:
         try:
-            from src.TransferLLM.mem0_adapter import TransferMemoryManager, FallbackMemoryManager
-            try:
-                mem0_manager = TransferMemoryManager(
-                    user_id=f"qtran_{origin_db}_to_{target_db}"
-                )
-                print(f"✅ Mem0 initialized for {origin_db} -> {target_db}")
-            except ImportError:
-                print("⚠️ Mem0 not available, using fallback memory manager")
-                mem0_manager = FallbackMemoryManager(
-                    user_id=f"qtran_{origin_db}_to_{target_db}"
-                )
+            from src.TransferLLM.mem0_adapter import get_transfer_memory_manager
+            # 进程内按 user_id 共享，避免每条语句重新连接 Qdrant/embedder/LLM
+            mem0_manager = get_transfer_memory_manager(
+                user_id=f"qtran_{origin_db}_to_{target_db}"
+            )
             
             # 开启翻译会话
             molt = test_info.get("molt", "unknown")
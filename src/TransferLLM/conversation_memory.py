@@ -0,0 +1,121 @@
+"""
+转换对话上下文：带 token 预算的 ConversationChain 记忆
+
+作用概述：
+- 原先每个 bug 共用一个 ConversationBufferMemory，后面语句的 prompt 会带上前面所有轮次，
+  token 随 bug 长度平方增长。
+- BoundedConversationMemory 在保存每轮对话后按 token 预算从最旧的一轮开始丢弃，
+  至少保留最近一轮（错误迭代需要“上一次的回答”）。
+- 三种策略（QTRAN_CONVERSATION_CONTEXT）：
+  - window(默认)：整个 bug 共用一段对话，按预算滑动窗口
+  - statement：每条语句开启新的子对话，只携带本 bug 已翻译语句作为固定上下文
+  - full：不限长度，与原行为一致
+- QTRAN_CONTEXT_TOKEN_BUDGET：历史上下文的 token 上限（默认 3000）
+"""
+
+import os
+from typing import List
+
+from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, get_buffer_string
+from pydantic import Field
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pragma: no cover
+    _ENCODING = None
+
+CONTEXT_STRATEGIES = ("window", "statement", "full")
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+
+
+def context_strategy():
+    strategy = os.environ.get("QTRAN_CONVERSATION_CONTEXT", "window").lower()
+    return strategy if strategy in CONTEXT_STRATEGIES else "window"
+
+
+def count_tokens(text):
+    """token 计数：有 tiktoken 时精确计数，否则按约 4 字符/词元估算。"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+class BoundedConversationMemory(ConversationBufferMemory):
+    """按 token 预算裁剪历史的对话记忆；pinned 为语句级固定上下文（不参与裁剪）。"""
+
+    strategy: str = "window"
+    max_token_limit: int = DEFAULT_CONTEXT_TOKEN_BUDGET
+    pinned: List[BaseMessage] = Field(default_factory=list)
+
+    @property
+    def buffer_as_messages(self) -> List[BaseMessage]:
+        return self.pinned + self.chat_memory.messages
+
+    @property
+    def buffer_as_str(self) -> str:
+        return get_buffer_string(
+            self.buffer_as_messages,
+            human_prefix=self.human_prefix,
+            ai_prefix=self.ai_prefix,
+        )
+
+    def context_tokens(self):
+        """当前会被拼进下一条 prompt 的历史 token 数。"""
+        return count_tokens(self.buffer_as_str)
+
+    def save_context(self, inputs, outputs):
+        super().save_context(inputs, outputs)
+        if self.strategy != "full":
+            self._prune()
+
+    def _prune(self):
+        messages = self.chat_memory.messages
+        # 每轮为一问一答两条消息，至少保留最近一轮
+        while len(messages) > 2 and self.context_tokens() > self.max_token_limit:
+            del messages[:2]
+
+    def start_statement(self, target_db, translated_sqls):
+        """开始翻译新语句：statement 策略下清空对话，只固定携带已翻译语句作为上下文。"""
+        if self.strategy != "statement":
+            return
+        self.chat_memory.clear()
+        self.pinned = []
+        sqls = [sql for sql in translated_sqls if sql]
+        if not sqls:
+            return
+        # 预算不足时优先保留最近的语句
+        kept = []
+        budget = self.max_token_limit
+        for sql in reversed(sqls):
+            cost = count_tokens(sql)
+            if kept and cost > budget:
+                break
+            kept.insert(0, sql)
+            budget -= cost
+        self.pinned = [
+            HumanMessage(
+                content=f"The following statements of this test case have already been "
+                f"transferred to {target_db} and executed, use them as schema context:\n"
+                + "\n".join(kept)
+            ),
+            AIMessage(content="OK."),
+        ]
+
+    def clear(self):
+        super().clear()
+        self.pinned = []
+
+
+def build_conversation_memory(strategy=None, max_token_limit=None):
+    return BoundedConversationMemory(
+        strategy=strategy or context_strategy(),
+        max_token_limit=int(
+            max_token_limit
+            or os.environ.get("QTRAN_CONTEXT_TOKEN_BUDGET", DEFAULT_CONTEXT_TOKEN_BUDGET)
+        ),
+    )
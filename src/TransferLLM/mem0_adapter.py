@@ -21,8 +21,18 @@ import os
 import json
 from typing import Dict, List, Optional, Any
 import time
+import threading
 from datetime import datetime
 
+from src.Tools.local_embedder import configure_mem0_embedder, install_mem0_embedder
+from src.Tools.mem0_search_cache import (
+    SearchResultCache,
+    search_cache_enabled,
+    sql_template,
+)
+from src.Tools.mem0_write_queue import get_mem0_write_queue
+from src.Tools.sql_analysis import analyze_sql
+
 # 可选引入 Mem0（仅当启用时才需要）
 try:
     from mem0 import Memory
@@ -73,8 +83,37 @@ class TransferMemoryManager:
             }
         }
         
+        # 延迟连接：Qdrant / embedder / LLM 在第一次读写记忆时才初始化
+        self._config = config
+        self._memory = None
+        self._memory_lock = threading.Lock()
+        # 会话按线程隔离，多个 worker 可共用同一个管理器
+        self._local = threading.local()
+        
+        self.user_id = user_id
+        self.enable_metrics = enable_metrics
+        self._search_cache = SearchResultCache() if search_cache_enabled() else None
+        
+        if enable_metrics:
+            self.metrics = {
+                "search_times": [],
+                "add_times": [],
+                "hits": []
+            }
+    
+    @property
+    def memory(self):
+        """Mem0 实例（首次访问时连接，之后复用）"""
+        if self._memory is None:
+            with self._memory_lock:
+                if self._memory is None:
+                    self._memory = self._connect()
+        return self._memory
+    
+    def _connect(self):
+        config = configure_mem0_embedder(self._config)
         try:
-            self.memory = Memory.from_config(config)
+            return install_mem0_embedder(Memory.from_config(config))
         except Exception as e:
             print(f"⚠️ Failed to initialize Mem0 with Qdrant, falling back to in-memory mode: {e}")
             # 回退到内存模式（开发/测试用）
@@ -85,18 +124,31 @@ class TransferMemoryManager:
                     "path": ".mem0_db"
                 }
             }
-            self.memory = Memory.from_config(config)
-        
-        self.user_id = user_id
-        self.session_id = None
-        self.enable_metrics = enable_metrics
-        
-        if enable_metrics:
-            self.metrics = {
-                "search_times": [],
-                "add_times": [],
-                "hits": []
-            }
+            config = configure_mem0_embedder(config)
+            return install_mem0_embedder(Memory.from_config(config))
+    
+    @property
+    def session_id(self) -> Optional[str]:
+        return getattr(self._local, "session_id", None)
+    
+    @session_id.setter
+    def session_id(self, value: Optional[str]):
+        self._local.session_id = value
+    
+    def _add(self, message: str, metadata: Dict[str, Any]):
+        """写入记忆：默认进入后台写队列，不阻塞翻译主流程"""
+        write_queue = get_mem0_write_queue(
+            f"transfer_{self.user_id}", lambda: self.memory
+        )
+        if write_queue is None:
+            self.memory.add(message, user_id=self.user_id, metadata=metadata)
+            if self._search_cache is not None:
+                self._search_cache.on_add(self.user_id)
+        else:
+            # 检索缓存在记忆真正写入后才失效（入队时失效会被写入前的检索重新填入旧结果）
+            if self._search_cache is not None:
+                write_queue.add_write_listener(self._search_cache.on_add)
+            write_queue.enqueue(message, self.user_id, metadata)
     
     def start_session(self, origin_db: str, target_db: str, molt: str) -> str:
         """
@@ -120,9 +172,8 @@ class TransferMemoryManager:
         )
         
         try:
-            self.memory.add(
+            self._add(
                 message,
-                user_id=self.user_id,
                 metadata={
                     "type": "session_start",
                     "origin_db": origin_db,
@@ -210,9 +261,8 @@ class TransferMemoryManager:
             message += f" Features: {', '.join(features[:5])}"  # 最多记录5个特征
         
         try:
-            self.memory.add(
+            self._add(
                 message,
-                user_id=self.user_id,
                 metadata={
                     "type": "successful_translation",
                     "origin_db": origin_db,
@@ -261,9 +311,8 @@ class TransferMemoryManager:
         )
         
         try:
-            self.memory.add(
+            self._add(
                 message,
-                user_id=self.user_id,
                 metadata={
                     "type": "error_fix",
                     "origin_db": origin_db,
@@ -280,6 +329,18 @@ class TransferMemoryManager:
         if self.enable_metrics:
             self.metrics["add_times"].append(time.time() - start_time)
     
+    def _cached_search(self, query, user_id, limit, exact_key, template_key=None):
+        """memory.search 前先查本地缓存，未命中时再走远程检索并回填"""
+        cache = self._search_cache
+        if cache is not None:
+            memories, tier = cache.lookup(exact_key, template_key)
+            if tier is not None:
+                return memories
+        memories = self.memory.search(query=query, user_id=user_id, limit=limit)
+        if cache is not None:
+            cache.store(user_id, memories, exact_key, template_key)
+        return memories
+    
     def get_relevant_memories(
         self,
         query_sql: str,
@@ -308,12 +369,18 @@ class TransferMemoryManager:
             f"SQL: {query_snippet}"
         )
         
+        # 精确查询串 + 去字面量 SQL 模板两级缓存
+        exact_key = (self.user_id, query, limit)
+        template_key = (
+            self.user_id,
+            origin_db,
+            target_db,
+            sql_template(query_snippet, origin_db),
+            limit,
+        ) if self._search_cache is not None else None
+        
         try:
-            memories = self.memory.search(
-                query=query,
-                user_id=self.user_id,
-                limit=limit
-            )
+            memories = self._cached_search(query, self.user_id, limit, exact_key, template_key)
             
             if self.enable_metrics:
                 self.metrics["search_times"].append(time.time() - start_time)
@@ -347,10 +414,8 @@ class TransferMemoryManager:
         kb_user_id = f"qtran_kb_{database}"
         
         try:
-            memories = self.memory.search(
-                query=query,
-                user_id=kb_user_id,
-                limit=limit
+            memories = self._cached_search(
+                query, kb_user_id, limit, (kb_user_id, query, limit)
             )
             
             if self.enable_metrics:
@@ -543,11 +608,7 @@ class TransferMemoryManager:
         Returns:
             提取的关键词字符串
         """
-        import re
-        
-        # 移除注释
-        sql_clean = re.sub(r'--.*$', '', sql, flags=re.MULTILINE)
-        sql_clean = re.sub(r'/\*.*?\*/', '', sql_clean, flags=re.DOTALL)
+        analysis = analyze_sql(sql)
         
         # 提取 SQL 关键词和标识符
         # 常见的 SQL 关键词
@@ -559,8 +620,8 @@ class TransferMemoryManager:
             'FOREIGN KEY', 'PRIMARY KEY', 'UNIQUE', 'INDEX'
         ])
         
-        # 提取所有单词
-        words = re.findall(r'\b[A-Za-z_][A-Za-z0-9_]*\b', sql_clean.upper())
+        # 提取所有单词（去注释、分词结果在各阶段共享）
+        words = analysis.words
         
         # 过滤出可能的函数名、数据类型、操作符
         keywords = []
@@ -572,7 +633,7 @@ class TransferMemoryManager:
         
         # 返回前5个关键词
         unique_keywords = list(dict.fromkeys(keywords))[:5]
-        return ' '.join(unique_keywords) if unique_keywords else sql_clean[:100]
+        return ' '.join(unique_keywords) if unique_keywords else analysis.clean[:100]
     
     def _is_complex_query(self, sql: str) -> bool:
         """
@@ -584,7 +645,7 @@ class TransferMemoryManager:
         Returns:
             True 如果是复杂查询，False 如果是简单查询
         """
-        sql_upper = sql.upper()
+        sql_upper = analyze_sql(sql).upper
         
         # 简单查询模式（通常不需要知识库）
         simple_patterns = [
@@ -638,9 +699,8 @@ class TransferMemoryManager:
         message = f"Ended translation session {self.session_id} {status}{result_snippet}"
         
         try:
-            self.memory.add(
+            self._add(
                 message,
-                user_id=self.user_id,
                 metadata={
                     "type": "session_end",
                     "session_id": self.session_id,
@@ -677,7 +737,28 @@ class TransferMemoryManager:
         
         if self.metrics["hits"]:
             hit_rate = sum(self.metrics["hits"]) / len(self.metrics["hits"])
-            report += f"🎯 Memory hit rate: {hit_rate:.1%}\n"
+            report += f"🎯 Memory hit rate: {hit_rate:.1%}"
+            if self._search_cache is not None:
+                cache_stats = self._search_cache.stats
+                report += (
+                    f" (search cache hit rate {self._search_cache.hit_rate():.1%}: "
+                    f"exact {cache_stats['exact_hits']}, template {cache_stats['template_hits']}, "
+                    f"misses {cache_stats['misses']})"
+                )
+            report += "\n"
+        
+        write_queue = get_mem0_write_queue(
+            f"transfer_{self.user_id}", lambda: self.memory
+        )
+        if write_queue is not None:
+            queue_stats = write_queue.snapshot()
+            report += (
+                f"📮 Write queue depth: {queue_stats['depth']} "
+                f"(written {queue_stats['written']}, failed {queue_stats['failed']})\n"
+            )
+            report += (
+                f"🗑️  Spilled: {queue_stats['spilled']}, dropped: {queue_stats['dropped']}\n"
+            )
         
         report += "================================\n"
         return report
@@ -1163,3 +1244,28 @@ class FallbackMemoryManager:
     def get_metrics_report(self):
         return "Fallback mode: metrics not available"
 
+
+# ========== 进程级管理器注册表 ==========
+_managers: Dict[str, Any] = {}
+_managers_lock = threading.Lock()
+
+
+def get_transfer_memory_manager(user_id: str = "qtran_transfer", fallback: bool = True):
+    """
+    按 user_id 返回进程内共享的记忆管理器（首次调用时创建，Mem0 连接延迟到首次读写）
+    
+    Args:
+        user_id: 用户标识
+        fallback: Mem0 未安装时是否返回 FallbackMemoryManager（否则抛出 ImportError）
+    """
+    with _managers_lock:
+        manager = _managers.get(user_id)
+        if manager is None:
+            try:
+                manager = TransferMemoryManager(user_id=user_id)
+            except ImportError:
+                if not fallback:
+                    raise
+                manager = FallbackMemoryManager(user_id=user_id)
+            _managers[user_id] = manager
+        return manager
@@ -24,19 +24,31 @@ from src.DialectRecognition.dialect_feature_recognizer import (
 
 # from src.TransferLLM.rag_based_feature_mapping import rag_feature_mapping_llm, rag_feature_mapping_count, rag_feature_mapping_process
 from src.TransferLLM.TransferLLM import transfer_llm
-from src.Tools.DatabaseConnect.database_connector import database_clear
+from src.Tools.DatabaseConnect.database_connector import (
+    get_worker_namespace,
+    parallel_worker_limit,
+    set_worker_namespace,
+)
+from src.Tools.DatabaseConnect.database_reset import database_reset, get_reset_stats
 from datetime import datetime
 from src.MutationLlmModelValidator.MutateLLM import run_muatate_llm_single_sql
 from src.Tools.OracleChecker.oracle_check import execSQL_result_convertor, Result, Check
 import os
 import json
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from json_repair import repair_json
 from openai import OpenAI
-from langchain.chat_models import ChatOpenAI
+from src.Tools.llm_gateway import get_chat_model
 from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferMemory
-from src.Tools.DatabaseConnect.database_connector import exec_sql_statement
+from src.TransferLLM.conversation_memory import build_conversation_memory
+from src.Tools.DatabaseConnect.database_connector import (
+    exec_sql_batch,
+    exec_sql_statement,
+)
 from src.Tools.json_utils import make_json_safe
+from src.Tools.sql_analysis import analyze_sql
 
 
 current_file_path = os.path.abspath(__file__)
@@ -120,6 +132,7 @@ def sqlancer_translate(
     iteration_num=4,
     FewShot=False,
     with_knowledge=True,
+    workers=1,
 ):
     """
     SQLancer 全流程驱动：
@@ -127,6 +140,8 @@ def sqlancer_translate(
     - 解析 bug 报告，提取待转换 SQL；
     - 调用 transfer_llm 执行跨方言转换及错误迭代；
     - 调用 Mutate LLM 获取变异结果并持久化。
+    - workers > 1 时以线程池并发处理多个 bug，每个 worker 使用独立的数据库命名空间；
+      输入中含 memcached/etcd/consul 时退回串行，含 Redis 时 worker 数不超过 15。
     """
     # ========== Mem0 记忆管理初始化 ==========
     use_mem0 = os.environ.get("QTRAN_USE_MEM0", "false").lower() == "true"
@@ -137,16 +152,16 @@ def sqlancer_translate(
     if use_mem0:
         try:
             from src.TransferLLM.mem0_adapter import (
-                TransferMemoryManager, FallbackMemoryManager
+                MEM0_AVAILABLE, get_transfer_memory_manager
             )
-            try:
-                mem0_manager = TransferMemoryManager(
+            if MEM0_AVAILABLE:
+                mem0_manager = get_transfer_memory_manager(
                     user_id="qtran_transfer_universal"
                 )
                 print(f"✅ Translation Mem0 initialized")
-            except ImportError:
+            else:
                 print("⚠️ Mem0 not available for translation, using fallback")
-                mem0_manager = FallbackMemoryManager(
+                mem0_manager = get_transfer_memory_manager(
                     user_id="qtran_transfer_fallback"
                 )
         except Exception as e:
@@ -204,12 +219,30 @@ def sqlancer_translate(
 
     with open(input_filepath, "r", encoding="utf-8") as r:
         bugs = r.readlines()
-    for line in bugs:
+
+    def _process_bug(line):
+        """单个 bug 的完整流程，结束后汇报本 bug 的数据库重置耗时。"""
         bug = json.loads(line)
+        reset_costs = []
+        try:
+            _run_bug_stages(bug, reset_costs)
+        finally:
+            if reset_costs:
+                print(
+                    f"🧹 bug {bug.get('index')} 重置 {len(reset_costs)} 次，"
+                    f"共 {sum(reset_costs):.3f}s"
+                )
+
+    def _run_bug_stages(bug, reset_costs):
+        """单个 bug 的完整流程：特征识别 -> 转换 -> 变异 -> oracle 检查。"""
         a_db = bug["a_db"]
         b_db = bug["b_db"]
         fuzzer = bug["molt"]
 
+        def _reset(db):
+            # 快照恢复式重置，并记录耗时
+            reset_costs.append(database_reset(tool, fuzzer, db))
+
         # Step1: rag_based_feature_mapping。先做以下mapping，SQLite/mariadb/（Postgres是0暂时不弄）mapping to mysql/tidb/monetdb/duckdb/clickhouse
         # rag_feature_mapping_llm(1,0,a_db, b_db, ["function"], ["Feature", "Description", "Examples", "Category"])
         # rag_feature_mapping_count(1,0, a_db, b_db, ["function"], ["Feature", "Description", "Examples", "Category"])
@@ -237,21 +270,30 @@ def sqlancer_translate(
             output_transfer_dic, str(bug["index"]) + ".jsonl"
         )
         if not os.path.exists(bug_output_transfer_filename):
+            # 并行模式下先重置本 worker 的独立库：保证库已创建且不残留上一个 bug 的表
+            if get_worker_namespace() is not None:
+                _reset(a_db)
+                _reset(b_db)
             # transfer llm conversion
-            chat = ChatOpenAI(temperature=temperature, model=model)
-            memory = ConversationBufferMemory()  # 内存：对话缓冲区内存
-            if error_iteration:
-                conversation = ConversationChain(
-                    llm=chat,
-                    memory=memory,
-                    verbose=False,  # 为true的时候是展示langchain实际在做什么
-                )
-            else:
-                conversation = ConversationChain(
-                    llm=chat, verbose=False  # 为true的时候是展示langchain实际在做什么
-                )
+            chat = get_chat_model(temperature=temperature, model=model)
+            # 带 token 预算的对话记忆，避免整 bug 历史拼进每条 prompt
+            memory = build_conversation_memory()
+            conversation = ConversationChain(
+                llm=chat,
+                memory=memory,
+                verbose=False,  # 为true的时候是展示langchain实际在做什么
+            )
+            bug_prompt_tokens = 0
             for info in bug_input:
                 transfer_start_time = datetime.now()  # 使用 ISO 8601 格式
+                memory.start_statement(
+                    b_db,
+                    [
+                        _extract_transferred_stmt(prev.get("TransferResult") or [])
+                        for prev in transfer_outputs
+                    ],
+                )
+                context_tokens = memory.context_tokens()
                 
                 # 构建上下文SQL：使用之前已成功翻译的SQL作为上下文
                 context_sqls = []
@@ -294,10 +336,21 @@ def sqlancer_translate(
                 info["TransferSqlExecResult"] = exec_results
                 info["TransferSqlExecError"] = error_messages
                 info["TransferSqlExecEqualities"] = exec_equalities
+                prompt_tokens = sum(
+                    cost.get("Prompt Tokens", 0) for cost in costs or []
+                )
+                info["PromptTokens"] = prompt_tokens
+                info["ContextTokens"] = context_tokens
+                bug_prompt_tokens += prompt_tokens
+                print(
+                    f"🧮 语句 {len(transfer_outputs) + 1}: prompt tokens {prompt_tokens}"
+                    f"（历史上下文 {context_tokens}，策略 {memory.strategy}）"
+                )
                 transfer_outputs.append(info)
+            print(f"🧮 bug {bug['index']} prompt tokens 合计 {bug_prompt_tokens}")
             # sqlancer执行完一组sql后，将a_db和d_db都进行clear
-            database_clear(tool, fuzzer, a_db)
-            database_clear(tool, fuzzer, b_db)
+            _reset(a_db)
+            _reset(b_db)
             # 全部执行完再进行存储
             with open(bug_output_transfer_filename, "a", encoding="utf-8") as a:
                 for item in transfer_outputs:
@@ -328,7 +381,7 @@ def sqlancer_translate(
                     print(
                         "🔧 [WARN] No TransferSQL/TransferNoSQL found in last TransferResult; skipping mutate phase for this bug."
                     )
-                    continue
+                    return
 
                 # 智能检测实际执行的目标数据库类型
                 # 检查 TransferSqlExecResult 来确定真实的目标数据库
@@ -432,9 +485,8 @@ def sqlancer_translate(
                 if mutate_results[i]["TransferSqlExecError"][-1] != "None":
                     transfer_fail_flag = True
             # 先创造执行环境
-            database_clear(tool, fuzzer, b_db)
-            for ddl in ddls:
-                exec_sql_statement(tool, fuzzer, b_db, ddl)
+            _reset(b_db)
+            exec_sql_batch(tool, fuzzer, b_db, ddls)
 
             before_mutate = _extract_transferred_stmt(
                 mutate_results[-1]["TransferResult"]
@@ -443,7 +495,7 @@ def sqlancer_translate(
                 print(
                     "[ERROR] Cannot extract before_mutate statement; aborting mutate/oracle stage for this bug."
                 )
-                continue
+                return
             after_mutate = mutate_results[-1]["MutateResult"]
 
             before_result, before_exec_time, before_error_message = exec_sql_statement(
@@ -491,8 +543,7 @@ def sqlancer_translate(
                     mutate_exec_list = []
                     mutate_errors = []
                     total_time = 0.0
-                    for cmd in cmds:
-                        r, t, e = exec_sql_statement(tool, fuzzer, b_db, cmd)
+                    for r, t, e in exec_sql_batch(tool, fuzzer, b_db, cmds):
                         mutate_exec_list.append(r)
                         mutate_errors.append(e)
                         try:
@@ -594,7 +645,7 @@ def sqlancer_translate(
                     else:
                         break
             # 全部执行完再次进行clear
-            database_clear(tool, fuzzer, b_db)
+            _reset(b_db)
             # 对不同类型的目标数据库采用不同的持久化格式：
             # - 对于关系型/SQL 数据库，保留原注释里的行为（字符串化），以保持与现有 downstream 兼容性
             # - 对于 NoSQL（如 MongoDB/Redis 等），使用 json.dumps() 来确保字段为合法 JSON（双引号），并保留结构化信息
@@ -786,15 +837,73 @@ def sqlancer_translate(
                     oracle_type=bug.get("molt", "unknown")
                 )
             
+            mutate_results[-1]["ResetTimeCost"] = round(sum(reset_costs), 4)
             with open(bug_output_mutate_filename, "w", encoding="utf-8") as a:
                 pass
             with open(bug_output_mutate_filename, "a", encoding="utf-8") as a:
                 for item in mutate_results:
                     json.dump(make_json_safe(item), a, ensure_ascii=False)
                     a.write("\n")
+
+    if workers > 1:
+        bug_dbs = set()
+        for line in bugs:
+            try:
+                bug = json.loads(line)
+            except ValueError:
+                continue
+            bug_dbs.update(bug.get(key) for key in ("a_db", "b_db") if bug.get(key))
+        limit = parallel_worker_limit(bug_dbs)
+        if limit is not None and workers > limit:
+            print(
+                f"⚠️ 输入包含无法按 worker 隔离或逻辑库数有限的数据库 {sorted(bug_dbs)}，"
+                f"workers 由 {workers} 降为 {limit}"
+            )
+            workers = limit
+
+    if workers <= 1:
+        for line in bugs:
+            _process_bug(line)
+    else:
+        print(f"🚀 并行模式：{workers} 个 worker，共 {len(bugs)} 个 bug")
+        _run_bugs_in_worker_pool(bugs, _process_bug, workers)
+    for name, stat in get_reset_stats().items():
+        print(
+            f"🧹 reset {name}: {stat['count']} 次, avg {stat['avg']}s, max {stat['max']}s"
+        )
     print("📥 ------------------------")
 
 
+def _run_bugs_in_worker_pool(bugs, process_bug, workers):
+    """以线程池并发处理 bug。
+
+    耗时主要花在等待 LLM 与数据库上，线程即可并发；每个 worker 线程在初始化时
+    绑定唯一编号（1..workers），该线程内的 database_reset / exec_sql_statement
+    都落到 `<dbname>_w<编号>` 库上，避免并发 DDL 互相干扰。
+    单个 bug 失败只记录日志，不中断其它 bug。
+    """
+    slot_lock = threading.Lock()
+    slots = itertools.count(1)
+
+    def _init_worker():
+        with slot_lock:
+            set_worker_namespace(next(slots))
+
+    with ThreadPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    ) as executor:
+        futures = {executor.submit(process_bug, line): line for line in bugs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                try:
+                    bug_index = json.loads(futures[future]).get("index")
+                except Exception:
+                    bug_index = "unknown"
+                print(f"⚠️ bug {bug_index} 处理失败: {e}")
+
+
 def sqlancer_qtran_run(
     input_filepath,
     tool="sqlancer",
@@ -804,6 +913,7 @@ def sqlancer_qtran_run(
     iteration_num=4,
     FewShot=False,
     with_knowledge=True,
+    workers=1,
 ):
     sqlancer_translate(
         input_filepath=input_filepath,
@@ -814,6 +924,7 @@ def sqlancer_qtran_run(
         iteration_num=iteration_num,
         FewShot=False,
         with_knowledge=False,
+        workers=workers,
     )
     getSuspicious(input_filepath=input_filepath, tool="sqlancer")
 
@@ -1032,13 +1143,18 @@ def _generate_recommendation_from_oracle(
 
 def _extract_sql_features(sql: str) -> list:
     """
-    从SQL中提取关键特性
+    从SQL中提取关键特性（结果缓存在共享的 SQLAnalysis 上）
     
     Returns:
         特性列表，如 ["HEX", "MIN", "COLLATE", "aggregate"]
     """
+    return list(analyze_sql(sql).derived("transfer_features", _build_sql_features))
+
+
+def _build_sql_features(analysis) -> list:
     features = []
-    sql_upper = sql.upper()
+    sql = analysis.sql
+    sql_upper = analysis.upper
     
     # 常见函数
     functions = [
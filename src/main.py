@@ -17,7 +17,7 @@ import argparse
 import json
 from src.TransferLLM.translate_sqlancer import sqlancer_qtran_run
 from src.TransferLLM.TransferLLM import pinolo_qtran_run
-from src.Tools.DatabaseConnect.docker_create import docker_create_databases
+from src.Tools.DatabaseConnect.docker_create import bootstrap_databases
 from src.Coordinator import SimpleCoordinator
 
 environment_variables = os.environ
@@ -70,6 +70,7 @@ def qtran_run(
     FewShot=False,
     with_knowledge=True,
     enable_coordinator=True,
+    workers=1,
 ):
     """
     启动 QTRAN 主流程（转换阶段入口）。
@@ -81,6 +82,7 @@ def qtran_run(
     - error_iteration/iteration_num: 是否进行错误迭代及最大迭代次数。
     - FewShot/with_knowledge: 是否启用 Few-Shot 示例与特征知识库提示。
     - enable_coordinator: 🆕 是否启用协调器机制。
+    - workers: sqlancer 流程并发处理的 bug 数（每个 worker 使用独立的库名后缀 _w<编号>）。
 
     行为：
     - 初始化并创建不同 fuzzer 和数据库的容器/数据库实例。
@@ -185,10 +187,8 @@ def qtran_run(
     # 可选：通过环境变量跳过 Docker 初始化（快速校验模式）
     if os.environ.get("QTRAN_SKIP_DOCKER", "0") != "1":
         print(f"开始初始化 {len(dbs)} 个数据库...")
-        for db in dbs:
-            docker_create_databases(tool, "temp", db)
-            for fuzzer in fuzzers:
-                docker_create_databases(tool, fuzzer, db)
+        # 各数据库并发初始化（带就绪探测与幂等缓存），同一数据库内按 temp + fuzzers 顺序建库
+        bootstrap_databases(tool, dbs, ["temp"] + fuzzers)
         print("数据库初始化完成")
     else:
         print("跳过 Docker 初始化（QTRAN_SKIP_DOCKER=1）")
@@ -203,6 +203,7 @@ def qtran_run(
             iteration_num=iteration_num,
             FewShot=FewShot,
             with_knowledge=with_knowledge,
+            workers=workers,
         )
     elif tool.lower() == "pinolo":
         pinolo_qtran_run(
@@ -267,6 +268,13 @@ def main():
         default=True,
         help="🆕 Enable coordinator mechanism for dynamic workflow adjustment.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of bugs processed concurrently (sqlancer only; forced to 1 for "
+        "memcached/etcd/consul, capped at 15 for redis).",
+    )
 
     args = parser.parse_args()
 
@@ -280,6 +288,7 @@ def main():
         FewShot=args.FewShot,
         with_knowledge=args.with_knowledge,
         enable_coordinator=args.enable_coordinator,
+        workers=args.workers,
     )
 
 
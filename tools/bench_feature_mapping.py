@@ -0,0 +1,91 @@
+"""
+特征映射检索微基准：逐行扫描 mapping 文件 vs 函数名前缀索引
+
+对比每条 SQL 的检索开销：
+- 旧方式：每条 SQL 重新读取整个 mapping jsonl，对每个函数逐行 json.loads 并比对
+- 新方式：load_feature_mapping_index 进程内缓存的函数名索引，字典查找
+
+使用示例：
+    # 使用仓库自带的 SQLite -> MySQL 映射文件，模拟 2000 条 SQL，每条 4 个函数
+    python tools/bench_feature_mapping.py
+
+    # 指定 mapping 文件与规模
+    python tools/bench_feature_mapping.py --mapping RAG_Feature_Mapping/SQLite/Functions/SQLite_mapping_DuckDB_k0_1.jsonl --sqls 5000 --funcs 6
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.DialectRecognition.dialect_feature_recognizer import (
+    build_feature_mapping_index,
+    load_feature_mapping_index,
+)
+
+DEFAULT_MAPPING = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "RAG_Feature_Mapping",
+    "SQLite",
+    "Functions",
+    "SQLite_mapping_MySQL_k0_1.jsonl",
+)
+
+
+def legacy_lookup(path, functions):
+    """旧实现：每次读文件，每个函数逐行解析比对。"""
+    result = []
+    with open(path, "r", encoding="utf-8") as r:
+        mapping_info = r.readlines()
+    for dialect in functions:
+        dialect_str = str(dialect).lower().strip()
+        for info in mapping_info:
+            map = json.loads(info)
+            a_feature_str = "".join(map["a_db"]["Feature"]).split("(")[0].lower().strip()
+            if a_feature_str == dialect_str:
+                result.append([map["a_db"]["index"], map["b_db"]["index"]])
+                break
+    return result
+
+
+def indexed_lookup(path, functions):
+    index = load_feature_mapping_index(path)
+    return [list(index[name]) for name in (str(f).lower().strip() for f in functions) if name in index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="特征映射检索微基准")
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING)
+    parser.add_argument("--sqls", type=int, default=2000, help="模拟的 SQL 条数")
+    parser.add_argument("--funcs", type=int, default=4, help="每条 SQL 的函数个数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.mapping, "r", encoding="utf-8") as r:
+        names = list(build_feature_mapping_index(r))
+    rng = random.Random(args.seed)
+    # 混入一部分不存在的函数名，模拟未命中
+    pool = names + [f"not_a_function_{i}" for i in range(max(1, len(names) // 4))]
+    workload = [[rng.choice(pool) for _ in range(args.funcs)] for _ in range(args.sqls)]
+
+    print(f"📄 mapping: {args.mapping} ({len(names)} 个函数名)")
+    print(f"🧪 {args.sqls} 条 SQL × {args.funcs} 个函数")
+
+    for label, fn in (("逐行扫描", legacy_lookup), ("前缀索引", indexed_lookup)):
+        start = time.perf_counter()
+        hits = 0
+        for functions in workload:
+            hits += len(fn(args.mapping, functions))
+        elapsed = time.perf_counter() - start
+        print(
+            f"⏱️  {label}: 共 {elapsed:.3f}s，每条 SQL {elapsed / args.sqls * 1e6:.1f}µs，命中 {hits}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+离线生成特征映射候选：对多个数据库两两计算 top-k 余弦相似候选（嵌入矩阵 .npy mmap + 分块矩阵乘）
+
+每个数据库的嵌入矩阵只计算一次（内容未变时直接 mmap 复用），随后对所有有序数据库对各做一次向量化 top-k，
+结果写入 RAG_Feature_Mapping/<a_db>/<feature_type>/<a_db>_candidates_<b_db>_k<k>.jsonl，
+供 rag_feature_mapping_llm_v5 由 LLM 确认。
+
+前置条件：各数据库的 RAG_Embedding_Data/merge_*.jsonl 与 embedding_*.jsonl 已由 RAG 映射流程生成。
+
+使用示例：
+    # 所有已生成 embedding 数据的数据库两两之间，function 特征 top-5
+    python tools/build_feature_candidates.py
+
+    # 指定数据库与候选数
+    python tools/build_feature_candidates.py --dbs sqlite mysql postgres --top-k 10
+
+    # 指定特征类型与向量内容字段
+    python tools/build_feature_candidates.py --feature-types function --content-keys Feature Description Examples Category
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.DialectFeatureMapping.feature_similarity import (
+    DEFAULT_BLOCK_SIZE,
+    DEFAULT_TOP_K,
+    build_candidate_lists,
+    candidate_filename,
+    candidate_sources,
+    load_embedding_matrix,
+    topk_cosine,
+    write_candidate_lists,
+)
+from src.Tools.JsonLoader.JSONLoader import JSONLoader
+from src.Tools.local_embedder import get_local_embedder
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def kb_filenames(db, feature_types, content_keys):
+    """与 rag_based_feature_mapping 的命名一致：(merge 文件, embedding 文件)。"""
+    data_dir = os.path.join(PROJECT_ROOT, "FeatureKnowledgeBase", db, "RAG_Embedding_Data")
+    merge_name = "merge_" + "_".join(feature_types)
+    embedding_name = "embedding_" + "_".join(list(feature_types) + list(content_keys))
+    return (
+        os.path.join(data_dir, merge_name + ".jsonl"),
+        os.path.join(data_dir, embedding_name + ".jsonl"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线生成特征映射候选（全量两两 top-k）")
+    parser.add_argument("--dbs", nargs="*", default=None, help="数据库列表，默认 FeatureKnowledgeBase 下全部")
+    parser.add_argument("--feature-types", nargs="+", default=["function"])
+    parser.add_argument(
+        "--content-keys",
+        nargs="+",
+        default=["Feature", "Description", "Examples", "Category"],
+    )
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="每块 a_db 行数")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument(
+        "--mapping-root",
+        default=os.path.join(PROJECT_ROOT, "RAG_Feature_Mapping"),
+        help="候选文件输出根目录",
+    )
+    args = parser.parse_args()
+
+    dbs = args.dbs or sorted(os.listdir(os.path.join(PROJECT_ROOT, "FeatureKnowledgeBase")))
+    embedder = get_local_embedder(args.model)
+
+    matrices = {}
+    records = {}
+    kb_files = {}
+    for db in dbs:
+        merge_filename, embedding_filename = kb_filenames(
+            db, args.feature_types, args.content_keys
+        )
+        if not (os.path.exists(merge_filename) and os.path.exists(embedding_filename)):
+            print(f"⚠️ 跳过 {db}：缺少 {os.path.basename(merge_filename)} / {os.path.basename(embedding_filename)}")
+            continue
+        start = time.time()
+        docs = JSONLoader(
+            file_path=embedding_filename, content_key="vector_txt", json_lines=True
+        ).load()
+        matrices[db] = load_embedding_matrix(
+            embedding_filename, [doc.page_content for doc in docs], embedder
+        )
+        with open(merge_filename, "r", encoding="utf-8") as r:
+            records[db] = [json.loads(line) for line in r]
+        kb_files[db] = (merge_filename, embedding_filename)
+        print(f"📐 {db}: {matrices[db].shape}，用时 {time.time() - start:.1f}s")
+
+    pairs = list(itertools.permutations(matrices, 2))
+    print(f"🔗 共 {len(pairs)} 个数据库对，top-{args.top_k}")
+    total_start = time.time()
+    for a_db, b_db in pairs:
+        start = time.time()
+        indices, scores = topk_cosine(
+            matrices[a_db], matrices[b_db], args.top_k, args.block_size
+        )
+        candidates = build_candidate_lists(records[a_db], records[b_db], indices, scores)
+        out_filename = candidate_filename(
+            args.mapping_root, a_db, b_db, args.feature_types[0], args.top_k
+        )
+        write_candidate_lists(
+            candidates,
+            out_filename,
+            candidate_sources(kb_files[a_db], kb_files[b_db], embedder),
+        )
+        print(f"✅ {a_db} -> {b_db}: {len(candidates)} 个特征，用时 {time.time() - start:.2f}s")
+    print(f"⏱️  全部完成，用时 {time.time() - total_start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,18 @@
     
     # 导入特定类型的知识
     python tools/knowledge_base_importer.py --sql mysql --type datatype,function
+    
+    # 批量导入：跳过 LLM 事实抽取，按批向量化后以确定性 ID 直接写入向量库（重复导入只补新增条目）
+    python tools/knowledge_base_importer.py --all --bulk --batch-size 256
 """
 
 import os
 import sys
 import json
 import argparse
+import hashlib
+import uuid
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import time
@@ -35,10 +41,137 @@ except ImportError:
     print("⚠️ Mem0 not available, will use fallback manager")
 
 
+# 确定性 ID 的命名空间：同一 (user_id, 文本) 每次导入得到相同的向量 ID
+KB_ID_NAMESPACE = uuid.UUID("5f0c1c1e-6a43-4d4e-9a2b-8f1d2c3b4a5e")
+
+
+class BulkVectorWriter:
+    """
+    批量写入器：绕过 memory.add（每条一次 LLM 抽取 + 一次 embedding），
+    攒批后一次性向量化并以确定性 ID 写入 Mem0 的向量库，payload 格式与 Mem0 保持一致
+
+    on_committed(tags) 在一批成功写入（或已存在）后回调，tags 为该批各条 add 时传入的 tag；
+    向量化或写入失败时整批计为 failed 并抛出异常，不会回调。
+    """
+    
+    def __init__(self, memory, batch_size: int = 256, on_committed=None):
+        self.memory = memory
+        self.on_committed = on_committed
+        self.vector_store = memory.vector_store
+        self.embedder = memory.embedding_model
+        self.batch_size = batch_size
+        self.pending: List[tuple] = []
+        self.stats = {
+            "written": 0,
+            "skipped_existing": 0,
+            "duplicate_in_batch": 0,
+            "failed": 0,
+            "batches": 0,
+            "embed_time": 0.0,
+            "upsert_time": 0.0,
+        }
+    
+    @staticmethod
+    def vector_id(user_id: str, text: str) -> str:
+        return str(uuid.uuid5(KB_ID_NAMESPACE, f"{user_id}\0{text}"))
+    
+    def add(self, text: str, user_id: str, metadata: Dict, tag=None):
+        self.pending.append((self.vector_id(user_id, text), text, user_id, metadata, tag))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+    
+    def _existing_ids(self, ids: List[str]) -> set:
+        """查询向量库中已存在的 ID（Qdrant / Chroma 批量查询，其他后端视为全部不存在）"""
+        store = self.vector_store
+        try:
+            if hasattr(store, "client") and hasattr(store.client, "retrieve"):
+                points = store.client.retrieve(
+                    collection_name=store.collection_name,
+                    ids=ids,
+                    with_payload=False,
+                    with_vectors=False,
+                )
+                return {str(point.id) for point in points}
+            if hasattr(store, "collection") and hasattr(store.collection, "get"):
+                return set(store.collection.get(ids=ids).get("ids", []))
+        except Exception as e:
+            print(f"  ⚠️ Failed to query existing ids, re-importing batch: {e}")
+        return set()
+    
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        embedder = self.embedder
+        if hasattr(embedder, "embed_many"):
+            # 本地 embedder（带持久化向量缓存）
+            return embedder.embed_many(texts)
+        client = getattr(embedder, "client", None)
+        if client is not None and hasattr(client, "embeddings"):
+            # OpenAI embedder：一次请求编码整批
+            response = client.embeddings.create(
+                input=[text.replace("\n", " ") for text in texts],
+                model=embedder.config.model,
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        return [embedder.embed(text) for text in texts]
+    
+    def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            written, skipped, duplicates = self._write_batch(batch)
+        except Exception:
+            self.stats["failed"] += len(batch)
+            raise
+        self.stats["skipped_existing"] += skipped
+        self.stats["duplicate_in_batch"] += duplicates
+        if written:
+            self.stats["written"] += written
+            self.stats["batches"] += 1
+            print(f"  📦 Batch {self.stats['batches']}: wrote {written}, "
+                  f"skipped existing {skipped}, in-batch duplicates {duplicates}")
+        if self.on_committed is not None:
+            self.on_committed([item[4] for item in batch])
+    
+    def _write_batch(self, batch):
+        """向量化并写入一批，返回 (写入条数, 向量库中已存在跳过条数, 批内重复条数)"""
+        # 同一批内去重
+        unique = {}
+        for item in batch:
+            unique.setdefault(item[0], item)
+        duplicates = len(batch) - len(unique)
+        existing = self._existing_ids(list(unique))
+        todo = [item for vid, item in unique.items() if vid not in existing]
+        if not todo:
+            return 0, len(unique), duplicates
+        
+        start = time.time()
+        vectors = self._embed([item[1] for item in todo])
+        self.stats["embed_time"] += time.time() - start
+        
+        now = datetime.now().isoformat()
+        payloads = []
+        for _, text, user_id, metadata, _ in todo:
+            payload = dict(metadata)
+            payload.update({
+                "data": text,
+                "hash": hashlib.md5(text.encode()).hexdigest(),
+                "created_at": now,
+                "user_id": user_id,
+            })
+            payloads.append(payload)
+        
+        start = time.time()
+        self.vector_store.insert(
+            vectors=vectors, payloads=payloads, ids=[item[0] for item in todo]
+        )
+        self.stats["upsert_time"] += time.time() - start
+        return len(todo), len(unique) - len(todo), duplicates
+
+
 class KnowledgeBaseImporter:
     """知识库导入器"""
     
-    def __init__(self, user_id: str = "qtran_knowledge_base"):
+    def __init__(self, user_id: str = "qtran_knowledge_base", bulk: bool = False, batch_size: int = 256):
         """初始化导入器"""
         try:
             if MEM0_AVAILABLE:
@@ -57,6 +190,23 @@ class KnowledgeBaseImporter:
             "by_type": {},
             "errors": []
         }
+        
+        self.bulk_writer = None
+        if bulk:
+            if not hasattr(self.manager, "memory"):
+                raise RuntimeError("Bulk import requires Mem0 (fallback manager has no vector store)")
+            self.bulk_writer = BulkVectorWriter(
+                self.manager.memory, batch_size=batch_size, on_committed=self._record_committed
+            )
+            print(f"📦 Bulk mode: batch size {batch_size}, LLM extraction skipped")
+    
+    def finish(self):
+        """写出批量模式下剩余的缓冲条目"""
+        if self.bulk_writer is not None:
+            try:
+                self.bulk_writer.flush()
+            except Exception as e:
+                self.stats["errors"].append({"stage": "bulk_flush", "error": str(e)})
     
     def import_mongodb_knowledge(self):
         """导入 MongoDB 知识库"""
@@ -578,6 +728,13 @@ class KnowledgeBaseImporter:
         
         return "\n".join(parts) if parts else ""
     
+    def _record_committed(self, tags):
+        """更新导入统计，tags 为已成功写入的 (db_name, type) 列表"""
+        for db_name, ktype in tags:
+            self.stats["total_imported"] += 1
+            self.stats["by_database"][db_name] = self.stats["by_database"].get(db_name, 0) + 1
+            self.stats["by_type"][ktype] = self.stats["by_type"].get(ktype, 0) + 1
+    
     def _add_memory(self, memory_text: str, db_name: str, metadata: Dict):
         """添加记忆到 mem0"""
         try:
@@ -587,18 +744,19 @@ class KnowledgeBaseImporter:
             # 为不同数据库使用不同的 user_id
             user_id = f"qtran_kb_{db_name}"
             
+            if self.bulk_writer is not None:
+                # 批量模式：整批写入成功后才经 _record_committed 计数
+                self.bulk_writer.add(
+                    memory_text, user_id, metadata, tag=(db_name, metadata.get("type", "unknown"))
+                )
+                return
+            
             self.manager.memory.add(
                 memory_text,
                 user_id=user_id,
                 metadata=metadata
             )
-            
-            # 更新统计
-            self.stats["total_imported"] += 1
-            self.stats["by_database"][db_name] = self.stats["by_database"].get(db_name, 0) + 1
-            
-            ktype = metadata.get("type", "unknown")
-            self.stats["by_type"][ktype] = self.stats["by_type"].get(ktype, 0) + 1
+            self._record_committed([(db_name, metadata.get("type", "unknown"))])
             
         except Exception as e:
             self.stats["errors"].append({
@@ -626,6 +784,17 @@ class KnowledgeBaseImporter:
             for error in self.stats["errors"][:5]:
                 print(f"  - {error}")
         
+        
+        if self.bulk_writer is not None:
+            bulk = self.bulk_writer.stats
+            print(f"\n📦 Bulk writes: {bulk['written']} in {bulk['batches']} batches, "
+                  f"skipped existing: {bulk['skipped_existing']}, "
+                  f"in-batch duplicates: {bulk['duplicate_in_batch']}, failed: {bulk['failed']}")
+            print(f"⏱️  Embedding: {bulk['embed_time']:.2f}s, upsert: {bulk['upsert_time']:.2f}s")
+            if bulk["embed_time"] + bulk["upsert_time"] > 0:
+                rate = bulk["written"] / (bulk["embed_time"] + bulk["upsert_time"])
+                print(f"🚀 Throughput: {rate:.1f} items/s")
+        
         print("=" * 60)
 
 
@@ -638,6 +807,8 @@ def main():
                        help="Import specific SQL database")
     parser.add_argument("--type", help="Knowledge types to import (comma-separated: datatype,function,operator)")
     parser.add_argument("--dry-run", action="store_true", help="Dry run without actually importing")
+    parser.add_argument("--bulk", action="store_true", help="Batch-embed and upsert directly into the vector store (skips LLM extraction)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Batch size for --bulk")
     
     args = parser.parse_args()
     
@@ -645,7 +816,7 @@ def main():
         print("🔍 DRY RUN MODE - No data will be imported")
         return
     
-    importer = KnowledgeBaseImporter()
+    importer = KnowledgeBaseImporter(bulk=args.bulk, batch_size=args.batch_size)
     
     start_time = time.time()
     
@@ -682,6 +853,7 @@ def main():
             parser.print_help()
             return
         
+        importer.finish()
         elapsed_time = time.time() - start_time
         
         # 打印统计
@@ -691,6 +863,7 @@ def main():
         
     except KeyboardInterrupt:
         print("\n\n⚠️ Import interrupted by user")
+        importer.finish()
         importer.print_stats()
     except Exception as e:
         print(f"\n❌ Import failed with error: {e}")
@@ -0,0 +1,168 @@
+"""
+本地 OpenAI 兼容桩服务：用于验证 LLM 网关的并发上限、TPM 预算与 429 退避
+
+功能：
+- 提供 POST /v1/chat/completions，回显最后一条消息（带固定延迟）并返回 usage
+- 每 N 个请求返回一次 429 + Retry-After，模拟限流
+- 记录同时在途的峰值请求数
+
+使用示例：
+    # 启动桩服务（每 5 个请求返回一次 429，Retry-After 1 秒）
+    python tools/llm_stub_server.py --port 18080 --rate-limit-every 5 --retry-after 1
+
+    # 另一个终端：让网关指向桩服务
+    QTRAN_LLM_BASE_URL=http://127.0.0.1:18080/v1 OPENAI_API_KEY=stub \\
+    QTRAN_LLM_MAX_INFLIGHT=4 python tools/llm_stub_server.py --bench 32
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubState:
+    def __init__(self, rate_limit_every, retry_after, latency):
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rate_limited = 0
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with state.lock:
+                state.requests += 1
+                limited = (
+                    state.rate_limit_every > 0
+                    and state.requests % state.rate_limit_every == 0
+                )
+                if limited:
+                    state.rate_limited += 1
+                else:
+                    state.in_flight += 1
+                    state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+            if limited:
+                self._send(
+                    429,
+                    {"error": {"message": "rate limited", "type": "rate_limit"}},
+                    {"Retry-After": str(state.retry_after)},
+                )
+                return
+            try:
+                time.sleep(state.latency)
+                messages = request.get("messages") or [{}]
+                content = str(messages[-1].get("content", ""))
+                prompt_tokens = sum(
+                    len(str(m.get("content", ""))) for m in messages
+                ) // 4
+                completion_tokens = len(content) // 4
+                self._send(
+                    200,
+                    {
+                        "id": f"stub-{state.requests}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model", "stub"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens,
+                        },
+                    },
+                )
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+def serve(port, rate_limit_every, retry_after, latency):
+    state = StubState(rate_limit_every, retry_after, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    print(f"🚀 LLM 桩服务已启动: http://127.0.0.1:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(
+            f"📊 请求 {state.requests}，429 {state.rate_limited}，"
+            f"峰值在途 {state.peak_in_flight}"
+        )
+
+
+def bench(total):
+    """从多个线程同时经网关发请求，输出网关统计。"""
+    from concurrent.futures import ThreadPoolExecutor
+    from src.Tools.llm_gateway import get_llm_gateway
+
+    gateway = get_llm_gateway()
+    start = time.time()
+
+    def one(i):
+        return gateway.chat_completion(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": f"SELECT {i};"}],
+        )
+
+    with ThreadPoolExecutor(max_workers=total) as pool:
+        list(pool.map(one, range(total)))
+    print(f"✅ {total} 个请求完成，用时 {time.time() - start:.2f}s")
+    print(f"📊 网关统计: {gateway.stats}")
+    gateway.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=1)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--bench", type=int, default=0, help="作为客户端并发发送 N 个请求")
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.bench)
+    else:
+        serve(args.port, args.rate_limit_every, args.retry_after, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+方言探测缓存预热：对特征知识库中每个 feature 的最短 example SQL，在各目标库上并行探测并落盘
+
+探测结果写入 src/DialectRecognition/dialect_probe.py 的持久化缓存（按 目标库 + 服务端版本 + feature + SQL），
+之后的方言识别直接命中缓存，不再逐条访问数据库。已缓存的条目不会重复执行。
+每个探测线程使用独立的 worker 命名空间（temp 库名追加 _w<编号>），实际执行前重置该库，
+结束后再统一重置一次，DDL 类示例不会互相冲突，也不会残留表。
+
+使用示例：
+    # 以 SQLite 知识库为源，探测所有已配置且支持版本查询的目标库
+    python tools/warm_dialect_probe_cache.py --sources sqlite
+
+    # 指定多个源库与目标库，8 个并发
+    python tools/warm_dialect_probe_cache.py --sources sqlite mysql --targets postgres duckdb --workers 8
+
+    # 使用 RAG_Embedding_Data 合并后的 jsonl 作为知识库
+    python tools/warm_dialect_probe_cache.py --kb "FeatureKnowledgeBase Processed1/sqlite/RAG_Embedding_Data/merge_function.jsonl"
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.Tools.DatabaseConnect.connector_args import get_database_connector_args
+from src.Tools.DatabaseConnect.database_connector import (
+    get_worker_namespace,
+    set_worker_namespace,
+)
+from src.Tools.DatabaseConnect.database_reset import database_reset
+from src.DialectRecognition.dialect_probe import (
+    VERSION_QUERIES,
+    get_probe_result_store,
+    probe_dialect_support,
+    probe_stats,
+)
+from src.DialectRecognition.feature_index import feature_record_name
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE_EXP = "temp"
+
+
+def iter_kb_records(path):
+    """读取单个 json（一条记录）或 jsonl（每行一条记录）知识库文件。"""
+    with open(path, "r", encoding="utf-8") as r:
+        if path.endswith(".jsonl"):
+            for line in r:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            record = json.load(r)
+            if isinstance(record, list):
+                yield from record
+            else:
+                yield record
+
+
+def collect_probes(kb_files):
+    """每个 feature 取最短的 example SQL，返回 [(feature, sql)]（去重）。"""
+    probes = {}
+    for path in kb_files:
+        for record in iter_kb_records(path):
+            examples = [sql for sql in record.get("Examples", []) if sql]
+            feature = feature_record_name(record)
+            if not examples or not feature:
+                continue
+            probes.setdefault((feature, min(examples, key=len)), None)
+    return list(probes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="方言探测缓存预热")
+    parser.add_argument("--sources", nargs="+", default=["sqlite"], help="源库（知识库目录名）")
+    parser.add_argument("--feature-type", default="function", help="function | operator | datatype")
+    parser.add_argument("--kb", nargs="*", default=None, help="直接指定知识库文件（json/jsonl），覆盖 --sources")
+    parser.add_argument("--targets", nargs="*", default=None, help="目标库，默认所有已配置的库")
+    parser.add_argument("--tool", default="sqlancer")
+    parser.add_argument("--workers", type=int, default=4, help="并发探测线程数")
+    args = parser.parse_args()
+
+    if get_probe_result_store() is None:
+        print("⚠️ QTRAN_PROBE_CACHE=off，探测结果不会落盘，预热无意义")
+        return
+
+    if args.kb:
+        kb_files = args.kb
+    else:
+        kb_files = []
+        for source in args.sources:
+            kb_files += sorted(
+                glob.glob(
+                    os.path.join(
+                        PROJECT_ROOT,
+                        "FeatureKnowledgeBase",
+                        source.lower(),
+                        args.feature_type,
+                        "results",
+                        "*.json",
+                    )
+                )
+            )
+    probes = collect_probes(kb_files)
+
+    targets = args.targets or [
+        db for db in VERSION_QUERIES if get_database_connector_args(db) is not None
+    ]
+    print(f"📚 知识库文件 {len(kb_files)} 个，待探测 feature {len(probes)} 个")
+    print(f"🎯 目标库: {', '.join(targets)}")
+
+    slot_lock = threading.Lock()
+    slots = itertools.count(1)
+    used = set()  # 已建好的 (worker 编号, 目标库)
+
+    def _init_worker():
+        with slot_lock:
+            set_worker_namespace(next(slots))
+
+    def _reset(target):
+        database_reset(args.tool, PROBE_EXP, target)
+
+    def _probe(target, feature, sql):
+        key = (get_worker_namespace(), target)
+        if key not in used:
+            # 首次使用本线程的库：先建好/清空（版本查询也在该库上执行）
+            _reset(target)
+            with slot_lock:
+                used.add(key)
+        return probe_dialect_support(
+            args.tool,
+            PROBE_EXP,
+            target,
+            sql,
+            feature=feature,
+            before_execute=lambda: _reset(target),
+        )
+
+    start = time.time()
+    supported_cnt = 0
+    failed = 0
+    with ThreadPoolExecutor(
+        max_workers=max(1, args.workers), initializer=_init_worker
+    ) as executor:
+        futures = [
+            executor.submit(_probe, target, feature, sql)
+            for target in targets
+            for feature, sql in probes
+        ]
+        for future in as_completed(futures):
+            try:
+                supported, _ = future.result()
+                supported_cnt += int(supported)
+            except Exception as e:
+                failed += 1
+                print(f"❌ 探测失败: {e}")
+
+    # 收尾：清掉各 worker 库中最后一次探测留下的表
+    for worker_id, target in sorted(used):
+        set_worker_namespace(worker_id)
+        try:
+            _reset(target)
+        except Exception as e:
+            print(f"⚠️ {target} (w{worker_id}) 收尾重置失败: {e}")
+    set_worker_namespace(None)
+
+    elapsed = time.time() - start
+    print(
+        f"✅ 完成 {len(futures)} 次探测，用时 {elapsed:.1f}s："
+        f"实际执行 {probe_stats['executed']}，命中缓存 {probe_stats['cached']}，"
+        f"可执行 {supported_cnt}，异常 {failed}"
+    )
+    store = get_probe_result_store()
+    for target in targets:
+        print(f"   {target}: 缓存条目 {store.count(target.lower())}")
+    print(f"💾 缓存文件: {store.path}（共 {store.count()} 条）")
+
+
+if __name__ == "__main__":
+    main()